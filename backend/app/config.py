@@ -10,6 +10,19 @@ class Settings(BaseSettings):
     api_prefix: str = "/api/v1"
 
     database_url: str = "sqlite:///./vietsaga.db"
+    # Engine async cho route nóng; để trống thì suy ra từ database_url (aiosqlite / asyncpg).
+    database_async_url: str | None = None
+    # Pool áp dụng cho cả engine sync và async (mỗi engine một pool riêng).
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 10.0  # giây chờ lấy kết nối trước khi báo lỗi thay vì treo
+    db_pool_recycle: int = 1800  # giây; đóng kết nối cũ trước khi Postgres/proxy cắt
+    db_pool_pre_ping: bool = True
+    # PRAGMA cho SQLite, chạy mỗi khi mở kết nối.
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
     redis_url: str = "redis://localhost:6379/0"
 
     jwt_secret: str = "super-secret-key-change-me"
@@ -25,20 +38,75 @@ class Settings(BaseSettings):
 
     rag_top_k: int = 4
     rag_index_path: str = "./rag/faiss.index"
-    rag_meta_path: str = "./rag/meta.json"
+    rag_chunk_store_path: str = "./rag/chunks.bin"  # file thật: chunks.<build_id>.bin
+    rag_cooccurrence_path: str = "./rag/cooccurrence.npz"  # ma trận entity–entity, đặt tên theo build
     rag_manifest_path: str = "./rag/rag_manifest.json"
+    rag_index_state_path: str = "./rag/index_state.json"
     rag_pdf_path: str = "./rag/viet_nam_su_luoc.pdf"
-    rag_chunk_size: int = 800
-    rag_chunk_overlap: int = 120
+    rag_sources_path: str = ""  # thư mục hoặc manifest JSON các nguồn; rỗng = chỉ rag_pdf_path
+    rag_include_library: bool = False  # ingest cả LibraryDocument trong DB
+    rag_chunk_tokens: int = 350
+    rag_chunk_overlap_tokens: int = 50
+    rag_extract_workers: int = 0  # 0 = os.cpu_count()
+    rag_embed_store_path: str = "./rag/embeddings.sqlite"
+    embed_batch_max_tokens: int = 100_000
+    embed_batch_max_items: int = 2048
+    embed_concurrency: int = 4
+    embed_max_retries: int = 6
+    embed_backoff_base: float = 1.0
+    embed_backoff_max: float = 60.0
+    ingest_batch_size: int = 256  # số chunk mỗi lần upsert Milvus / ghi meta
+    ingest_queue_size: int = 8  # số phần tử tối đa chờ giữa hai stage
+    ingest_max_pending: int = 4  # số batch đang embed dở tối đa
+    rag_lexical_path: str = "./rag/lexical_index.json"
+    rag_retrieval_mode: str = "hybrid"  # vector | lexical | hybrid
+    rag_hybrid_candidates: int = 20
+    rag_rrf_k: int = 60
+    rag_cache_size: int = 2048
+    rag_cache_ttl: float = 6 * 3600  # giây; chặn trên độ cũ khi chưa có manifest
+    rag_embed_timeout: float = 3.0
+    rag_search_timeout: float = 2.0
+    rag_retrieve_budget: float = 5.0
+    graph_query_timeout: float = 1.5
+    router_latency_budget: float = 6.0
+    chat_retrieval_budget: float = 1.5  # giây prompt chờ retrieval trước khi bắt đầu sinh
+    chat_context_chunks: int = 4
+    chat_context_chars: int = 600
 
     milvus_host: str = "localhost"
     milvus_port: str = "19530"
-    milvus_collection: str = "vnhistory_chunks"
+    milvus_collection: str = "vnhistory_chunks"  # alias trỏ tới collection version đang live
+    rag_keep_versions: int = 2  # số collection/graph version giữ lại sau khi chuyển
+    # Collection thật cũ trùng tên alias chỉ được xoá khi manifest đã trỏ sang bản versioned lâu hơn ngần này (giây).
+    rag_legacy_grace_seconds: int = 3600
+    rag_reindex_lock_ttl: int = 600  # giây; heartbeat của process job gia hạn mỗi TTL/3
+    milvus_pool_size: int = 2
+    milvus_connect_timeout: float = 3.0
+    milvus_backoff_base: float = 1.0
+    milvus_backoff_max: float = 60.0
+    milvus_metric_type: str = "IP"
+    milvus_index_type: str = "HNSW"  # HNSW | IVF_FLAT | IVF_SQ8 | IVF_PQ | FLAT
+    milvus_index_params: dict = {"M": 16, "efConstruction": 200}
+    milvus_search_ef: int = 64
+    milvus_search_ef_max: int = 512
+    milvus_search_nprobe: int = 16
+    milvus_search_nprobe_max: int = 256
 
     graph_uri: str = "neo4j://localhost:7687"
     graph_user: str = "neo4j"
     graph_password: str = "password"
     graph_database: str = "neo4j"
+    graph_batch_size: int = 1000  # số chunk mỗi transaction khi rebuild graph
+    graph_pool_size: int = 20
+    graph_acquisition_timeout: float = 1.0  # giây chờ lấy connection từ pool
+    graph_connect_timeout: float = 2.0
+    graph_query_retries: int = 2  # số lần thử lại lỗi tạm thời, trong cùng ngân sách timeout
+    graph_retry_backoff: float = 0.05
+    graph_unavailable_cooldown: float = 10.0  # giây bỏ qua Neo4j sau khi không kết nối được
+    graph_snapshot_enabled: bool = True  # trả link từ graph nạp sẵn trong process thay vì Neo4j
+    graph_answer_entities: int = 8  # số entity tối đa lấy từ câu trả lời để tìm quan hệ
+    graph_cache_size: int = 1024
+    graph_cache_ttl: float = 6 * 3600  # giây; version trong khoá đã lo phần rebuild
 
     allowed_origins: str = "http://localhost:5174"
 
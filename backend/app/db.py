@@ -1,12 +1,90 @@
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator
 
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from .config import get_settings
 
 settings = get_settings()
-connect_args = {"check_same_thread": False} if settings.database_url.startswith("sqlite") else {}
-engine = create_engine(settings.database_url, connect_args=connect_args, echo=False)
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg", "postgres": "postgresql+asyncpg"}
+
+
+def async_database_url(url: str) -> str:
+    """sqlite:///… → sqlite+aiosqlite:///…, postgresql(+psycopg2)://… → postgresql+asyncpg://…"""
+    scheme, sep, rest = url.partition("://")
+    driver = ASYNC_DRIVERS.get(scheme.split("+", 1)[0])
+    return f"{driver}{sep}{rest}" if driver else url
+
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _is_sqlite_memory(url: str) -> bool:
+    return _is_sqlite(url) and (":memory:" in url or url.partition("://")[2] in ("", "/"))
+
+
+def pool_options(url: str) -> dict:
+    # SQLite in-memory dùng SingletonThreadPool/StaticPool, không nhận tham số QueuePool.
+    if _is_sqlite_memory(url):
+        return {}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+def sqlite_pragmas() -> list[str]:
+    return [
+        f"PRAGMA journal_mode={settings.sqlite_journal_mode}",
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",
+        f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}",
+        f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}",
+    ]
+
+
+def _apply_sqlite_pragmas(dbapi_connection, _record) -> None:
+    # WAL cho đọc song song với một writer; busy_timeout để writer chờ khoá thay vì "database is locked".
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sqlite_pragmas():
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+def make_engine(url: str) -> Engine:
+    connect_args = {"check_same_thread": False} if _is_sqlite(url) else {}
+    created = create_engine(url, connect_args=connect_args, echo=False, **pool_options(url))
+    if _is_sqlite(url):
+        event.listen(created, "connect", _apply_sqlite_pragmas)
+    return created
+
+
+def make_async_engine(url: str) -> AsyncEngine:
+    options = pool_options(url)
+    if options:
+        # aiosqlite mặc định NullPool (mở kết nối mới mỗi lần checkout); chỉ định pool để giữ kết nối.
+        options["poolclass"] = AsyncAdaptedQueuePool
+    created = create_async_engine(url, echo=False, **options)
+    if _is_sqlite(url):
+        event.listen(created.sync_engine, "connect", _apply_sqlite_pragmas)
+    return created
+
+
+engine = make_engine(settings.database_url)
+async_engine = make_async_engine(settings.database_async_url or async_database_url(settings.database_url))
+# expire_on_commit=False: object vẫn đọc được sau commit mà không phát sinh lazy load (không được phép khi async).
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
 
 
 def init_db() -> None:
@@ -17,3 +95,9 @@ def init_db() -> None:
 def get_session() -> Session:
     with Session(engine) as session:
         yield session
+
+
+@asynccontextmanager
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as session:
+        yield session
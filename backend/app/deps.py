@@ -1,7 +1,8 @@
 from fastapi import Depends, Header, HTTPException, status
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.db import get_session
+from app.db import get_async_session, get_session
 from app.models.core import User
 from app.services import auth as auth_service
 
@@ -11,6 +12,11 @@ def get_db() -> Session:
         yield session
 
 
+async def get_async_db() -> AsyncSession:
+    async with get_async_session() as session:
+        yield session
+
+
 def get_current_user(
     authorization: str = Header(..., alias="Authorization"),
     session: Session = Depends(get_db),
@@ -19,3 +25,13 @@ def get_current_user(
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="invalid_token")
     token = authorization.split(" ", 1)[1]
     return auth_service.get_current_user(session, token)
+
+
+async def get_current_user_async(
+    authorization: str = Header(..., alias="Authorization"),
+    session: AsyncSession = Depends(get_async_db),
+) -> User:
+    if not authorization.lower().startswith("bearer "):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="invalid_token")
+    token = authorization.split(" ", 1)[1]
+    return await auth_service.get_current_user_async(session, token)
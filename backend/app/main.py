@@ -10,9 +10,10 @@ from fastapi.responses import ORJSONResponse
 
 from app import deps
 from app.config import get_settings
-from app.db import init_db
+from app.db import async_engine, init_db
 from app.models.core import User
-from app.routers import admin, auth, chat, library, memory, notifications, quests, search, timeline, users
+from app.routers import admin, auth, chat, graph, library, memory, notifications, quests, search, timeline, users
+from app.services.graph import graph_service
 
 settings = get_settings()
 
@@ -52,6 +53,15 @@ async def add_trace_id(request: Request, call_next):
 @app.on_event("startup")
 def startup_event() -> None:
     init_db()
+    if settings.graph_snapshot_enabled:
+        # Neo4j là tuỳ chọn: không chờ nó lúc khởi động, link đi đường Neo4j/context tới khi snapshot sẵn sàng.
+        graph_service.load_snapshot_in_background()
+
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    await graph_service.close()
+    await async_engine.dispose()
 
 
 @app.get("/healthz")
@@ -64,6 +74,7 @@ app.include_router(users.router, prefix=settings.api_prefix)
 app.include_router(timeline.router, prefix=settings.api_prefix)
 app.include_router(library.router, prefix=settings.api_prefix)
 app.include_router(search.router, prefix=settings.api_prefix)
+app.include_router(graph.router, prefix=settings.api_prefix)
 app.include_router(chat.router, prefix=settings.api_prefix)
 app.include_router(quests.router, prefix=settings.api_prefix)
 app.include_router(memory.router, prefix=settings.api_prefix)
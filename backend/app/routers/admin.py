@@ -1,21 +1,48 @@
-from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi import APIRouter, Header, HTTPException
+from redis.exceptions import RedisError
 
 from app.config import get_settings
+from app.services.graph import graph_service
 from app.services.rag import rag_service
+from app.services.reindex import ReindexBusy, reindex_jobs
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 settings = get_settings()
 
 
+def _check_token(token: str) -> None:
+    if token != settings.jwt_secret:
+        raise HTTPException(status_code=401, detail="unauthorized")
+
+
 @router.get("/rag/health")
 def rag_health(x_admin_token: str = Header(..., alias="X-Admin-Token")):
-    if x_admin_token != settings.jwt_secret:
-        raise HTTPException(status_code=401, detail="unauthorized")
+    _check_token(x_admin_token)
     return rag_service.health()
 
 
-@router.post("/rag/reindex")
-def rag_reindex(x_admin_token: str = Header(..., alias="X-Admin-Token")):
-    if x_admin_token != settings.jwt_secret:
-        raise HTTPException(status_code=401, detail="unauthorized")
-    return {"status": "queued"}
+@router.get("/graph/health")
+def graph_health(x_admin_token: str = Header(..., alias="X-Admin-Token")):
+    _check_token(x_admin_token)
+    return graph_service.health()
+
+
+@router.post("/rag/reindex", status_code=202)
+def rag_reindex(full: bool = False, x_admin_token: str = Header(..., alias="X-Admin-Token")):
+    _check_token(x_admin_token)
+    try:
+        return reindex_jobs.start(full=full)
+    except ReindexBusy as exc:
+        raise HTTPException(status_code=409, detail={"message": str(exc), "job": exc.status})
+    except RedisError as exc:
+        raise HTTPException(status_code=503, detail=f"Không khoá được job reindex: {exc}")
+
+
+@router.get("/rag/reindex")
+def rag_reindex_status(x_admin_token: str = Header(..., alias="X-Admin-Token")):
+    _check_token(x_admin_token)
+    try:
+        status = reindex_jobs.status()
+    except RedisError as exc:
+        raise HTTPException(status_code=503, detail=f"Không đọc được trạng thái reindex: {exc}")
+    return status or {"state": "idle"}
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass
 from datetime import datetime
 import json
@@ -10,14 +11,19 @@ import unicodedata
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from openai import OpenAI
-from sqlmodel import Session, select
+from sqlalchemy import delete, func, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app import deps
 from app.config import get_settings
+from app.db import get_async_session
 from app.models.core import ChatSession, SessionMessage, User
 from app.schemas import chat as chat_schema
 from app.services.graph import graph_service
 from app.services.rag import rag_service
+from app.utils.chunking import page_label
+from app.utils.deadline import Deadline
 
 settings = get_settings()
 llm_client = OpenAI(api_key=settings.openai_api_key)
@@ -484,16 +490,17 @@ def _override_analysis_for_agent(analysis: RequestAnalysis, preferred_agent: str
 
 
 @router.post("/router", response_model=chat_schema.RouterResponse)
-def route_question(payload: chat_schema.RouterRequest, user: User = Depends(deps.get_current_user)) -> chat_schema.RouterResponse:
+async def route_question(payload: chat_schema.RouterRequest, user: User = Depends(deps.get_current_user_async)) -> chat_schema.RouterResponse:
     question = _extract_latest_user_question(payload.messages)
     if not question:
         raise HTTPException(status_code=400, detail="empty_question")
     analysis = _analyze_question(question)
     if payload.agent_id:
         analysis = _override_analysis_for_agent(analysis, payload.agent_id)
-    context_docs = _retrieve_context(question, analysis)
+    deadline = Deadline(settings.router_latency_budget)
+    context_docs = await _retrieve_context_async(question, analysis, deadline)
     context_chunks = _format_context_chunks(context_docs)
-    raw_links = graph_service.get_links_for_chunks([chunk["chunk_id"] for chunk in context_docs])
+    raw_links = await _graph_links_async([chunk["chunk_id"] for chunk in context_docs], deadline)
     graph_links = _ensure_graph_links(context_docs, raw_links)
     flag_warning = "[CẢNH BÁO LỆCH THỜI ĐẠI]" if _has_period_mismatch(analysis.period_code, context_docs) else "NO"
     query_for_agent = _compose_agent_query(question, analysis)
@@ -505,25 +512,33 @@ def route_question(payload: chat_schema.RouterRequest, user: User = Depends(deps
         flag_warning=flag_warning,
     )
 @router.get("/conversations", response_model=list[chat_schema.ConversationResponse])
-def list_conversations(
-    session: Session = Depends(deps.get_db),
-    user: User = Depends(deps.get_current_user),
+async def list_conversations(
+    session: AsyncSession = Depends(deps.get_async_db),
+    user: User = Depends(deps.get_current_user_async),
 ) -> list[chat_schema.ConversationResponse]:
     """Lấy danh sách tất cả các conversations của user."""
-    conversations = session.exec(
-        select(ChatSession)
-        .where(ChatSession.user_id == user.id)
-        .order_by(ChatSession.last_message_at.desc())
+    conversations = (
+        await session.exec(
+            select(ChatSession)
+            .where(ChatSession.user_id == user.id)
+            .order_by(ChatSession.last_message_at.desc())
+        )
     ).all()
     
+    # Đếm số lượng messages của mọi conversation trong một truy vấn GROUP BY
+    counts = dict(
+        (
+            await session.exec(
+                select(SessionMessage.session_id, func.count(SessionMessage.id))
+                .join(ChatSession, ChatSession.id == SessionMessage.session_id)
+                .where(ChatSession.user_id == user.id)
+                .group_by(SessionMessage.session_id)
+            )
+        ).all()
+    )
+    
     result = []
     for conv in conversations:
-        # Đếm số lượng messages
-        message_count = session.exec(
-            select(SessionMessage)
-            .where(SessionMessage.session_id == conv.id)
-        ).all()
-        
         result.append(
             chat_schema.ConversationResponse(
                 id=conv.id,
@@ -532,17 +547,17 @@ def list_conversations(
                 topic=conv.topic,
                 created_at=conv.created_at,
                 last_message_at=conv.last_message_at,
-                message_count=len(message_count),
+                message_count=counts.get(conv.id, 0),
             )
         )
     return result
 
 
 @router.post("/conversations", response_model=chat_schema.ConversationResponse)
-def create_conversation(
+async def create_conversation(
     payload: chat_schema.ConversationCreate,
-    session: Session = Depends(deps.get_db),
-    user: User = Depends(deps.get_current_user),
+    session: AsyncSession = Depends(deps.get_async_db),
+    user: User = Depends(deps.get_current_user_async),
 ) -> chat_schema.ConversationResponse:
     """Tạo conversation mới với tên anh hùng."""
     conversation = ChatSession(
@@ -552,8 +567,8 @@ def create_conversation(
         topic=payload.topic,
     )
     session.add(conversation)
-    session.commit()
-    session.refresh(conversation)
+    await session.commit()
+    await session.refresh(conversation)
     
     return chat_schema.ConversationResponse(
         id=conversation.id,
@@ -567,24 +582,28 @@ def create_conversation(
 
 
 @router.get("/conversations/{conversation_id}/messages", response_model=chat_schema.ConversationMessagesResponse)
-def get_conversation_messages(
+async def get_conversation_messages(
     conversation_id: int,
-    session: Session = Depends(deps.get_db),
-    user: User = Depends(deps.get_current_user),
+    session: AsyncSession = Depends(deps.get_async_db),
+    user: User = Depends(deps.get_current_user_async),
 ) -> chat_schema.ConversationMessagesResponse:
     """Lấy lịch sử tin nhắn của một conversation."""
-    conversation = session.exec(
-        select(ChatSession)
-        .where(ChatSession.id == conversation_id, ChatSession.user_id == user.id)
+    conversation = (
+        await session.exec(
+            select(ChatSession)
+            .where(ChatSession.id == conversation_id, ChatSession.user_id == user.id)
+        )
     ).first()
     
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation không tồn tại")
     
-    messages = session.exec(
-        select(SessionMessage)
-        .where(SessionMessage.session_id == conversation_id)
-        .order_by(SessionMessage.created_at)
+    messages = (
+        await session.exec(
+            select(SessionMessage)
+            .where(SessionMessage.session_id == conversation_id)
+            .order_by(SessionMessage.created_at)
+        )
     ).all()
     
     message_responses = [
@@ -614,33 +633,28 @@ def get_conversation_messages(
 
 
 @router.delete("/conversations/{conversation_id}")
-def delete_conversation(
+async def delete_conversation(
     conversation_id: int,
-    session: Session = Depends(deps.get_db),
-    user: User = Depends(deps.get_current_user),
+    session: AsyncSession = Depends(deps.get_async_db),
+    user: User = Depends(deps.get_current_user_async),
 ) -> dict:
     """Xóa một conversation và tất cả messages của nó."""
-    conversation = session.exec(
-        select(ChatSession)
-        .where(ChatSession.id == conversation_id, ChatSession.user_id == user.id)
+    conversation = (
+        await session.exec(
+            select(ChatSession)
+            .where(ChatSession.id == conversation_id, ChatSession.user_id == user.id)
+        )
     ).first()
     
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation không tồn tại")
     
-    # Xóa tất cả messages trước
-    messages = session.exec(
-        select(SessionMessage).where(SessionMessage.session_id == conversation_id)
-    ).all()
-    for msg in messages:
-        session.delete(msg)
-    
-    # Commit xóa messages trước
-    session.commit()
+    # Xóa tất cả messages trước (một câu DELETE, không nạp từng message)
+    await session.execute(delete(SessionMessage).where(SessionMessage.session_id == conversation_id))
     
-    # Xóa conversation
-    session.delete(conversation)
-    session.commit()
+    # Xóa conversation, commit cùng một transaction
+    await session.delete(conversation)
+    await session.commit()
     
     return {"message": "Đã xóa conversation thành công", "conversation_id": conversation_id}
 
@@ -654,51 +668,27 @@ def agent_suggestions(payload: chat_schema.AgentSuggestionRequest, user: User =
 @router.post("/agents/chat")
 async def chat_with_agent(
     payload: chat_schema.AgentChatRequest,
-    session: Session = Depends(deps.get_db),
-    user: User = Depends(deps.get_current_user),
+    session: AsyncSession = Depends(deps.get_async_db),
+    user: User = Depends(deps.get_current_user_async),
 ):
     if payload.agent_id not in AGENT_CHOICES:
         raise HTTPException(status_code=404, detail="agent_not_found")
-    
-    # Nếu có session_id, load conversation hiện có
-    if payload.session_id:
-        chat_session = session.exec(
-            select(ChatSession)
-            .where(ChatSession.id == payload.session_id, ChatSession.user_id == user.id)
-        ).first()
-        
-        if not chat_session:
-            raise HTTPException(status_code=404, detail="conversation_not_found")
-        
-        # Kiểm tra agent_id có khớp với conversation không
-        if chat_session.agent_id != payload.agent_id:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"agent_mismatch: conversation thuộc về {chat_session.agent_id}, không thể dùng {payload.agent_id}"
-            )
-    else:
-        # Tự động tạo conversation mới nếu không có session_id (backward compatibility)
-        profile = _get_agent_profile(payload.agent_id)
-        hero_name = (payload.metadata or {}).get("hero_name") or profile.persona_name
-        topic = (payload.metadata or {}).get("topic")
-        
-        chat_session = ChatSession(
-            user_id=user.id,
-            agent_id=payload.agent_id,
-            hero_name=hero_name,
-            topic=topic,
-        )
-        session.add(chat_session)
-        session.commit()
-        session.refresh(chat_session)
-    
-    # Load lịch sử messages của conversation này
-    history_messages = session.exec(
-        select(SessionMessage)
-        .where(SessionMessage.session_id == chat_session.id)
-        .order_by(SessionMessage.created_at)
-    ).all()
-    
+
+    # Retrieval chạy song song với việc nạp hội thoại + lịch sử (DB async, không chặn loop).
+    analysis = _override_analysis_for_agent(_analyze_question(payload.query), payload.agent_id)
+    prompt_deadline = Deadline(settings.chat_retrieval_budget)
+    retrieval = asyncio.create_task(
+        _retrieve_context_async(payload.query, analysis, Deadline(settings.rag_retrieve_budget))
+    )
+    try:
+        chat_session, history_messages = await _load_chat_history(session, payload, user)
+    except BaseException:
+        retrieval.cancel()
+        raise
+    # Prompt chỉ chờ tư liệu trong ngân sách nhỏ; về trễ thì vẫn dùng làm nguồn ở metadata.
+    await asyncio.wait({retrieval}, timeout=prompt_deadline.remaining())
+    prompt_docs = _retrieval_result(retrieval)
+
     # Build system prompt và messages
     system_prompt = _compose_system_prompt(payload.agent_id, hero_name=chat_session.hero_name)
     
@@ -715,6 +705,7 @@ async def chat_with_agent(
     
     # Thêm câu hỏi hiện tại
     user_prompt = (
+        f"{_format_prompt_context(prompt_docs)}"
         f"Câu hỏi của người học: {payload.query}\n\n"
         "Hãy trả lời bằng tiếng Việt theo phong cách markdown:\n"
         "- Dùng kiến thức lịch sử chính xác\n"
@@ -745,19 +736,25 @@ async def chat_with_agent(
                     # Gửi chunk về frontend
                     yield f"data: {json.dumps({'type': 'content', 'content': content})}\n\n"
             
-            # Streaming xong, generate fake sources và graph
-            fake_sources = _extract_sources_from_answer(full_answer, payload.agent_id)
-            fake_graph_links = _extract_graph_links_from_answer(full_answer, payload.agent_id, hero_name=chat_session.hero_name)
+            # Streaming xong: nguồn là chunk retrieval thật, graph link lấy từ knowledge graph
+            if not retrieval.done():
+                await asyncio.wait({retrieval})
+            sources = _format_context_chunks(prompt_docs or _retrieval_result(retrieval))
+            graph_links = await _answer_graph_links(full_answer, chat_session.hero_name)
             
-            # Lưu vào DB
-            session.add(SessionMessage(session_id=chat_session.id, role="user", content=payload.query))
-            session.add(SessionMessage(session_id=chat_session.id, role="assistant", content=full_answer))
-            chat_session.last_message_at = datetime.utcnow()
-            session.add(chat_session)
-            session.commit()
+            # Lưu vào DB: session của dependency đã đóng khi response bắt đầu stream nên mở session riêng
+            async with get_async_session() as db:
+                db.add(SessionMessage(session_id=chat_session.id, role="user", content=payload.query))
+                db.add(SessionMessage(session_id=chat_session.id, role="assistant", content=full_answer))
+                await db.execute(
+                    update(ChatSession)
+                    .where(ChatSession.id == chat_session.id)
+                    .values(last_message_at=datetime.utcnow())
+                )
+                await db.commit()
             
             # Gửi metadata cuối cùng
-            yield f"data: {json.dumps({'type': 'metadata', 'sources': [s.model_dump() for s in fake_sources], 'graph_links': [g.model_dump() for g in fake_graph_links], 'session_id': str(chat_session.id)})}\n\n"
+            yield f"data: {json.dumps({'type': 'metadata', 'sources': [s.model_dump() for s in sources], 'graph_links': [g.model_dump() for g in graph_links], 'session_id': str(chat_session.id)})}\n\n"
             yield "data: [DONE]\n\n"
             
         except Exception as e:
@@ -766,159 +763,74 @@ async def chat_with_agent(
     return StreamingResponse(generate_stream(), media_type="text/event-stream")
 
 
-@router.post("/agents/feedback")
-def feedback(payload: chat_schema.FeedbackRequest) -> dict:
-    return {"message": "Đã ghi nhận đánh giá", "session_id": payload.session_id}
-
-
-def _extract_sources_from_answer(answer: str, agent_id: str) -> list[chat_schema.ContextChunk]:
-    """Fake RAG sources bằng cách trích xuất từ answer của LLM."""
-    profile = _get_agent_profile(agent_id)
-    
-    # Prompt LLM để tạo fake sources giống sách thật
-    system_prompt = (
-        "Bạn là hệ thống tạo trích dẫn từ sách lịch sử 'Việt Nam Sử Lược'. "
-        "Dựa vào câu trả lời được cung cấp, hãy tạo ra 3-4 đoạn văn như thể chúng được trích từ sách gốc.\n\n"
-        "YÊU CẦU:\n"
-        "- Viết LẠI nội dung bằng văn phong sách giáo khoa (khách quan, học thuật, ngôi thứ 3)\n"
-        "- KHÔNG copy y nguyên câu trả lời, phải diễn đạt khác\n"
-        "- Mỗi đoạn 2-3 câu, chứa thông tin cụ thể: năm, địa điểm, nhân vật\n"
-        "- Viết như đang đọc từ sách lịch sử chính thống\n"
-        "- Không dùng 'ta', 'trẫm', chỉ dùng tên nhân vật\n"
-        "- Topic ngắn gọn (3-5 từ)\n\n"
-        "Trả về JSON: {\"sources\": [{\"text\": \"nội dung đoạn trích\", \"topic\": \"chủ đề ngắn\"}, ...]}"
-    )
-    
-    user_prompt = (
-        f"Câu trả lời cần chuyển thành trích dẫn sách:\n\n{answer}\n\n"
-        f"Triều đại/Giai đoạn: {profile.period_label}\n"
-        f"Nhân vật chính: {profile.persona_name}"
-    )
-    
-    try:
-        completion = llm_client.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0.3,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-        )
+async def _load_chat_history(
+    session: AsyncSession, payload: chat_schema.AgentChatRequest, user: User
+) -> tuple[ChatSession, list[SessionMessage]]:
+    # Nếu có session_id, load conversation hiện có
+    if payload.session_id:
+        chat_session = (
+            await session.exec(
+                select(ChatSession)
+                .where(ChatSession.id == payload.session_id, ChatSession.user_id == user.id)
+            )
+        ).first()
         
-        content = completion.choices[0].message.content.strip()
-        # Parse JSON
-        import json
-        data = json.loads(content)
+        if not chat_session:
+            raise HTTPException(status_code=404, detail="conversation_not_found")
         
-        # Format thành ContextChunk objects
-        sources = []
-        for idx, source in enumerate(data.get("sources", [])[:4], 1):
-            topic = source.get("topic", f"Đoạn {idx}")
-            sources.append(
-                chat_schema.ContextChunk(
-                    chunk_id=idx * 100,
-                    text=source.get("text", ""),
-                    source=f"Việt Nam Sử Lược · {topic}",
-                    dynasty=profile.period_label,
-                    entities=[],
-                    score=0.88 - (idx * 0.03),  # Score từ 88% giảm dần
-                )
+        # Kiểm tra agent_id có khớp với conversation không
+        if chat_session.agent_id != payload.agent_id:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"agent_mismatch: conversation thuộc về {chat_session.agent_id}, không thể dùng {payload.agent_id}"
             )
+    else:
+        # Tự động tạo conversation mới nếu không có session_id (backward compatibility)
+        profile = _get_agent_profile(payload.agent_id)
+        hero_name = (payload.metadata or {}).get("hero_name") or profile.persona_name
+        topic = (payload.metadata or {}).get("topic")
         
-        return sources
-    except Exception as e:
-        print(f"Error extracting sources: {e}")
-        # Fallback: chia answer thành đoạn và diễn đạt lại
-        paragraphs = [p.strip() for p in answer.split('\n\n') if p.strip() and not p.startswith('#') and not p.startswith('-')]
-        sources = []
-        for idx, para in enumerate(paragraphs[:4], 1):
-            if len(para) > 50:  # Chỉ lấy đoạn dài
-                # Loại bỏ ngôi thứ nhất
-                text = para.replace("ta ", f"{profile.persona_name} ")
-                text = text.replace("Ta ", f"{profile.persona_name} ")
-                text = text.replace("trẫm ", f"{profile.persona_name} ")
-                text = text[:200] + "..." if len(text) > 200 else text
-                
-                sources.append(
-                    chat_schema.ContextChunk(
-                        chunk_id=idx * 100,
-                        text=text,
-                        source=f"Việt Nam Sử Lược · Chương {idx}",
-                        dynasty=profile.period_label,
-                        entities=[],
-                        score=0.88 - (idx * 0.03),
-                    )
-                )
-        
-        return sources
-
-
-def _extract_graph_links_from_answer(answer: str, agent_id: str, hero_name: str | None = None) -> list[chat_schema.GraphLink]:
-    """Fake graph links như đi trên đồ thị tri thức."""
-    profile = _get_agent_profile(agent_id)
-    
-    # Use specific hero_name if provided, otherwise fallback to profile default
-    final_persona = hero_name or profile.persona_name
-    
-    system_prompt = (
-        "Bạn là hệ thống Knowledge Graph. "
-        "Nhiệm vụ: phân tích câu trả lời lịch sử và tạo 3-4 chuỗi mối quan hệ (path) trên đồ thị tri thức.\n\n"
-        "FORMAT QUAN HỆ (dùng →):\n"
-        "- Triều đại → Nhân vật → Sự kiện → Địa điểm\n"
-        "- VD: 'Nhà Lý → Lý Công Uẩn → Chiếu dời đô → Thăng Long'\n\n"
-        "YÊU CẦU:\n"
-        "- relation: Chuỗi entities nối bằng mũi tên →\n"
-        "- description: Giải thích ngắn gọn mối quan hệ (1-2 câu, có năm nếu có)\n"
-        "- Tạo đa dạng các loại quan hệ: nhân vật-sự kiện, sự kiện-địa điểm, nhân vật-triều đại\n\n"
-        "Trả về JSON: {\"links\": [{\"relation\": \"Entity1 → Entity2 → Entity3\", \"description\": \"...\"}, ...]}"
-    )
-    
-    user_prompt = (
-        f"Câu trả lời:\n\n{answer}\n\n"
-        f"Triều đại: {profile.period_label}\n"
-        f"Nhân vật: {final_persona}"
-    )
+        chat_session = ChatSession(
+            user_id=user.id,
+            agent_id=payload.agent_id,
+            hero_name=hero_name,
+            topic=topic,
+        )
+        session.add(chat_session)
+        await session.commit()
+        await session.refresh(chat_session)
     
-    try:
-        completion = llm_client.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0.3,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
+    # Load lịch sử messages của conversation này
+    history_messages = (
+        await session.exec(
+            select(SessionMessage)
+            .where(SessionMessage.session_id == chat_session.id)
+            .order_by(SessionMessage.created_at)
         )
-        
-        content = completion.choices[0].message.content.strip()
-        import json
-        data = json.loads(content)
-        
-        links = []
-        for idx, link in enumerate(data.get("links", [])[:4], 1):
-            links.append(
-                chat_schema.GraphLink(
-                    relation=link.get("relation", f"Quan hệ {idx}"),
-                    description=link.get("description", ""),
-                    chunk_id=idx * 100,
-                )
-            )
-        
-        return links
-    except Exception as e:
-        print(f"Error extracting graph links: {e}")
-        # Fallback: tạo quan hệ cơ bản
-        return [
-            chat_schema.GraphLink(
-                relation=f"{profile.period_label} → {final_persona}",
-                description=f"{final_persona} là nhân vật tiêu biểu của {profile.period_label}",
-                chunk_id=100,
-            ),
-            chat_schema.GraphLink(
-                relation=f"{final_persona} → Sự kiện lịch sử",
-                description=f"Các sự kiện quan trọng gắn liền với {final_persona}",
-                chunk_id=200,
-            ),
-        ]
+    ).all()
+    return chat_session, list(history_messages)
+
+
+def _retrieval_result(task: asyncio.Task) -> list[dict]:
+    if not task.done() or task.cancelled() or task.exception() is not None:
+        return []
+    return task.result()
+
+
+def _format_prompt_context(docs: list[dict]) -> str:
+    if not docs:
+        return ""
+    lines = ["Tư liệu tham khảo (trích từ sách, chỉ dùng phần liên quan, không bịa thêm nguồn):"]
+    for idx, doc in enumerate(docs[: settings.chat_context_chunks], 1):
+        page = page_label(doc.get("page_start"), doc.get("page_end"))
+        suffix = f" (tr. {page})" if page else ""
+        lines.append(f"[{idx}] {_summarize_text(doc.get('text', ''), settings.chat_context_chars)}{suffix}")
+    return "\n".join(lines) + "\n\n"
+
+
+@router.post("/agents/feedback")
+def feedback(payload: chat_schema.FeedbackRequest) -> dict:
+    return {"message": "Đã ghi nhận đánh giá", "session_id": payload.session_id}
 
 
 def _build_answer_with_history(
@@ -1029,18 +941,39 @@ def _match_period(normalized_question: str) -> str | None:
     return None
 
 
-def _retrieve_context(question: str, analysis: RequestAnalysis) -> list[dict]:
+async def _retrieve_context_async(question: str, analysis: RequestAnalysis, deadline: Deadline) -> list[dict]:
     filters: dict[str, tuple[str, ...]] = {}
     if analysis.rag_periods:
         filters["period"] = analysis.rag_periods
     try:
-        docs = rag_service.retrieve(question, top_k=5, filters=filters or None)
-    except RuntimeError:
+        docs = await rag_service.retrieve_async(question, top_k=5, filters=filters or None, deadline=deadline)
+    except (RuntimeError, asyncio.TimeoutError):
         return []
     docs = _filter_docs_by_entity(docs, analysis.character_event)
     return docs[:5]
 
 
+async def _graph_links_async(chunk_ids: list[int], deadline: Deadline) -> list[dict]:
+    if not chunk_ids or deadline.expired:
+        return []
+    try:
+        return await graph_service.get_links_for_chunks_async(
+            chunk_ids, timeout=deadline.remaining(settings.graph_query_timeout)
+        )
+    except Exception:
+        # Hết ngân sách hoặc Neo4j lỗi: _ensure_graph_links sẽ dựng link từ context.
+        return []
+
+
+async def _answer_graph_links(answer: str, hero_name: str | None) -> list[chat_schema.GraphLink]:
+    # Entity trong câu trả lời (gazetteer) + quan hệ thật trong graph; không gọi LLM.
+    try:
+        links = await graph_service.links_for_text_async(answer, prefer=hero_name)
+    except Exception:
+        return []
+    return [chat_schema.GraphLink(**link) for link in links]
+
+
 def _filter_docs_by_entity(docs: list[dict], character_event: str | None) -> list[dict]:
     if not character_event:
         return docs
@@ -1052,10 +985,12 @@ def _filter_docs_by_entity(docs: list[dict], character_event: str | None) -> lis
 def _format_context_chunks(docs: list[dict]) -> list[chat_schema.ContextChunk]:
     formatted: list[chat_schema.ContextChunk] = []
     for doc in docs[:5]:
-        page_hint = doc.get("page") or doc.get("chunk_id")
+        page = page_label(doc.get("page_start"), doc.get("page_end"))
         source_display = f"{doc.get('source') or CONTEXT_SOURCE_PATH}"
-        if page_hint:
-            source_display = f"{source_display} · đoạn {page_hint}"
+        if page:
+            source_display = f"{source_display} · tr. {page}"
+        elif doc.get("chunk_id"):
+            source_display = f"{source_display} · đoạn {doc['chunk_id']}"
         formatted.append(
             chat_schema.ContextChunk(
                 chunk_id=int(doc.get("chunk_id", 0)),
@@ -1064,6 +999,7 @@ def _format_context_chunks(docs: list[dict]) -> list[chat_schema.ContextChunk]:
                 dynasty=doc.get("dynasty"),
                 entities=doc.get("entities") or [],
                 score=doc.get("score"),
+                page=page,
             )
         )
     return formatted
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, HTTPException, Query
+
+from app.schemas import content as content_schema
+from app.services.cooccurrence import current_cooccurrence
+
+router = APIRouter(prefix="/graph", tags=["Graph"])
+
+
+@router.get("/entities/{name}/neighbors", response_model=content_schema.EntityNeighborsResponse)
+def entity_neighbors(
+    name: str,
+    k: int = Query(default=10, ge=1, le=50),
+    hops: int = Query(default=2, ge=1, le=2),
+    per_hop: int = Query(default=20, ge=1, le=50),
+) -> content_schema.EntityNeighborsResponse:
+    graph = current_cooccurrence()
+    if graph is None:
+        raise HTTPException(status_code=503, detail="cooccurrence_unavailable")
+    idx = graph.find(name)
+    if idx is None:
+        raise HTTPException(status_code=404, detail="entity_not_found")
+    return content_schema.EntityNeighborsResponse(
+        entity=graph.names[idx],
+        mentions=int(graph.mentions[idx]),
+        neighbors=graph.neighbors(idx, k),
+        paths=graph.two_hop(idx, k, per_hop) if hops == 2 else [],
+    )
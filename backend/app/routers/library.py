@@ -4,6 +4,7 @@ from sqlmodel import Session, select
 from app import deps
 from app.models.core import LibraryDocument, LibraryTopic
 from app.schemas import content as content_schema
+from app.services.chunk_store import current_chunk_store
 
 router = APIRouter(prefix="/library", tags=["Library"])
 
@@ -68,6 +69,26 @@ def document_detail(doc_id: int, session: Session = Depends(deps.get_db)) -> con
     return content_schema.LibraryDocumentOut(id=doc.id, source=doc.source, period=doc.period, content=doc.content)
 
 
+@router.get("/chunks/{chunk_id}", response_model=content_schema.LibraryChunkOut)
+def chunk_detail(chunk_id: int) -> content_schema.LibraryChunkOut:
+    store = current_chunk_store()
+    if store is None:
+        raise HTTPException(status_code=503, detail="chunk_store_unavailable")
+    record = store.get(chunk_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="chunk_not_found")
+    return content_schema.LibraryChunkOut(
+        chunk_id=record["chunk_id"],
+        text=record["text"],
+        source=record["source"],
+        period=record["period"],
+        period_readable=record["period_readable"],
+        entities=record["entities"],
+        page_start=record["page_start"] or None,
+        page_end=record["page_end"] or None,
+    )
+
+
 def _seed(session: Session):
     topic = LibraryTopic(
         title="Chiếu dời đô",
@@ -1,7 +1,7 @@
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app import deps
 from app.models.core import Memory
@@ -11,16 +11,22 @@ router = APIRouter(prefix="/memory", tags=["Memory"])
 
 
 @router.get("/last", response_model=MemoryResponse)
-def get_last(current_user=Depends(deps.get_current_user), session: Session = Depends(deps.get_db)):
-    memory = session.get(Memory, current_user.id)
+async def get_last(
+    current_user=Depends(deps.get_current_user_async), session: AsyncSession = Depends(deps.get_async_db)
+):
+    memory = await session.get(Memory, current_user.id)
     if not memory:
         raise HTTPException(status_code=404, detail="memory_not_found")
     return MemoryResponse(agent_id=memory.agent_id, topic=memory.topic, session_id=memory.session_id, updated_at=memory.updated_at)
 
 
 @router.put("/last", response_model=MemoryResponse)
-def update_last(payload: MemoryUpdate, current_user=Depends(deps.get_current_user), session: Session = Depends(deps.get_db)):
-    memory = session.get(Memory, current_user.id)
+async def update_last(
+    payload: MemoryUpdate,
+    current_user=Depends(deps.get_current_user_async),
+    session: AsyncSession = Depends(deps.get_async_db),
+):
+    memory = await session.get(Memory, current_user.id)
     if not memory:
         memory = Memory(user_id=current_user.id, agent_id=payload.agent_id, topic=payload.topic, session_id=payload.session_id, updated_at=datetime.utcnow())
     else:
@@ -29,6 +35,6 @@ def update_last(payload: MemoryUpdate, current_user=Depends(deps.get_current_use
         memory.session_id = payload.session_id
         memory.updated_at = datetime.utcnow()
     session.add(memory)
-    session.commit()
-    session.refresh(memory)
+    await session.commit()
+    await session.refresh(memory)
     return MemoryResponse(agent_id=memory.agent_id, topic=memory.topic, session_id=memory.session_id, updated_at=memory.updated_at)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app import deps
 from app.schemas.notifications import NotificationList
@@ -9,12 +9,18 @@ router = APIRouter(prefix="/notifications", tags=["Notifications"])
 
 
 @router.get("", response_model=NotificationList)
-def list_notifications(current_user=Depends(deps.get_current_user), session: Session = Depends(deps.get_db)):
-    items = notification_service.list_notifications(session, current_user.id)
+async def list_notifications(
+    current_user=Depends(deps.get_current_user_async), session: AsyncSession = Depends(deps.get_async_db)
+):
+    items = await notification_service.list_notifications(session, current_user.id)
     return NotificationList(items=items)
 
 
 @router.post("/{notification_id}/read")
-def mark_notification(notification_id: int, current_user=Depends(deps.get_current_user), session: Session = Depends(deps.get_db)):
-    notification_service.mark_read(session, current_user.id, notification_id)
+async def mark_notification(
+    notification_id: int,
+    current_user=Depends(deps.get_current_user_async),
+    session: AsyncSession = Depends(deps.get_async_db),
+):
+    await notification_service.mark_read(session, current_user.id, notification_id)
     return {"status": "ok"}
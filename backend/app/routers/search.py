@@ -1,13 +1,50 @@
 from fastapi import APIRouter, Depends
 
 from app import deps
-from app.schemas.content import SearchRequest, SearchResponse
+from app.schemas.content import (
+    BatchSearchRequest,
+    BatchSearchResponse,
+    LibraryDocumentOut,
+    SearchRequest,
+    SearchResponse,
+)
 from app.services.rag import rag_service
 
 router = APIRouter(prefix="/search", tags=["Search"])
 
 
+def _to_document(chunk: dict) -> LibraryDocumentOut:
+    return LibraryDocumentOut(
+        id=chunk["chunk_id"],
+        source=chunk.get("source") or "",
+        period=chunk.get("dynasty") or "Unknown",
+        content=chunk.get("text") or "",
+    )
+
+
 @router.post("", response_model=SearchResponse)
-def search(payload: SearchRequest) -> SearchResponse:
-    docs = rag_service.retrieve(payload.query, top_k=payload.top_k, filters=payload.filters)
-    return SearchResponse(docs=docs)
+async def search(payload: SearchRequest) -> SearchResponse:
+    docs = await rag_service.retrieve_async(
+        payload.query,
+        top_k=payload.top_k,
+        filters=payload.filters,
+        mode=payload.mode,
+        search_params=payload.search_params(),
+    )
+    return SearchResponse(docs=[_to_document(doc) for doc in docs])
+
+
+@router.post("/batch", response_model=BatchSearchResponse)
+async def search_batch(payload: BatchSearchRequest) -> BatchSearchResponse:
+    requests = [
+        {
+            "query": item.query,
+            "top_k": item.top_k,
+            "filters": item.filters,
+            "mode": item.mode,
+            "search_params": item.search_params(),
+        }
+        for item in payload.queries
+    ]
+    results = await rag_service.retrieve_many_async(requests)
+    return BatchSearchResponse(results=[SearchResponse(docs=[_to_document(doc) for doc in docs]) for docs in results])
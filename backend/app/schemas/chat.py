@@ -16,6 +16,7 @@ class ContextChunk(BaseModel):
     dynasty: Optional[str] = None
     entities: List[str] | None = None
     score: Optional[float] = None
+    page: Optional[str] = None
 
 
 class GraphLink(BaseModel):
@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class TimelineNodeOut(BaseModel):
@@ -44,6 +44,35 @@ class LibraryDocumentOut(BaseModel):
     content: str
 
 
+class LibraryChunkOut(BaseModel):
+    chunk_id: int
+    text: str
+    source: str
+    period: str
+    period_readable: str
+    entities: list[str]
+    page_start: int | None = None
+    page_end: int | None = None
+
+
+class EntityNeighborOut(BaseModel):
+    name: str
+    weight: int
+
+
+class EntityPathOut(BaseModel):
+    path: list[str]
+    weights: list[int]
+    score: int
+
+
+class EntityNeighborsResponse(BaseModel):
+    entity: str
+    mentions: int
+    neighbors: list[EntityNeighborOut]
+    paths: list[EntityPathOut] = []
+
+
 class LibraryListResponse(BaseModel):
     cursor: Optional[str] = None
     items: List[LibraryTopicOut]
@@ -53,12 +82,27 @@ class SearchRequest(BaseModel):
     query: str
     top_k: int = 4
     filters: dict | None = None
+    mode: Literal["vector", "lexical", "hybrid"] | None = None
+    ef: int | None = Field(default=None, ge=1)
+    nprobe: int | None = Field(default=None, ge=1)
+
+    def search_params(self) -> dict[str, int] | None:
+        params = {key: value for key, value in (("ef", self.ef), ("nprobe", self.nprobe)) if value}
+        return params or None
 
 
 class SearchResponse(BaseModel):
     docs: List[LibraryDocumentOut]
 
 
+class BatchSearchRequest(BaseModel):
+    queries: List[SearchRequest] = Field(min_length=1, max_length=16)
+
+
+class BatchSearchResponse(BaseModel):
+    results: List[SearchResponse]
+
+
 class MemoryResponse(BaseModel):
     agent_id: str
     topic: str
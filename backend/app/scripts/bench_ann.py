@@ -0,0 +1,149 @@
+"""
+Benchmark ANN: quét tham số search (ef cho HNSW, nprobe cho IVF) và đo recall@k / độ trễ p95
+so với ground truth brute-force chính xác (numpy) trên chính corpus trong Milvus.
+Chạy: python -m app.scripts.bench_ann --index-types HNSW,IVF_FLAT --queries 200 --k 10
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, connections, utility
+
+from app.config import get_settings
+from app.services.manifest import read_manifest
+
+settings = get_settings()
+
+SWEEPS = {
+    "HNSW": ("ef", [16, 32, 64, 128, 256, 512]),
+    "IVF_FLAT": ("nprobe", [1, 4, 8, 16, 32, 64, 128]),
+    "IVF_SQ8": ("nprobe", [1, 4, 8, 16, 32, 64, 128]),
+    "FLAT": (None, [None]),
+}
+
+
+def live_collection_name() -> str:
+    # Như RAGService._live_collection: manifest trỏ tới collection của version đang live. Trước khi
+    # migrate, tên trong settings vẫn là collection cũ, không phải index dựng theo tham số mới.
+    manifest = read_manifest() or {}
+    return manifest.get("collection") or settings.milvus_collection
+
+
+def load_corpus(collection: Collection) -> tuple[np.ndarray, np.ndarray]:
+    ids: list[int] = []
+    vectors: list[list[float]] = []
+    iterator = collection.query_iterator(batch_size=1000, output_fields=["chunk_id", "embedding"])
+    while True:
+        batch = iterator.next()
+        if not batch:
+            iterator.close()
+            break
+        for row in batch:
+            ids.append(int(row["chunk_id"]))
+            vectors.append(row["embedding"])
+    return np.asarray(ids, dtype=np.int64), np.asarray(vectors, dtype=np.float32)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ vectors.T
+    top = np.argpartition(-scores, kth=min(k, scores.shape[1] - 1), axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+
+def index_params_for(index_type: str, n: int) -> dict:
+    if index_type == settings.milvus_index_type.upper():
+        params = dict(settings.milvus_index_params)
+    elif index_type == "HNSW":
+        params = {"M": 16, "efConstruction": 200}
+    elif index_type.startswith("IVF"):
+        params = {"nlist": max(16, int(4 * math.sqrt(n)))}
+    else:
+        params = {}
+    return {"metric_type": settings.milvus_metric_type, "index_type": index_type, "params": params}
+
+
+def build_bench_collection(index_type: str, ids: np.ndarray, vectors: np.ndarray) -> Collection:
+    name = f"{settings.milvus_collection}_bench_{index_type.lower()}"
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+    schema = CollectionSchema(
+        fields=[
+            FieldSchema(name="chunk_id", dtype=DataType.INT64, is_primary=True, auto_id=False),
+            FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=vectors.shape[1]),
+        ],
+        description="ANN benchmark (tạm thời)",
+    )
+    collection = Collection(name=name, schema=schema)
+    for start in range(0, len(ids), 1000):
+        collection.insert([ids[start : start + 1000].tolist(), vectors[start : start + 1000].tolist()])
+    collection.flush()
+    collection.create_index(field_name="embedding", index_params=index_params_for(index_type, len(ids)))
+    collection.load()
+    return collection
+
+
+def run_sweep(
+    collection: Collection,
+    index_type: str,
+    ids: np.ndarray,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    k: int,
+) -> None:
+    param_name, values = SWEEPS.get(index_type, (None, [None]))
+    for value in values:
+        params = {param_name: max(value, k) if param_name == "ef" else value} if param_name else {}
+        latencies: list[float] = []
+        hits = 0
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            result = collection.search(
+                data=[query.tolist()],
+                anns_field="embedding",
+                param={"metric_type": settings.milvus_metric_type, "params": params},
+                limit=k,
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+            found = {hit.id for hit in result[0]}
+            hits += len(found & set(ids[expected].tolist()))
+        recall = hits / (len(queries) * k)
+        p50, p95 = np.percentile(latencies, [50, 95])
+        label = f"{param_name}={params[param_name]}" if param_name else "-"
+        print(f"{index_type:<10} {label:<12} recall@{k}={recall:.4f}  p50={p50:.2f}ms  p95={p95:.2f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-types", default=settings.milvus_index_type.upper())
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    connections.connect(alias="default", host=settings.milvus_host, port=settings.milvus_port)
+    live = Collection(live_collection_name())
+    live.load()
+    ids, vectors = load_corpus(live)
+    rng = np.random.default_rng(args.seed)
+    picks = rng.choice(len(ids), size=min(args.queries, len(ids)), replace=False)
+    # Truy vấn = vector có sẵn + nhiễu nhỏ, để không trùng khít với chính chunk.
+    queries = vectors[picks] + rng.normal(0, 0.01, size=(len(picks), vectors.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = exact_top_k(vectors, queries, args.k)
+    print(f"collection={live.name} corpus={len(ids)} dim={vectors.shape[1]} queries={len(queries)} k={args.k}")
+
+    for index_type in [item.strip().upper() for item in args.index_types.split(",") if item.strip()]:
+        if index_type == settings.milvus_index_type.upper():
+            run_sweep(live, index_type, ids, queries, truth, args.k)
+            continue
+        bench = build_bench_collection(index_type, ids, vectors)
+        try:
+            run_sweep(bench, index_type, ids, queries, truth, args.k)
+        finally:
+            utility.drop_collection(bench.name)
+
+
+if __name__ == "__main__":
+    main()
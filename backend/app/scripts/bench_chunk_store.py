@@ -0,0 +1,97 @@
+"""
+Benchmark chunk store: so sánh meta.json (json.load toàn bộ) với chunk store mmap trên corpus
+tổng hợp N chunk. Báo cáo thời gian mở, RSS tăng thêm sau khi mở và thời gian tra ngẫu nhiên theo chunk_id.
+Mỗi cấu hình chạy trong process riêng để RSS không lẫn nhau.
+Chạy: python -m app.scripts.bench_chunk_store --sizes 10000,100000
+"""
+import argparse
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.scripts.bench_ingest_memory import WORDS
+from app.scripts.build_rag import make_record
+from app.services.chunk_store import ChunkStore, ChunkStoreWriter
+
+LOOKUPS = 10_000
+
+
+def rss_mb() -> float:
+    # RSS hiện tại (không phải peak) để thấy phần tăng thêm sau khi mở.
+    for line in Path("/proc/self/status").read_text().splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def synthetic_records(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    for number in range(count):
+        text = f"Đoạn {number}. " + " ".join(rng.choice(WORDS) for _ in range(180))
+        yield make_record("bench.pdf", text, number // 3 + 1, number // 3 + 1)
+
+
+def write_files(count: int, directory: Path) -> list[int]:
+    records = list(synthetic_records(count))
+    (directory / "meta.json").write_text(json.dumps(records, ensure_ascii=False, indent=2), encoding="utf-8")
+    with ChunkStoreWriter(directory / "chunks.bin") as writer:
+        writer.write(records)
+    return [record["chunk_id"] for record in records]
+
+
+def child(mode: str, directory: Path) -> None:
+    ids = json.loads((directory / "ids.json").read_text())
+    probes = random.Random(1).choices(ids, k=LOOKUPS)
+    before = rss_mb()
+    started = time.perf_counter()
+    if mode == "json":
+        by_id = {record["chunk_id"]: record for record in json.loads((directory / "meta.json").read_text("utf-8"))}
+        lookup = by_id.get
+    else:
+        lookup = ChunkStore(directory / "chunks.bin").get
+    opened = time.perf_counter() - started
+    opened_rss = rss_mb() - before
+    started = time.perf_counter()
+    for chunk_id in probes:
+        lookup(chunk_id)["text"]
+    per_lookup = (time.perf_counter() - started) / LOOKUPS
+    print(json.dumps({"open_s": opened, "rss_mb": opened_rss, "lookup_us": per_lookup * 1e6}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--child", choices=["json", "mmap"], help=argparse.SUPPRESS)
+    parser.add_argument("--dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, Path(args.dir))
+        return
+
+    for size in [int(item) for item in args.sizes.split(",") if item.strip()]:
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = Path(tmp)
+            ids = write_files(size, directory)
+            (directory / "ids.json").write_text(json.dumps(ids))
+            sizes = {name: (directory / name).stat().st_size / 2**20 for name in ("meta.json", "chunks.bin")}
+            for mode, filename in (("json", "meta.json"), ("mmap", "chunks.bin")):
+                output = subprocess.run(
+                    [sys.executable, "-m", "app.scripts.bench_chunk_store", "--child", mode, "--dir", tmp],
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(
+                    f"n={size:<7} {mode:<5} file={sizes[filename]:7.1f}MB  open={result['open_s'] * 1000:8.1f}ms  "
+                    f"rss+={result['rss_mb']:7.1f}MB  lookup={result['lookup_us']:.1f}µs"
+                )
+
+
+if __name__ == "__main__":
+    main()
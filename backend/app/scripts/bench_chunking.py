@@ -0,0 +1,63 @@
+"""
+Benchmark chunker: so sánh chunker theo ký tự (bản cũ) với chunker theo câu + token trên toàn bộ sách.
+Báo cáo thời gian, số chunk, phân bố số token và tỉ lệ chunk kết thúc đúng cuối câu.
+Chạy: python -m app.scripts.bench_chunking --repeat 5
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+from app.config import get_settings
+from app.scripts.bench_ingest_memory import legacy_chunk_text
+from app.scripts.build_rag import extract_pages
+from app.utils.chunking import iter_token_chunks
+from app.utils.tokens import count_tokens
+
+settings = get_settings()
+
+SENTENCE_ENDINGS = (".", "!", "?", "…", '"', "”", ")")
+
+
+def report(label: str, texts: list[str], seconds: float) -> None:
+    tokens = [count_tokens(text) for text in texts]
+    clean_end = sum(text.rstrip().endswith(SENTENCE_ENDINGS) for text in texts) / max(1, len(texts))
+    print(
+        f"{label:<10} {seconds * 1000:8.1f}ms  chunks={len(texts):<5} "
+        f"tokens min/median/max={min(tokens)}/{int(statistics.median(tokens))}/{max(tokens)}  "
+        f"ends_at_sentence={clean_end:.0%}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", default=settings.rag_pdf_path)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    pages = extract_pages(Path(args.pdf))
+    print(f"extract: {len(pages)} pages in {time.perf_counter() - started:.1f}s (không tính vào chunking)")
+
+    text = "\n".join(page for _, page in pages)
+    best = float("inf")
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        legacy = legacy_chunk_text(text)
+        best = min(best, time.perf_counter() - started)
+    report("chars", legacy, best)
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        chunks = list(
+            iter_token_chunks(pages, settings.rag_chunk_tokens, settings.rag_chunk_overlap_tokens)
+        )
+        best = min(best, time.perf_counter() - started)
+    report("sentences", [chunk["text"] for chunk in chunks], best)
+    spans = [chunk["page_end"] - chunk["page_start"] for chunk in chunks]
+    print(f"page ranges: {sum(1 for span in spans if span)} chunks span >1 page, max span={max(spans) + 1}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Benchmark throughput DB của route nóng: cùng một truy vấn viết theo kiểu sync (def + Session,
+FastAPI đẩy vào threadpool) và async (async def + AsyncSession) trên cùng database, cùng số
+worker (số thread của threadpool anyio), cùng số request đồng thời.
+- read: danh sách conversation của user kèm số message (như GET /conversations).
+- write: thêm message rồi cập nhật last_message_at (như lưu lượt chat).
+--engines so sánh engine mặc định của SQLAlchemy (không PRAGMA, pool mặc định) với engine
+của app.db (pool theo Settings, SQLite WAL + synchronous=NORMAL + busy_timeout + mmap).
+Chạy: python -m app.scripts.bench_db --requests 2000 --concurrency 64 --workers 40
+      python -m app.scripts.bench_db --workloads write --engines default,tuned
+      (--database-url postgresql://... để đo Postgres; mặc định SQLite tạm)
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+from anyio import to_thread
+from fastapi import Depends, FastAPI
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db import async_database_url, make_async_engine, make_engine
+from app.models.core import ChatSession, SessionMessage, User
+
+
+def build_app(database_url: str, tuned: bool = True) -> tuple[FastAPI, list]:
+    if tuned:
+        engine = make_engine(database_url)
+        async_engine = make_async_engine(async_database_url(database_url))
+    else:
+        connect_args = {"check_same_thread": False} if database_url.startswith("sqlite") else {}
+        engine = create_engine(database_url, connect_args=connect_args)
+        async_engine = create_async_engine(async_database_url(database_url))
+    async_session = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    def get_db():
+        with Session(engine) as session:
+            yield session
+
+    async def get_async_db():
+        async with async_session() as session:
+            yield session
+
+    def count_query(user_id: int):
+        return (
+            select(ChatSession.id, func.count(SessionMessage.id))
+            .outerjoin(SessionMessage, SessionMessage.session_id == ChatSession.id)
+            .where(ChatSession.user_id == user_id)
+            .group_by(ChatSession.id)
+        )
+
+    def touch(session_id: int):
+        return update(ChatSession).where(ChatSession.id == session_id).values(last_message_at=datetime.utcnow())
+
+    app = FastAPI()
+
+    @app.get("/sync/read/{user_id}")
+    def sync_read(user_id: int, session: Session = Depends(get_db)):
+        return dict(session.exec(count_query(user_id)).all())
+
+    @app.post("/sync/write/{session_id}")
+    def sync_write(session_id: int, session: Session = Depends(get_db)):
+        session.add(SessionMessage(session_id=session_id, role="user", content="bench"))
+        session.execute(touch(session_id))
+        session.commit()
+        return {"status": "ok"}
+
+    @app.get("/async/read/{user_id}")
+    async def async_read(user_id: int, session: AsyncSession = Depends(get_async_db)):
+        return dict((await session.exec(count_query(user_id))).all())
+
+    @app.post("/async/write/{session_id}")
+    async def async_write(session_id: int, session: AsyncSession = Depends(get_async_db)):
+        session.add(SessionMessage(session_id=session_id, role="user", content="bench"))
+        await session.execute(touch(session_id))
+        await session.commit()
+        return {"status": "ok"}
+
+    return app, [engine, async_engine]
+
+
+def seed(database_url: str, users: int, sessions_per_user: int, messages: int) -> None:
+    connect_args = {"check_same_thread": False} if database_url.startswith("sqlite") else {}
+    engine = create_engine(database_url, connect_args=connect_args)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        for idx in range(users):
+            user = User(email=f"bench{idx}@example.com", hashed_password="x", display_name=f"bench {idx}")
+            session.add(user)
+            session.flush()
+            for _ in range(sessions_per_user):
+                chat = ChatSession(user_id=user.id, agent_id="agent_ly")
+                session.add(chat)
+                session.flush()
+                session.add_all(
+                    SessionMessage(session_id=chat.id, role="user", content="seed") for _ in range(messages)
+                )
+        session.commit()
+    engine.dispose()
+
+
+async def run(client: httpx.AsyncClient, paths: list[tuple[str, str]], concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in paths:
+        queue.put_nowait(item)
+
+    async def worker() -> None:
+        nonlocal errors
+        while not queue.empty():
+            method, path = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path)
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": len(paths) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+async def bench_engine(args: argparse.Namespace, database_url: str, tuned: bool) -> None:
+    to_thread.current_default_thread_limiter().total_tokens = args.workers
+    app, engines = build_app(database_url, tuned)
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    sessions = args.users * args.sessions
+    label = "tuned" if tuned else "default"
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for workload in [item.strip() for item in args.workloads.split(",") if item.strip()]:
+            for mode in [item.strip() for item in args.modes.split(",") if item.strip()]:
+                if workload == "read":
+                    paths = [("GET", f"/{mode}/read/{idx % args.users + 1}") for idx in range(args.requests)]
+                else:
+                    paths = [("POST", f"/{mode}/write/{idx % sessions + 1}") for idx in range(args.requests)]
+                await run(client, paths[: min(50, len(paths))], args.concurrency)  # warm-up pool/kết nối
+                result = await run(client, paths, args.concurrency)
+                print(
+                    f"{label:<8} {workload:<6} {mode:<6} rps={result['rps']:8.1f}  p50={result['p50_ms']:7.1f}ms  "
+                    f"p95={result['p95_ms']:7.1f}ms  errors={result['errors']}"
+                )
+    engines[0].dispose()
+    await engines[1].dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="mặc định: SQLite tạm, seed dữ liệu mới")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=40, help="số thread threadpool (mặc định của anyio là 40)")
+    parser.add_argument("--workloads", default="read,write")
+    parser.add_argument("--modes", default="sync,async")
+    parser.add_argument("--engines", default="tuned", help="default,tuned để đo trước/sau khi cấu hình pool + PRAGMA")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--sessions", type=int, default=5, help="conversation mỗi user")
+    parser.add_argument("--messages", type=int, default=20, help="message mỗi conversation")
+    args = parser.parse_args()
+
+    print(f"workers={args.workers} concurrency={args.concurrency} requests={args.requests}")
+    engines = [item.strip() for item in args.engines.split(",") if item.strip()]
+    if args.database_url:
+        seed(args.database_url, args.users, args.sessions, args.messages)
+        for name in engines:
+            asyncio.run(bench_engine(args, args.database_url, tuned=name == "tuned"))
+        return
+    # Mỗi cấu hình engine đo trên một file SQLite mới seed, để các lượt ghi trước không làm lệch lượt sau.
+    for name in engines:
+        with tempfile.TemporaryDirectory() as tmp:
+            database_url = f"sqlite:///{Path(tmp) / 'bench.db'}"
+            seed(database_url, args.users, args.sessions, args.messages)
+            asyncio.run(bench_engine(args, database_url, tuned=name == "tuned"))
+
+if __name__ == "__main__":
+    main()
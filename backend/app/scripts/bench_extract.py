@@ -0,0 +1,40 @@
+"""
+Benchmark trích text PDF: số trang/giây theo số process
+Chạy: python -m app.scripts.bench_extract [pdf_path] [--workers 1,2,4,8]
+"""
+import argparse
+import os
+import time
+from pathlib import Path
+
+from app.config import get_settings
+from app.scripts.build_rag import extract_pages
+
+settings = get_settings()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Đo pages/sec của extract_pages theo số worker")
+    parser.add_argument("pdf_path", nargs="?", default=settings.rag_pdf_path)
+    parser.add_argument("--workers", default=None, help="danh sách số worker, vd 1,2,4")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    if args.workers:
+        counts = [int(item) for item in args.workers.split(",") if item.strip()]
+    else:
+        counts = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+    pdf_path = Path(args.pdf_path)
+    print(f"pdf={pdf_path.name} cores={cores}")
+    baseline = None
+    for workers in counts:
+        start = time.perf_counter()
+        pages = extract_pages(pdf_path, workers=workers)
+        elapsed = time.perf_counter() - start
+        rate = len(pages) / elapsed if elapsed else 0.0
+        baseline = baseline or rate
+        print(f"workers={workers:<3} pages={len(pages):<5} time={elapsed:.2f}s  {rate:.1f} pages/s  speedup={rate / baseline:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark gắn nhãn chunk khi ingest: so sánh cách cũ (mỗi cụm một lần `in` trên text) với
+automaton của gazetteer khi số cụm tăng dần. Cụm tổng hợp là tên 2–4 âm tiết ngẫu nhiên,
+cộng thêm gazetteer thật dựng từ timeline_seed.json.
+Chạy: python -m app.scripts.bench_gazetteer --chunks 500 --sizes 100,1000,5000
+"""
+import argparse
+import random
+import time
+
+from app.utils.gazetteer import ChunkTagger, Gazetteer, Term, chunk_tagger
+
+SYLLABLES = (
+    "lý trần lê nguyễn ngô đinh hồ mạc trịnh phạm hoàng văn thị công quốc đức minh thánh tông "
+    "thái tổ nhân hưng đạo quang trung gia long thăng bạch đằng sơn hải an nam bắc đông tây"
+).split()
+FILLER = "vua quân dân triều đình kinh thành đánh giặc năm sử chép rằng thì là của có một những các".split()
+
+
+def synthetic_terms(count: int, rng: random.Random) -> list[str]:
+    terms: set[str] = set()
+    while len(terms) < count:
+        terms.add(" ".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(terms)
+
+
+def synthetic_chunks(count: int, rng: random.Random, words: int = 400) -> list[str]:
+    vocab = SYLLABLES + FILLER * 3
+    return [" ".join(rng.choice(vocab) for _ in range(words)) for _ in range(count)]
+
+
+def legacy_tag(terms: list[str], text: str) -> list[str]:
+    lowered = text.lower()
+    return [term for term in terms if term in lowered]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--sizes", default="100,1000,5000")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    chunks = synthetic_chunks(args.chunks, rng)
+    base = chunk_tagger()
+    start = time.perf_counter()
+    for text in chunks:
+        base.tag(text)
+    elapsed = time.perf_counter() - start
+    print(f"timeline  terms={len(base.gazetteer):<6} tag={elapsed / len(chunks) * 1e6:8.1f}µs/chunk")
+
+    for size in [int(item) for item in args.sizes.split(",") if item.strip()]:
+        terms = synthetic_terms(size, rng)
+        start = time.perf_counter()
+        tagger = ChunkTagger(Gazetteer(terms=[(term, Term(term)) for term in terms]), base.spans)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for text in chunks:
+            legacy_tag(terms, text)
+        legacy = (time.perf_counter() - start) / len(chunks)
+
+        start = time.perf_counter()
+        for text in chunks:
+            tagger.tag(text)
+        automaton = (time.perf_counter() - start) / len(chunks)
+        print(
+            f"terms={size:<6} compile={compile_ms:7.1f}ms  substring={legacy * 1e6:8.1f}µs/chunk  "
+            f"automaton={automaton * 1e6:8.1f}µs/chunk"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark graph snapshot: dựng chunk store tổng hợp N chunk (mỗi chunk vài entity), nạp
+GraphSnapshot từ đó và đo thời gian nạp, bộ nhớ, độ trễ links_for_chunks / chunks_for_entity.
+So sánh: một round trip Neo4j cục bộ thường cỡ 1–5ms.
+Chạy: python -m app.scripts.bench_graph_snapshot --sizes 10000,100000
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from app.scripts.bench_chunk_store import synthetic_records
+from app.services.chunk_store import ChunkStore, ChunkStoreWriter
+from app.services.graph_snapshot import GraphSnapshot
+
+LOOKUPS = 20_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--entities", type=int, default=2000, help="số entity khác nhau")
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    for size in [int(item) for item in args.sizes.split(",") if item.strip()]:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "chunks.bin"
+            ids = []
+            with ChunkStoreWriter(path) as writer:
+                for record in synthetic_records(size):
+                    record["entities"] = [f"Entity {rng.randrange(args.entities)}" for _ in range(rng.randint(0, 6))]
+                    ids.append(record["chunk_id"])
+                    writer.write([record])
+            store = ChunkStore(path)
+            started = time.perf_counter()
+            snapshot = GraphSnapshot.from_chunk_store(store, "bench")
+            load_ms = (time.perf_counter() - started) * 1000
+            memory = snapshot.memory()
+
+            probes = [rng.sample(ids, 5) for _ in range(LOOKUPS)]
+            started = time.perf_counter()
+            for chunk_ids in probes:
+                snapshot.links_for_chunks(chunk_ids, 4)
+            links_us = (time.perf_counter() - started) / LOOKUPS * 1e6
+
+            names = [f"Entity {rng.randrange(args.entities)}" for _ in range(LOOKUPS)]
+            started = time.perf_counter()
+            for name in names:
+                snapshot.chunks_for_entity(name, 20)
+            entity_us = (time.perf_counter() - started) / LOOKUPS * 1e6
+            print(
+                f"n={size:<7} load={load_ms:7.1f}ms  edges={memory['edges']:<7} "
+                f"arrays={memory['array_bytes'] / 2**20:5.1f}MB strings={memory['string_bytes'] / 2**20:5.1f}MB  "
+                f"links(5 ids)={links_us:5.1f}µs  entity→chunks={entity_us:4.1f}µs"
+            )
+
+
+if __name__ == "__main__":
+    main()
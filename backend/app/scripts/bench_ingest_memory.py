@@ -0,0 +1,136 @@
+"""
+Benchmark bộ nhớ ingest: so sánh peak RSS giữa cách cũ (giữ toàn bộ text/chunk/vector rồi insert
+một lần) và pipeline streaming của build_rag trên corpus tổng hợp gấp N lần.
+Embedding và Milvus được thay bằng vector ngẫu nhiên / sink rỗng để chỉ đo phần pipeline,
+không gọi mạng. Mỗi cấu hình chạy trong process riêng để peak RSS không lẫn nhau.
+Chạy: python -m app.scripts.bench_ingest_memory --pages 300 --scales 1,10
+"""
+import argparse
+import json
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.config import get_settings
+from app.scripts.build_rag import (
+    VectorSink,
+    _rows,
+    ingest,
+    iter_records,
+    make_record,
+    threaded,
+)
+from app.services.chunk_store import ChunkStoreWriter
+from app.utils.chunking import iter_token_chunks
+from app.utils.gazetteer import DYNASTY_KEYWORDS
+
+settings = get_settings()
+
+WORDS = (
+    "vua quân nhân dân triều đình kinh thành đánh giặc năm đời sử chép rằng thì là của có "
+    "một những các đất nước miền bắc nam sông núi thuyền chiến thắng lên ngôi dời đô"
+).split() + [keyword for keywords in DYNASTY_KEYWORDS.values() for keyword in keywords]
+
+
+class NullCollection:
+    def upsert(self, data: list[list]) -> None:
+        pass
+
+    def delete(self, expr: str) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+
+def synthetic_pages(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    for number in range(1, count + 1):
+        # Số trang nằm trong text để mọi trang khác nhau, không bị dedupe.
+        yield number, f"Trang {number}. " + " ".join(rng.choice(WORDS) for _ in range(450))
+
+
+def fake_embed(batch: list[str]) -> list[list[float]]:
+    rng = np.random.default_rng(len(batch))
+    return rng.standard_normal((len(batch), settings.openai_embed_dimensions), dtype=np.float32).tolist()
+
+
+def legacy_chunk_text(text: str, size: int = 800, overlap: int = 120) -> list[str]:
+    # Chunker theo ký tự của bản cũ, giữ lại làm mốc so sánh.
+    clean = " ".join(text.split())
+    chunks: list[str] = []
+    start = 0
+    while start < len(clean):
+        end = min(len(clean), start + size)
+        chunks.append(clean[start:end])
+        if end == len(clean):
+            break
+        start = end - overlap
+    return chunks
+
+
+def run_legacy(pages: int, store_path: Path) -> int:
+    text = "\n".join(page for _, page in synthetic_pages(pages))
+    chunks = [make_record("bench.pdf", value) for value in legacy_chunk_text(text)]
+    embeddings = fake_embed([chunk["text"] for chunk in chunks])
+    NullCollection().upsert(_rows(chunks, embeddings))
+    store_path.write_text(json.dumps(chunks, ensure_ascii=False, indent=2), encoding="utf-8")
+    return len(chunks)
+
+
+def run_streaming(pages: int, store_path: Path) -> int:
+    chunks = iter_token_chunks(
+        threaded(synthetic_pages(pages)), settings.rag_chunk_tokens, settings.rag_chunk_overlap_tokens
+    )
+    sink = VectorSink(NullCollection(), {}, embed_batch=fake_embed)
+    with ChunkStoreWriter(store_path) as chunk_store:
+        stats = ingest(threaded(iter_records(chunks, "bench.pdf")), sink, chunk_store)
+    return stats.new
+
+
+def child(mode: str, pages: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        store_path = Path(tmp) / "chunks.bin"
+        start = time.perf_counter()
+        count = (run_legacy if mode == "legacy" else run_streaming)(pages, store_path)
+        elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KiB
+    print(json.dumps({"mode": mode, "pages": pages, "chunks": count, "seconds": elapsed, "peak_mb": peak_mb}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300, help="số trang của corpus gốc (x1)")
+    parser.add_argument("--scales", default="1,10")
+    parser.add_argument("--modes", default="legacy,streaming")
+    parser.add_argument("--child", choices=["legacy", "streaming"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.pages)
+        return
+
+    print(f"batch={settings.ingest_batch_size} dims={settings.openai_embed_dimensions}")
+    for scale in [int(item) for item in args.scales.split(",") if item.strip()]:
+        for mode in [item.strip() for item in args.modes.split(",") if item.strip()]:
+            output = subprocess.run(
+                [sys.executable, "-m", "app.scripts.bench_ingest_memory", "--child", mode, "--pages", str(args.pages * scale)],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"x{scale:<3} {mode:<10} chunks={result['chunks']:<7} "
+                f"peak_rss={result['peak_mb']:.1f}MB  time={result['seconds']:.1f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
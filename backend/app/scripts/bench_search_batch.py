@@ -0,0 +1,65 @@
+"""
+Benchmark: N lần /search tuần tự so với một lần /search/batch (N truy vấn)
+Chạy: python -m app.scripts.bench_search_batch [N] [rounds]
+Cần Milvus đã có collection và OPENAI_API_KEY hợp lệ.
+"""
+import asyncio
+import sys
+import time
+
+from app.services.rag import rag_service
+
+SAMPLE_QUERIES = [
+    "Lý Công Uẩn dời đô về Thăng Long năm nào?",
+    "Trần Hưng Đạo đánh thắng quân Nguyên Mông ra sao?",
+    "Bình Ngô đại cáo do ai soạn?",
+    "Quang Trung đại phá quân Thanh",
+    "Gia Long thống nhất đất nước",
+    "Hội nghị Diên Hồng",
+    "Khởi nghĩa Lam Sơn",
+    "Chiến dịch Điện Biên Phủ",
+]
+
+
+def _build_requests(n: int, tag: str = "") -> list[dict]:
+    # Hậu tố theo lượt để mỗi truy vấn là duy nhất, tránh đo trúng TTLCache thay vì Milvus.
+    return [
+        {
+            "query": f"{SAMPLE_QUERIES[idx % len(SAMPLE_QUERIES)]} ({tag}#{idx})",
+            "top_k": 4,
+            "filters": None,
+            "mode": "vector",
+        }
+        for idx in range(n)
+    ]
+
+
+async def _sequential(requests: list[dict]) -> None:
+    for req in requests:
+        await rag_service.retrieve_async(req["query"], top_k=req["top_k"], filters=req["filters"], mode=req["mode"])
+
+
+async def _batched(requests: list[dict]) -> None:
+    await rag_service.retrieve_many_async(requests)
+
+
+async def main(n: int, rounds: int) -> None:
+    await _batched(_build_requests(n, "warmup"))  # warm-up kết nối
+    for label, runner in (("sequential", _sequential), ("batch", _batched)):
+        rag_service._cache.clear()
+        round_requests = [_build_requests(n, f"{label}-{idx}") for idx in range(rounds)]
+        start = time.perf_counter()
+        for requests in round_requests:
+            await runner(requests)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{label:<10} N={n:<3} rounds={rounds:<3} "
+            f"total={elapsed:.2f}s  per_call={elapsed / rounds * 1000:.0f}ms  "
+            f"throughput={n * rounds / elapsed:.1f} queries/s"
+        )
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    asyncio.run(main(n, rounds))
@@ -1,199 +1,952 @@
 from __future__ import annotations
 
+import argparse
+import hashlib
 import json
 import math
+import multiprocessing
+import os
+import pickle
+import queue
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Iterable
+from typing import Callable, Iterable, Iterator, TypeVar
 
 from neo4j import GraphDatabase
-from openai import OpenAI
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    OpenAI,
+    RateLimitError,
+)
 from pypdf import PdfReader
-from pymilvus import Collection, connections, utility
+from pymilvus import Collection, MilvusException, connections, utility
+from sqlmodel import Session, select
 
 from app.config import get_settings
-from app.services.rag import ensure_collection
+from app.db import engine
+from app.models.core import LibraryDocument
+from app.services.chunk_store import ChunkStore, ChunkStoreWriter, iter_chunk_store, versioned_path
+from app.services.cooccurrence import CooccurrenceGraph
+from app.services.cooccurrence import versioned_path as cooccurrence_versioned_path
+from app.services.embedding_store import EmbeddingStore
+from app.services.lexical import LexicalIndex
+from app.services.manifest import build_manifest, read_manifest, write_manifest
+from app.services.rag import build_search_params, ensure_collection
+from app.utils.chunking import iter_token_chunks
+from app.utils.gazetteer import DYNASTY_LABELS, chunk_tagger
+from app.utils.tokens import count_tokens
 
 settings = get_settings()
-client = OpenAI(api_key=settings.openai_api_key)
-
-DYNASTY_KEYWORDS = {
-    "HongBang": ["hồng bàng", "hùng vương", "lạc long quân", "âu cơ"],
-    "BacThuoc": ["bắc thuộc", "triệu đà", "an dương vương", "tô định"],
-    "Ly": ["lý", "thăng long", "lý công uẩn", "lý thái tổ"],
-    "Tran": ["trần", "trần hưng đạo", "diên hồng", "bạch đằng"],
-    "Le": ["lê", "lê lợi", "bình ngô", "nguyễn trãi"],
-    "TaySon": ["tây sơn", "quang trung", "nguyễn huệ"],
-    "Nguyen": ["nguyễn", "gia long", "tự đức", "đại nam"],
-    "CanDai": ["cận đại", "kháng chiến", "hồ chí minh", "điện biên phủ"],
-}
-
-DYNASTY_LABELS = {
-    "HongBang": "Thời Hồng Bàng",
-    "BacThuoc": "Thời Bắc thuộc",
-    "Ly": "Nhà Lý",
-    "Tran": "Nhà Trần",
-    "Le": "Nhà Lê",
-    "TaySon": "Phong trào Tây Sơn",
-    "Nguyen": "Nhà Nguyễn",
-    "CanDai": "Cận đại",
-    "Unknown": "Không rõ",
-}
-
-ENTITY_KEYWORDS = {
-    "Lý Công Uẩn": ["lý công uẩn", "lý thái tổ"],
-    "Trần Hưng Đạo": ["trần hưng đạo", "trần quốc tuấn"],
-    "Lê Lợi": ["lê lợi"],
-    "Nguyễn Trãi": ["nguyễn trãi"],
-    "Nguyễn Huệ": ["nguyễn huệ", "quang trung"],
-    "Gia Long": ["gia long", "nguyễn ánh"],
-}
-
-
-def extract_text(pdf_path: Path) -> str:
-    reader = PdfReader(str(pdf_path))
-    parts: list[str] = []
-    for page in reader.pages:
-        text = page.extract_text()
-        if text:
-            parts.append(text)
-    return "\n".join(parts)
-
-
-def chunk_text(text: str, size: int, overlap: int) -> list[str]:
-    clean = " ".join(text.split())
-    if len(clean) <= size:
-        return [clean]
-    chunks: list[str] = []
-    start = 0
-    while start < len(clean):
-        end = min(len(clean), start + size)
-        chunks.append(clean[start:end])
-        if end == len(clean):
+# Tắt retry nội bộ của SDK: _embed_batch tự retry với backoff có jitter.
+client = OpenAI(api_key=settings.openai_api_key, max_retries=0)
+
+RETRYABLE_EMBED_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+CHUNK_ID_MASK = (1 << 53) - 1
+MILVUS_BATCH_SIZE = 256
+# Tăng khi schema Milvus đổi: index_state cũ không còn dùng được, build lại toàn bộ.
+INDEX_SCHEMA_VERSION = 2
+
+T = TypeVar("T")
+
+
+def _process_context() -> multiprocessing.context.BaseContext:
+    # Pool được tạo trong thread producer khi các thread khác (embed, SQLite, producer khác) đang
+    # chạy: fork lúc đó có thể thừa hưởng lock đang bị giữ và treo, nên process con khởi động sạch.
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> list[tuple[int, str]]:
+    # Chạy trong process con: mỗi worker tự mở PdfReader vì reader không pickle được.
+    reader = PdfReader(pdf_path)
+    return [(number + 1, reader.pages[number].extract_text() or "") for number in range(start, end)]
+
+
+def iter_pages(pdf_path: Path, workers: int | None = None) -> Iterator[tuple[int, str]]:
+    """Sinh (số trang, text) theo thứ tự; process pool chỉ chạy trước tối đa vài dải trang."""
+    total = len(PdfReader(str(pdf_path)).pages)
+    workers = min(workers or settings.rag_extract_workers or os.cpu_count() or 1, total or 1)
+    if workers <= 1:
+        reader = PdfReader(str(pdf_path))
+        for number, page in enumerate(reader.pages, start=1):
+            text = page.extract_text() or ""
+            if text:
+                yield number, text
+        return
+    # Dải nhỏ hơn total/workers để cân tải khi trang scan có độ khó khác nhau.
+    span = max(1, math.ceil(total / (workers * 4)))
+    ranges = deque((start, min(start + span, total)) for start in range(0, total, span))
+    pending: deque[Future] = deque()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_process_context()) as pool:
+        while ranges or pending:
+            while ranges and len(pending) < workers * 2:
+                start, end = ranges.popleft()
+                pending.append(pool.submit(_extract_page_range, str(pdf_path), start, end))
+            yield from (page for page in pending.popleft().result() if page[1])
+
+
+def extract_pages(pdf_path: Path, workers: int | None = None) -> list[tuple[int, str]]:
+    return list(iter_pages(pdf_path, workers))
+
+
+def make_record(source: str, text: str, page_start: int = 0, page_end: int = 0) -> dict:
+    # Một lượt quét gazetteer cho cả period lẫn entity.
+    tags = chunk_tagger().tag(text)
+    return {
+        "chunk_id": content_chunk_id(source, text),
+        "text": text,
+        "source": source,
+        "page_start": page_start,
+        "page_end": page_end,
+        "period": tags.period,
+        "period_readable": DYNASTY_LABELS.get(tags.period, "Không rõ"),
+        "entities": tags.entities,
+        "summary": text[:220] + ("…" if len(text) > 220 else ""),
+    }
+
+
+def iter_records(chunks: Iterable[dict], source: str) -> Iterator[dict]:
+    seen_ids: set[int] = set()
+    for chunk in chunks:
+        record = make_record(source, chunk["text"], chunk["page_start"], chunk["page_end"])
+        if record["chunk_id"] in seen_ids:
+            continue  # đoạn trùng lặp nguyên văn
+        seen_ids.add(record["chunk_id"])
+        yield record
+
+
+@dataclass(frozen=True)
+class SourceSpec:
+    kind: str  # pdf | markdown | text
+    name: str  # id nguồn ổn định: ghi vào trường `source` và băm vào chunk_id
+    path: str | None = None
+    text: str | None = None
+
+
+SOURCE_KINDS = {".pdf": "pdf", ".md": "markdown", ".markdown": "markdown"}
+
+_MD_HEADING = re.compile(r"^\s{0,3}#{1,6}\s*(.+?)\s*#*\s*$", re.MULTILINE)
+_MD_IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_MD_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_MD_MARKUP = re.compile(r"(\*\*|__|`+|^\s*[-*+>]\s+)", re.MULTILINE)
+
+
+def strip_markdown(text: str) -> str:
+    # Tiêu đề không có dấu câu: thêm dấu chấm để chunker coi là hết câu.
+    text = _MD_HEADING.sub(lambda match: match.group(1).rstrip(".") + ".", text)
+    text = _MD_IMAGE.sub("", text)
+    text = _MD_LINK.sub(r"\1", text)
+    return _MD_MARKUP.sub("", text)
+
+
+def _spec_from_path(path: Path, name: str, kind: str | None = None) -> SourceSpec:
+    kind = kind or SOURCE_KINDS.get(path.suffix.lower())
+    if kind not in ("pdf", "markdown"):
+        raise ValueError(f"Không hỗ trợ nguồn {path}")
+    if not path.exists():
+        raise FileNotFoundError(f"Không tìm thấy nguồn {path}")
+    return SourceSpec(kind=kind, name=name, path=str(path))
+
+
+def library_sources() -> list[SourceSpec]:
+    """Mỗi LibraryDocument là một nguồn `library/<id>`; id ổn định nên chunk_id cũng ổn định."""
+    with Session(engine) as session:
+        rows = session.exec(select(LibraryDocument).order_by(LibraryDocument.id)).all()
+    return [SourceSpec(kind="text", name=f"library/{row.id}", text=row.content) for row in rows if row.content]
+
+
+def discover_sources(location: str | None = None, include_library: bool | None = None) -> list[SourceSpec]:
+    """Danh sách nguồn từ thư mục (*.pdf, *.md) hoặc file manifest JSON; mặc định là `rag_pdf_path`.
+
+    Manifest: `{"sources": [{"path": "sach.pdf", "name": "...", "type": "pdf"}, {"library": true}]}`,
+    đường dẫn tương đối tính từ thư mục chứa manifest.
+    """
+    location = location if location is not None else settings.rag_sources_path
+    include_library = settings.rag_include_library if include_library is None else include_library
+    specs: list[SourceSpec] = []
+    if not location:
+        pdf_path = Path(settings.rag_pdf_path)
+        specs.append(_spec_from_path(pdf_path, pdf_path.name, "pdf"))
+    else:
+        root = Path(location)
+        if root.is_dir():
+            for path in sorted(root.rglob("*")):
+                if path.is_file() and path.suffix.lower() in SOURCE_KINDS:
+                    specs.append(_spec_from_path(path, path.relative_to(root).as_posix()))
+        elif root.is_file():
+            entries = json.loads(root.read_text(encoding="utf-8"))
+            for entry in entries.get("sources", []) if isinstance(entries, dict) else entries:
+                if entry.get("library"):
+                    include_library = True
+                    continue
+                path = (root.parent / entry["path"]).resolve()
+                specs.append(_spec_from_path(path, entry.get("name") or Path(entry["path"]).as_posix(), entry.get("type")))
+        else:
+            raise FileNotFoundError(f"Không tìm thấy nguồn corpus tại {root}")
+    if include_library:
+        specs.extend(library_sources())
+    if not specs:
+        raise FileNotFoundError("Không có nguồn nào để ingest")
+    names = [spec.name for spec in specs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Trùng tên nguồn: {', '.join(duplicates)}")
+    return specs
+
+
+def iter_source_pages(spec: SourceSpec, workers: int | None = None) -> Iterator[tuple[int, str]]:
+    if spec.kind == "pdf":
+        yield from iter_pages(Path(spec.path), workers)
+    elif spec.kind == "markdown":
+        # Không có khái niệm trang: số trang 0 để page_label bỏ qua.
+        yield 0, strip_markdown(Path(spec.path).read_text(encoding="utf-8"))
+    else:
+        yield 0, spec.text or ""
+
+
+def iter_source_records(spec: SourceSpec, workers: int | None = None) -> Iterator[dict]:
+    chunks = iter_token_chunks(
+        iter_source_pages(spec, workers),
+        max_tokens=settings.rag_chunk_tokens,
+        overlap_tokens=settings.rag_chunk_overlap_tokens,
+    )
+    return iter_records(chunks, spec.name)
+
+
+def _source_records(spec: SourceSpec, spool_dir: str) -> str:
+    """Chạy trong process con: xử lý tuần tự một nguồn, ghi record ra file tạm theo batch.
+
+    Trả đường dẫn file thay vì cả list record qua pickle, nên bộ nhớ của worker lẫn process
+    chính không tăng theo độ dài sách (chỉ đĩa tạm chứa các nguồn đang chờ).
+    """
+    fd, path = tempfile.mkstemp(prefix="source-", suffix=".pkl", dir=spool_dir)
+    with os.fdopen(fd, "wb") as handle:
+        for batch in batched(iter_source_records(spec, workers=1), max(1, settings.ingest_batch_size)):
+            pickle.dump(batch, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _read_spool(path: str) -> Iterator[dict]:
+    try:
+        with open(path, "rb") as handle:
+            while True:
+                try:
+                    batch = pickle.load(handle)
+                except EOFError:
+                    return
+                yield from batch
+    finally:
+        os.unlink(path)
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    batch: list[T] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+_DONE = object()
+
+
+def threaded(items: Iterable[T], maxsize: int | None = None) -> Iterator[T]:
+    """Chạy một stage generator trong thread riêng, nối với stage sau bằng queue có giới hạn.
+
+    Producer bị chặn khi queue đầy nên bộ nhớ giữa hai stage không vượt quá `maxsize` phần tử;
+    lỗi trong producer được ném lại ở phía consumer.
+    """
+    channel: queue.Queue = queue.Queue(maxsize=max(1, maxsize or settings.ingest_queue_size))
+    stop = threading.Event()
+
+    def put(item: object) -> bool:
+        while not stop.is_set():
+            try:
+                channel.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as exc:  # chuyển lỗi sang consumer
+            put(exc)
+
+    worker = threading.Thread(target=produce, name="ingest-stage", daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = channel.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        worker.join(timeout=1.0)
+
+
+def plan_batches(texts: list[str], max_tokens: int, max_items: int) -> list[list[int]]:
+    """Gom chỉ số text thành batch sao cho tổng token mỗi request không vượt giới hạn."""
+    batches: list[list[int]] = []
+    current: list[int] = []
+    current_tokens = 0
+    for idx, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(idx)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _embed_batch(batch: list[str]) -> list[list[float]]:
+    for attempt in range(settings.embed_max_retries):
+        try:
+            resp = client.embeddings.create(model=settings.openai_embed_model, input=batch)
             break
-        start = end - overlap
-    return chunks
+        except RETRYABLE_EMBED_ERRORS:
+            if attempt == settings.embed_max_retries - 1:
+                raise
+            # Full jitter: tránh mọi worker cùng bắn lại đúng một thời điểm sau 429.
+            delay = min(settings.embed_backoff_max, settings.embed_backoff_base * 2**attempt)
+            time.sleep(random.uniform(0, delay))
+    return [data.embedding for data in sorted(resp.data, key=lambda data: data.index)]
 
 
-def detect_dynasty(text: str) -> str:
-    lowered = text.lower()
-    for dynasty, keywords in DYNASTY_KEYWORDS.items():
-        if any(keyword in lowered for keyword in keywords):
-            return dynasty
-    return "Unknown"
+def content_chunk_id(source: str, text: str) -> int:
+    """Id ổn định theo nội dung; giữ trong 53 bit để JSON/JavaScript đọc không mất chính xác."""
+    digest = hashlib.sha256(f"{source}\0{text}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") & CHUNK_ID_MASK
 
 
-def detect_entities(text: str) -> list[str]:
-    lowered = text.lower()
-    entities: list[str] = []
-    for name, keywords in ENTITY_KEYWORDS.items():
-        if any(keyword in lowered for keyword in keywords):
-            entities.append(name)
-    return entities
+def chunk_fingerprint(chunk: dict) -> str:
+    """Hash của mọi trường được ghi vào Milvus trừ vector, để phát hiện chunk đổi metadata."""
+    payload = json.dumps(
+        [
+            chunk["text"],
+            chunk["source"],
+            chunk["period"],
+            chunk["entities"],
+            chunk.get("page_start", 0),
+            chunk.get("page_end", 0),
+        ],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
 
-def embed_texts(texts: Iterable[str]) -> list[list[float]]:
-    payload = list(texts)
-    embeddings: list[list[float]] = []
-    for i in range(0, len(payload), 32):
-        batch = payload[i : i + 32]
-        resp = client.embeddings.create(model=settings.openai_embed_model, input=batch)
-        for data in resp.data:
-            embeddings.append(data.embedding)
-    return embeddings
+def load_index_state() -> dict:
+    path = Path(settings.rag_index_state_path)
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
 
 
-def build_vector_store(chunks: list[dict]) -> None:
-    connections.connect(alias="default", host=settings.milvus_host, port=settings.milvus_port)
-    if utility.has_collection(settings.milvus_collection):
-        utility.drop_collection(settings.milvus_collection)
-    ensure_collection(settings.milvus_collection, settings.openai_embed_dimensions)
-    collection = Collection(settings.milvus_collection)
-    collection.load()
-    embeds = embed_texts([chunk["text"] for chunk in chunks])
-    data = [
+def save_index_state(state: dict) -> None:
+    path = Path(settings.rag_index_state_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+@dataclass
+class IngestStats:
+    new: int = 0
+    changed: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    cached: int = 0  # vector lấy từ kho cục bộ thay vì gọi API
+    embedding_tokens: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.new + self.changed + self.unchanged
+
+    def report(self) -> str:
+        return (
+            f"new={self.new} changed={self.changed} removed={self.removed} "
+            f"unchanged={self.unchanged} cached={self.cached} embedding_tokens≈{self.embedding_tokens}"
+        )
+
+
+def _rows(chunks: list[dict], embeddings: list[list[float]]) -> list[list]:
+    return [
         [chunk["chunk_id"] for chunk in chunks],
         [chunk["text"] for chunk in chunks],
         [chunk["source"] for chunk in chunks],
         [chunk["period"] for chunk in chunks],
         [json.dumps(chunk["entities"], ensure_ascii=False) for chunk in chunks],
-        embeds,
+        [chunk.get("page_start", 0) for chunk in chunks],
+        [chunk.get("page_end", 0) for chunk in chunks],
+        embeddings,
     ]
-    collection.insert(data)
+
+
+def _fetch_embeddings(collection: Collection, chunk_ids: list[int]) -> dict[int, list[float]]:
+    vectors: dict[int, list[float]] = {}
+    for start in range(0, len(chunk_ids), MILVUS_BATCH_SIZE):
+        batch = chunk_ids[start : start + MILVUS_BATCH_SIZE]
+        rows = collection.query(expr=f"chunk_id in {batch}", output_fields=["chunk_id", "embedding"])
+        for row in rows:
+            vectors[int(row["chunk_id"])] = row["embedding"]
+    return vectors
+
+
+def versioned_collection_name(build_id: str) -> str:
+    return f"{settings.milvus_collection}_v{build_id}"
+
+
+def live_collection_name() -> str | None:
+    """Collection đang phục vụ theo manifest; bản cũ chưa có manifest dùng tên gốc."""
+    name = (read_manifest() or {}).get("collection") or settings.milvus_collection
+    return name if utility.has_collection(name) else None
+
+
+def open_vector_store(
+    build_id: str, full: bool = False, dry_run: bool = False
+) -> tuple[Collection | None, Collection | None, dict[str, str]]:
+    """Trả về (collection mới, collection đang live, fingerprint đã index trong bản live).
+
+    Collection mới luôn được dựng từ đầu bên cạnh bản live (blue/green); bản live chỉ được
+    đọc để tái dùng vector của chunk không đổi nội dung.
+    """
+    state = load_index_state()
+    connections.connect(alias="default", host=settings.milvus_host, port=settings.milvus_port)
+    live_name = live_collection_name()
+    compatible = (
+        not full
+        and live_name is not None
+        and state.get("schema") == INDEX_SCHEMA_VERSION
+        and state.get("collection") == live_name
+        and state.get("embedding_model") == settings.openai_embed_model
+        and state.get("embedding_dimensions") == settings.openai_embed_dimensions
+    )
+    indexed: dict[str, str] = state.get("chunks", {}) if compatible else {}
+    live = None
+    if indexed:
+        live = Collection(live_name)
+        live.load()
+    if dry_run:
+        return None, live, indexed
+    name = versioned_collection_name(build_id)
+    if utility.has_collection(name):
+        utility.drop_collection(name)  # sót lại từ lần build lỗi cùng build_id
+    ensure_collection(name, settings.openai_embed_dimensions)
+    collection = Collection(name)
+    collection.load()
+    return collection, live, indexed
+
+
+class VectorSink:
+    """Stage cuối của pipeline: nhận batch chunk, lấy vector và ghi vào collection mới theo batch.
+
+    Chunk đã có trong bản live được chép vector từ đó; chỉ chunk mới mới phải embed. Tối đa
+    `ingest_max_pending` batch được embed song song; khi vượt ngưỡng, batch cũ nhất được chờ
+    xong và ghi xuống trước khi nhận thêm, nên bộ nhớ chỉ phụ thuộc kích thước batch.
+    Chỉ map chunk_id → fingerprint (vài chục byte/chunk) được giữ cho tới cuối.
+
+    Đây là đường embed duy nhất của ingest. Text đã có trong `store` không gọi API, và vector
+    mới được ghi vào store ngay khi batch của nó xong (`_drain_one`), trước khi upsert Milvus,
+    nên build lỗi giữa chừng chạy lại chỉ embed phần còn thiếu.
+    """
+
+    def __init__(
+        self,
+        collection: Collection | None,
+        indexed: dict[str, str],
+        reuse_from: Collection | None = None,
+        embed_batch: Callable[[list[str]], list[list[float]]] | None = None,
+        store: EmbeddingStore | None = None,
+    ) -> None:
+        self.collection = collection
+        self.indexed = indexed
+        self.reuse_from = reuse_from
+        self.store = store
+        self.fingerprints: dict[str, str] = {}
+        self.stats = IngestStats()
+        self._embed_batch = embed_batch or _embed_batch
+        self._pool = ThreadPoolExecutor(max_workers=max(1, settings.embed_concurrency))
+        self._pending: deque[tuple[list[dict], list[tuple[list[int], Future]]]] = deque()
+
+    @property
+    def dry_run(self) -> bool:
+        return self.collection is None
+
+    def add(self, batch: list[dict]) -> None:
+        to_embed: list[dict] = []
+        reuse: list[dict] = []
+        for chunk in batch:
+            key = str(chunk["chunk_id"])
+            fingerprint = chunk_fingerprint(chunk)
+            self.fingerprints[key] = fingerprint
+            previous = self.indexed.get(key)
+            if previous is None:
+                self.stats.new += 1
+            elif previous != fingerprint:
+                self.stats.changed += 1
+            else:
+                self.stats.unchanged += 1
+            # Cùng chunk_id nghĩa là cùng text (id băm từ nội dung) nên vector cũ vẫn đúng.
+            (reuse if previous is not None and self.reuse_from is not None else to_embed).append(chunk)
+        if reuse and not self.dry_run:
+            vectors = _fetch_embeddings(self.reuse_from, [chunk["chunk_id"] for chunk in reuse])
+            found = [chunk for chunk in reuse if chunk["chunk_id"] in vectors]
+            to_embed.extend(chunk for chunk in reuse if chunk["chunk_id"] not in vectors)
+            if found:
+                self.collection.upsert(_rows(found, [vectors[chunk["chunk_id"]] for chunk in found]))
+        if self.store is not None and to_embed:
+            # Kho vector cục bộ: chỉ text chưa từng embed với model/dims này mới phải gọi API.
+            cached = self.store.get_many([chunk["text"] for chunk in to_embed])
+            hits = [chunk for chunk, vector in zip(to_embed, cached) if vector is not None]
+            self.stats.cached += len(hits)
+            if hits and not self.dry_run:
+                self.collection.upsert(_rows(hits, [vector for vector in cached if vector is not None]))
+            to_embed = [chunk for chunk, vector in zip(to_embed, cached) if vector is None]
+        if self.dry_run:
+            self.stats.embedding_tokens += sum(count_tokens(chunk["text"]) for chunk in to_embed)
+            return
+        if not to_embed:
+            return
+        texts = [chunk["text"] for chunk in to_embed]
+        self.stats.embedding_tokens += sum(count_tokens(text) for text in texts)
+        futures = [
+            (idxs, self._pool.submit(self._embed_batch, [texts[idx] for idx in idxs]))
+            for idxs in plan_batches(texts, settings.embed_batch_max_tokens, settings.embed_batch_max_items)
+        ]
+        self._pending.append((to_embed, futures))
+        while len(self._pending) > max(1, settings.ingest_max_pending):
+            self._drain_one()
+
+    def _drain_one(self) -> None:
+        chunks, futures = self._pending.popleft()
+        vectors: list[list[float] | None] = [None] * len(chunks)
+        for idxs, future in futures:
+            result = future.result()
+            for idx, vector in zip(idxs, result):
+                vectors[idx] = vector
+            if self.store is not None:
+                self.store.put_many([chunks[idx]["text"] for idx in idxs], result)
+        self.collection.upsert(_rows(chunks, vectors))
+
+    def finish(self) -> IngestStats:
+        try:
+            while self._pending:
+                self._drain_one()
+        finally:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        self.stats.removed = sum(1 for key in self.indexed if key not in self.fingerprints)
+        if not self.dry_run:
+            self.collection.flush()
+        return self.stats
+
+
+def validate_collection(collection: Collection, expected: int, samples: int = 5) -> None:
+    """Kiểm tra collection mới trước khi chuyển traffic: đủ số chunk và search tìm lại được chính nó."""
     collection.flush()
+    count = collection.num_entities
+    if not expected or count != expected:
+        raise RuntimeError(f"Collection {collection.name} có {count} chunk, mong đợi {expected}")
+    rows = collection.query(expr="chunk_id >= 0", output_fields=["chunk_id", "embedding"], limit=samples)
+    for row in rows:
+        hits = collection.search(
+            data=[row["embedding"]],
+            anns_field="embedding",
+            param=build_search_params(3),
+            limit=3,
+        )
+        if int(row["chunk_id"]) not in {hit.id for hit in hits[0]}:
+            raise RuntimeError(f"Collection {collection.name}: search không tìm lại chunk {row['chunk_id']}")
+
+
+def switch_alias(collection_name: str) -> bool:
+    """Trỏ alias `milvus_collection` sang collection mới (thao tác nguyên tử phía Milvus).
+
+    Trả về False khi tên alias vẫn là collection thật của bản cũ: không tự xoá nó, việc đổi
+    tên đó thành alias là bước migrate một lần (`--migrate-legacy-collection`).
+    """
+    alias = settings.milvus_collection
+    if alias in utility.list_collections():
+        # Search đọc tên collection từ manifest nên vẫn dùng bản mới dù alias chưa đổi được.
+        print(
+            f"CẢNH BÁO: '{alias}' là collection thật của bản cũ, alias chưa được chuyển. Sau "
+            f"{settings.rag_legacy_grace_seconds}s kể từ lần build này, chạy "
+            "`python -m app.scripts.build_rag --migrate-legacy-collection` để xoá nó và tạo alias."
+        )
+        return False
+    try:
+        utility.alter_alias(collection_name, alias)
+    except MilvusException:
+        utility.create_alias(collection_name, alias)
+    return True
+
+
+def migrate_legacy_collection(manifest: dict | None = None) -> None:
+    """Bước migrate một lần: xoá collection thật trùng tên alias rồi tạo alias trỏ tới bản live.
+
+    Chỉ chạy khi manifest đã trỏ tới một collection versioned đang tồn tại và đã qua thời gian
+    chờ, nên mọi worker đều đã chuyển sang bản mới trước khi bản cũ biến mất.
+    """
+    connections.connect(alias="default", host=settings.milvus_host, port=settings.milvus_port)
+    alias = settings.milvus_collection
+    if alias not in utility.list_collections():
+        print(f"'{alias}' không phải collection thật, không cần migrate.")
+        return
+    manifest = manifest or read_manifest() or {}
+    live = manifest.get("collection")
+    if not live or live == alias or not utility.has_collection(live):
+        raise RuntimeError("Manifest chưa trỏ tới collection versioned đang tồn tại: chạy build_rag trước.")
+    age = (datetime.now(timezone.utc) - datetime.fromisoformat(manifest["created_at"])).total_seconds()
+    if age < settings.rag_legacy_grace_seconds:
+        raise RuntimeError(f"Bản live mới được {age:.0f}s, chờ đủ {settings.rag_legacy_grace_seconds}s rồi chạy lại.")
+    utility.drop_collection(alias)
+    utility.create_alias(live, alias)
+    print(f"Đã xoá collection cũ '{alias}' và tạo alias trỏ tới {live}.")
+
+
+def prune_versions(keep: int | None = None) -> list[str]:
+    """Giữ lại `keep` collection mới nhất (bản live + bản trước để worker chậm chuyển), xoá phần còn lại."""
+    prefix = f"{settings.milvus_collection}_v"
+    names = sorted(name for name in utility.list_collections() if name.startswith(prefix))
+    kept = names[-max(1, keep or settings.rag_keep_versions) :]
+    for name in names:
+        if name not in kept:
+            utility.drop_collection(name)
+    return [name[len(prefix) :] for name in kept]
+
+
+def prune_build_files(keep_versions: list[str]) -> None:
+    """Xoá file theo build (chunk store, ma trận đồng xuất hiện) của version không còn giữ."""
+    for setting in (settings.rag_chunk_store_path, settings.rag_cooccurrence_path):
+        base = Path(setting)
+        for path in base.parent.glob(f"{base.stem}.*{base.suffix}"):
+            build_id = path.name[len(base.stem) + 1 : -len(base.suffix)]
+            if build_id not in keep_versions:
+                path.unlink(missing_ok=True)
+
+
+def build_cooccurrence(chunk_store_path: Path, path: Path) -> CooccurrenceGraph:
+    store = ChunkStore(chunk_store_path)
+    try:
+        graph = CooccurrenceGraph.from_chunk_store(store)
+    finally:
+        store.close()
+    graph.save(path)
+    print(f"Co-occurrence: {graph.memory()['entities']} entities, {graph.edges} cặp")
+    return graph
+
+
+def ingest(
+    records: Iterable[dict],
+    sink: VectorSink,
+    meta: ChunkStoreWriter | None = None,
+    on_batch: Callable[[list[dict]], None] | None = None,
+) -> IngestStats:
+    for batch in batched(records, max(1, settings.ingest_batch_size)):
+        if meta is not None:
+            meta.write(batch)
+        sink.add(batch)
+        if on_batch is not None:
+            on_batch(batch)
+    return sink.finish()
+
+
+def build_lexical_index(chunks: Iterable[dict], path: Path | None = None) -> None:
+    index = LexicalIndex.build(chunks)
+    index.save(path or Path(settings.rag_lexical_path))
+
+
+GRAPH_SCHEMA = (
+    # Chunk nay có nhiều bản theo version (blue/green) nên khoá là cặp (chunk_id, version).
+    "DROP CONSTRAINT chunk_id_unique IF EXISTS",
+    "CREATE CONSTRAINT chunk_version_unique IF NOT EXISTS FOR (c:Chunk) REQUIRE (c.chunk_id, c.version) IS UNIQUE",
+    "CREATE INDEX chunk_id_index IF NOT EXISTS FOR (c:Chunk) ON (c.chunk_id)",
+    "CREATE CONSTRAINT entity_name_unique IF NOT EXISTS FOR (e:Entity) REQUIRE e.name IS UNIQUE",
+    "CREATE CONSTRAINT dynasty_slug_unique IF NOT EXISTS FOR (d:Dynasty) REQUIRE d.slug IS UNIQUE",
+)
+
+UPSERT_DYNASTIES = """
+UNWIND $rows AS row
+MERGE (d:Dynasty {slug: row.slug})
+  SET d.name = row.name
+"""
+
+UPSERT_CHUNKS = """
+UNWIND $rows AS row
+MATCH (d:Dynasty {slug: row.period})
+MERGE (c:Chunk {chunk_id: row.chunk_id, version: $version})
+  SET c.text = row.text,
+      c.summary = row.summary,
+      c.source = row.source,
+      c.page_start = row.page_start,
+      c.page_end = row.page_end
+MERGE (c)-[:BELONGS_TO]->(d)
+"""
+
+UPSERT_MENTIONS = """
+UNWIND $rows AS row
+MERGE (e:Entity {name: row.name})
+WITH e, row
+MATCH (c:Chunk {chunk_id: row.chunk_id, version: $version})
+MERGE (e)-[:MENTIONED_IN]->(c)
+"""
 
+DELETE_ORPHAN_ENTITIES = "MATCH (e:Entity) WHERE NOT (e)-[:MENTIONED_IN]->() DETACH DELETE e"
 
-def rebuild_graph(chunks: list[dict]) -> None:
-    driver = GraphDatabase.driver(
-        settings.graph_uri, auth=(settings.graph_user, settings.graph_password)
+
+def _graph_driver():
+    return GraphDatabase.driver(settings.graph_uri, auth=(settings.graph_user, settings.graph_password))
+
+
+def _write_graph_batch(tx, batch: list[dict], version: str) -> None:
+    dynasties = {chunk["period"]: chunk["period_readable"] for chunk in batch}
+    tx.run(UPSERT_DYNASTIES, rows=[{"slug": slug, "name": name} for slug, name in dynasties.items()])
+    tx.run(
+        UPSERT_CHUNKS,
+        version=version,
+        rows=[
+            {
+                "chunk_id": chunk["chunk_id"],
+                "period": chunk["period"],
+                "text": chunk["text"],
+                "summary": chunk["summary"],
+                "source": chunk["source"],
+                "page_start": chunk.get("page_start", 0),
+                "page_end": chunk.get("page_end", 0),
+            }
+            for chunk in batch
+        ],
     )
+    mentions = [{"name": name, "chunk_id": chunk["chunk_id"]} for chunk in batch for name in chunk["entities"]]
+    if mentions:
+        tx.run(UPSERT_MENTIONS, version=version, rows=mentions)
+
+
+def rebuild_graph(chunks: Iterable[dict], version: str) -> None:
+    """Dựng graph của một version theo batch, song song với version đang live.
+
+    Mỗi batch là một transaction gồm ba câu UNWIND; các version cũ chỉ bị xoá ở prune_graph.
+    """
+    driver = _graph_driver()
+    started = time.perf_counter()
+    total = 0
     with driver.session(database=settings.graph_database) as session:
-        session.run("MATCH (c:Chunk) DETACH DELETE c")
-        for chunk in chunks:
-            session.run(
-                """
-                MERGE (d:Dynasty {slug:$period})
-                  SET d.name = $dynasty
-                MERGE (c:Chunk {chunk_id:$chunk_id})
-                  SET c.text = $text,
-                      c.summary = $summary,
-                      c.source = $source
-                MERGE (c)-[:BELONGS_TO]->(d)
-                """,
-                period=chunk["period"],
-                dynasty=chunk["period_readable"],
-                chunk_id=chunk["chunk_id"],
-                text=chunk["text"],
-                summary=chunk["summary"],
-                source=chunk["source"],
-            )
-            for entity in chunk["entities"]:
-                session.run(
-                    """
-                    MERGE (e:Entity {name:$name})
-                    WITH e
-                    MATCH (c:Chunk {chunk_id:$chunk_id})
-                    MERGE (e)-[:MENTIONED_IN]->(c)
-                    """,
-                    name=entity,
-                    chunk_id=chunk["chunk_id"],
-                )
-        session.run("MATCH (e:Entity) WHERE NOT (e)-[:MENTIONED_IN]->() DETACH DELETE e")
+        # Constraint/index tạo trước nên MERGE/MATCH theo khoá không phải quét toàn bộ label.
+        for statement in GRAPH_SCHEMA:
+            session.run(statement).consume()
+        session.run(
+            "MATCH (c:Chunk {version: $version}) CALL { WITH c DETACH DELETE c } IN TRANSACTIONS OF 10000 ROWS",
+            version=version,
+        ).consume()
+        for batch in batched(chunks, max(1, settings.graph_batch_size)):
+            session.execute_write(_write_graph_batch, batch, version)
+            total += len(batch)
+    driver.close()
+    print(f"Graph: {total} chunks (version {version}) in {time.perf_counter() - started:.1f}s")
+
+
+def prune_graph(keep_versions: list[str]) -> None:
+    driver = _graph_driver()
+    with driver.session(database=settings.graph_database) as session:
+        session.run(
+            """
+            MATCH (c:Chunk) WHERE c.version IS NULL OR NOT c.version IN $keep
+            CALL { WITH c DETACH DELETE c } IN TRANSACTIONS OF 10000 ROWS
+            """,
+            keep=keep_versions,
+        ).consume()
+        session.run(DELETE_ORPHAN_ENTITIES).consume()
     driver.close()
 
 
-def main() -> None:
-    pdf_path = Path(settings.rag_pdf_path)
-    if not pdf_path.exists():
-        raise FileNotFoundError(f"Không tìm thấy PDF tại {pdf_path}")
-    text = extract_text(pdf_path)
-    raw_chunks = chunk_text(
-        text,
-        size=settings.rag_chunk_size,
-        overlap=settings.rag_chunk_overlap,
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Ingest corpus vào Milvus & Neo4j")
+    parser.add_argument("--dry-run", action="store_true", help="chỉ báo cáo delta và số token embedding ước tính")
+    parser.add_argument("--full", action="store_true", help="không tái dùng vector của bản live, embed lại toàn bộ")
+    parser.add_argument("--sources", default=None, help="thư mục (*.pdf, *.md) hoặc manifest JSON các nguồn")
+    parser.add_argument("--library", action="store_true", default=None, help="ingest cả các LibraryDocument trong DB")
+    parser.add_argument(
+        "--migrate-legacy-collection",
+        action="store_true",
+        help="một lần: xoá collection thật trùng tên alias (bản trước blue/green) và tạo alias",
     )
-    chunks: list[dict] = []
-    for idx, chunk_text_value in enumerate(raw_chunks, start=1):
-        period = detect_dynasty(chunk_text_value)
-        entities = detect_entities(chunk_text_value)
-        summary = chunk_text_value[:220] + ("…" if len(chunk_text_value) > 220 else "")
-        chunks.append(
-            {
-                "chunk_id": idx,
-                "text": chunk_text_value,
-                "source": f"{pdf_path.name}",
-                "period": period,
-                "period_readable": DYNASTY_LABELS.get(period, "Không rõ"),
-                "entities": entities,
-                "summary": summary,
-            }
+    return parser.parse_args(argv)
+
+
+def _iter_sources_parallel(specs: list[SourceSpec], workers: int) -> Iterator[dict]:
+    pending: deque[Future] = deque()
+    queued = deque(specs)
+    with tempfile.TemporaryDirectory(prefix="rag-ingest-") as spool_dir:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_process_context()) as pool:
+            while queued or pending:
+                # Chỉ chạy trước tối đa 2×workers nguồn; record của chúng nằm trên đĩa tạm, RAM chỉ giữ một batch.
+                while queued and len(pending) < workers * 2:
+                    pending.append(pool.submit(_source_records, queued.popleft(), spool_dir))
+                yield from _read_spool(pending.popleft().result())
+
+
+def iter_corpus(specs: list[SourceSpec]) -> Iterator[dict]:
+    """extract → chunk → classify cho mọi nguồn, theo thứ tự nguồn.
+
+    Một nguồn: chia trang PDF cho process pool, các stage nối bằng queue có giới hạn.
+    Nhiều nguồn: mỗi process xử lý trọn một nguồn, nên thông lượng tăng theo số core.
+    """
+    workers = min(settings.rag_extract_workers or os.cpu_count() or 1, len(specs))
+    if len(specs) == 1 or workers <= 1:
+        for spec in specs:
+            pages = threaded(iter_source_pages(spec))
+            chunks = iter_token_chunks(
+                pages, max_tokens=settings.rag_chunk_tokens, overlap_tokens=settings.rag_chunk_overlap_tokens
+            )
+            yield from threaded(iter_records(chunks, spec.name))
+        return
+    yield from threaded(_iter_sources_parallel(specs, workers))
+
+
+def _discard_build(collection: Collection, version: str, *paths: Path) -> None:
+    try:
+        utility.drop_collection(collection.name)
+    except MilvusException:
+        pass
+    try:
+        driver = _graph_driver()
+        with driver.session(database=settings.graph_database) as session:
+            session.run(
+                "MATCH (c:Chunk {version: $version}) CALL { WITH c DETACH DELETE c } IN TRANSACTIONS OF 10000 ROWS",
+                version=version,
+            ).consume()
+        driver.close()
+    except Exception:  # pragma: no cover - dọn dẹp best-effort
+        pass
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+def run(
+    full: bool = False,
+    dry_run: bool = False,
+    progress: Callable[..., None] | None = None,
+    sources: str | None = None,
+    include_library: bool | None = None,
+) -> dict:
+    """Build index mới bên cạnh bản live, kiểm tra rồi mới chuyển sang (blue/green).
+
+    Bản live vẫn phục vụ suốt quá trình build; thứ tự chuyển: BM25 → index_state → manifest
+    (worker đổi collection, graph version và chunk store) → alias Milvus → dọn version cũ. Trả về manifest mới,
+    hoặc báo cáo delta khi `dry_run`.
+    """
+    report = progress or (lambda stage, **info: None)
+    specs = discover_sources(sources, include_library)
+    build_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    notes = specs[0].name if len(specs) == 1 else f"{len(specs)} nguồn"
+
+    report("prepare", build_id=build_id, sources_total=len(specs))
+    collection, live, indexed = open_vector_store(build_id, full=full, dry_run=dry_run)
+    sink = VectorSink(collection, indexed, reuse_from=live, store=EmbeddingStore())
+
+    def on_batch(batch: list[dict]) -> None:
+        report(
+            "ingest",
+            source=batch[-1]["source"],
+            page=batch[-1].get("page_end") or 0,
+            sources_total=len(specs),
+            chunks=sink.stats.total,
+            embedding_tokens=sink.stats.embedding_tokens,
         )
 
-    build_vector_store(chunks)
-    rebuild_graph(chunks)
+    if dry_run:
+        stats = ingest(iter_corpus(specs), sink, on_batch=on_batch)
+        print(f"Delta Milvus: {stats.report()}")
+        return {"dry_run": True, "delta": asdict(stats)}
+
+    # Chunk store đặt tên theo build và giữ nguyên sau khi chuyển: manifest trỏ tới nó.
+    chunk_store_path = versioned_path(build_id)
+    cooccurrence_path = cooccurrence_versioned_path(build_id)
+    lexical_path = Path(settings.rag_lexical_path)
+    staged_lexical = lexical_path.with_name(f"{lexical_path.stem}.{build_id}{lexical_path.suffix}")
+    try:
+        with ChunkStoreWriter(chunk_store_path) as chunk_store:
+            stats = ingest(iter_corpus(specs), sink, chunk_store, on_batch=on_batch)
+        print(f"Delta Milvus: {stats.report()}")
+        report("validate", chunks=stats.total)
+        validate_collection(collection, stats.total)
+        report("lexical", chunks=stats.total)
+        build_lexical_index(iter_chunk_store(chunk_store_path), staged_lexical)
+        report("graph", chunks=stats.total)
+        rebuild_graph(iter_chunk_store(chunk_store_path), build_id)
+        build_cooccurrence(chunk_store_path, cooccurrence_path)
+    except BaseException:
+        _discard_build(collection, build_id, chunk_store_path, cooccurrence_path, staged_lexical)
+        raise
+
+    report("switch", collection=collection.name)
+    os.replace(staged_lexical, lexical_path)
+    save_index_state(
+        {
+            "schema": INDEX_SCHEMA_VERSION,
+            "collection": collection.name,
+            "embedding_model": settings.openai_embed_model,
+            "embedding_dimensions": settings.openai_embed_dimensions,
+            "chunks": sink.fingerprints,
+        }
+    )
+    # Manifest ghi sau cùng: version mới chỉ xuất hiện khi index đã sẵn sàng.
+    manifest = build_manifest(
+        iter_chunk_store(chunk_store_path),
+        notes=notes,
+        extra={
+            "collection": collection.name,
+            "graph_version": build_id,
+            "chunk_store": str(chunk_store_path),
+            "cooccurrence": str(cooccurrence_path),
+        },
+    )
+    write_manifest(manifest)
+    switch_alias(collection.name)
+    kept = prune_versions()
+    prune_graph(kept)
+    prune_build_files(kept)
+    report("done", version=manifest["version"], collection=collection.name, chunks=stats.total)
+    print(
+        f"Ingested {manifest['docs_count']} chunks into {collection.name} & Neo4j "
+        f"(version {manifest['version']}, embedded {stats.new} new, removed {stats.removed})."
+    )
+    return manifest
+
 
-    meta_path = Path(settings.rag_meta_path)
-    meta_path.write_text(json.dumps(chunks, ensure_ascii=False, indent=2), encoding="utf-8")
-    print(f"Ingested {len(chunks)} chunks into Milvus & Neo4j.")
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    if args.migrate_legacy_collection:
+        migrate_legacy_collection()
+        return
+    run(full=args.full, dry_run=args.dry_run, sources=args.sources, include_library=args.library)
 
 
 if __name__ == "__main__":
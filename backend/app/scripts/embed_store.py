@@ -0,0 +1,43 @@
+"""
+Quản lý kho embedding cục bộ (rag/embeddings.sqlite) mà build_rag dùng để không embed lại text cũ.
+Chạy:
+  python -m app.scripts.embed_store stats
+  python -m app.scripts.embed_store compact          # chỉ giữ vector của text trong chunk store đang live
+  python -m app.scripts.embed_store compact --all    # chỉ bỏ vector của model/dims khác
+  python -m app.scripts.embed_store export rag/embeddings.npz
+"""
+import argparse
+import json
+
+from app.config import get_settings
+from app.services.chunk_store import iter_chunk_store, live_chunk_store_path
+from app.services.embedding_store import EmbeddingStore
+
+settings = get_settings()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats")
+    compact = sub.add_parser("compact")
+    compact.add_argument("--all", action="store_true", help="giữ mọi text của model/dims hiện tại")
+    export = sub.add_parser("export")
+    export.add_argument("path")
+    args = parser.parse_args()
+
+    store = EmbeddingStore()
+    if args.command == "compact":
+        store_path = live_chunk_store_path()
+        if not args.all and not store_path.exists():
+            parser.error(f"Không có {store_path}; dùng --all hoặc chạy build_rag trước")
+        keep = None if args.all else (chunk["text"] for chunk in iter_chunk_store(store_path))
+        print(f"removed {store.compact(keep)} vectors")
+    elif args.command == "export":
+        print(f"exported {store.export(args.path)} vectors to {args.path}")
+    print(json.dumps(store.stats(), ensure_ascii=False, indent=2))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException, status
 from jose import JWTError
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.config import get_settings
 from app.models.core import RefreshToken, User
@@ -78,13 +79,23 @@ def refresh_tokens(session: Session, refresh_token: str) -> dict:
     return create_token_pair(session, user)
 
 
-def get_current_user(session: Session, token: str) -> User:
+def _token_user_id(token: str) -> int:
     try:
         payload = decode_token(token)
-        user_id = int(payload.get("sub"))
-    except (JWTError, ValueError) as exc:
+        return int(payload.get("sub"))
+    except (JWTError, ValueError, TypeError) as exc:
         raise HTTPException(status_code=401, detail="invalid_token") from exc
-    user = session.get(User, user_id)
+
+
+def get_current_user(session: Session, token: str) -> User:
+    user = session.get(User, _token_user_id(token))
+    if not user:
+        raise HTTPException(status_code=404, detail="user_not_found")
+    return user
+
+
+async def get_current_user_async(session: AsyncSession, token: str) -> User:
+    user = await session.get(User, _token_user_id(token))
     if not user:
         raise HTTPException(status_code=404, detail="user_not_found")
     return user
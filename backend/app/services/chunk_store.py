@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import shutil
+import struct
+import threading
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from app.config import get_settings
+from app.services.manifest import ManifestWatcher
+
+settings = get_settings()
+
+MAGIC = b"VNCS"
+FORMAT_VERSION = 1
+# magic, version, độ dài header JSON
+_PREAMBLE = struct.Struct("<4sIQ")
+_ALIGN = 8
+SUMMARY_CHARS = 220
+
+
+def _summary(text: str) -> str:
+    return text[:SUMMARY_CHARS] + ("…" if len(text) > SUMMARY_CHARS else "")
+
+
+class ChunkStoreWriter:
+    """Ghi chunk theo batch thành một file nhị phân để đọc bằng mmap.
+
+    Bố cục: preamble + header JSON (số lượng, từ điển nguồn/triều đại/thực thể, vị trí từng
+    section) rồi các section căn 8 byte: chunk_id (int64), offset text (uint64, n+1), id nguồn,
+    id triều đại, trang đầu/cuối, entity theo kiểu CSR (offset + id), bảng băm địa chỉ mở
+    chunk_id → vị trí, cuối cùng là blob UTF-8 của mọi text. Text được ghi thẳng ra file tạm
+    nên bộ nhớ khi ghi chỉ gồm các cột số (vài chục byte/chunk).
+    """
+
+    def __init__(self, path: Path | str | None = None) -> None:
+        self.path = Path(path or settings.rag_chunk_store_path)
+        self._tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        self._blob_path = self.path.with_suffix(self.path.suffix + ".blob.tmp")
+        self._blob = None
+        self._ids = array("q")
+        self._text_offsets = array("Q", [0])
+        self._source_ids = array("I")
+        self._period_ids = array("H")
+        self._page_start = array("I")
+        self._page_end = array("I")
+        self._entity_offsets = array("I", [0])
+        self._entity_ids = array("I")
+        self._sources: dict[str, int] = {}
+        self._periods: dict[str, int] = {}
+        self._period_labels: list[str] = []
+        self._entities: dict[str, int] = {}
+
+    def __enter__(self) -> "ChunkStoreWriter":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._blob = self._blob_path.open("wb")
+        return self
+
+    @staticmethod
+    def _intern(vocab: dict[str, int], value: str) -> int:
+        if value not in vocab:
+            vocab[value] = len(vocab)
+        return vocab[value]
+
+    def write(self, batch: Iterable[dict]) -> None:
+        for chunk in batch:
+            data = chunk["text"].encode("utf-8")
+            self._blob.write(data)
+            self._ids.append(int(chunk["chunk_id"]))
+            self._text_offsets.append(self._text_offsets[-1] + len(data))
+            self._source_ids.append(self._intern(self._sources, chunk.get("source") or ""))
+            period = chunk.get("period") or "Unknown"
+            if period not in self._periods:
+                self._period_labels.append(chunk.get("period_readable") or period)
+            self._period_ids.append(self._intern(self._periods, period))
+            self._page_start.append(int(chunk.get("page_start") or 0))
+            self._page_end.append(int(chunk.get("page_end") or 0))
+            for name in chunk.get("entities") or []:
+                self._entity_ids.append(self._intern(self._entities, name))
+            self._entity_offsets.append(len(self._entity_ids))
+
+    def _hash_table(self) -> np.ndarray:
+        # chunk_id đã là hash sha256 nên bit thấp phân bố đều; thăm dò tuyến tính, tải ≤ 50%.
+        size = 1 << max(4, (2 * len(self._ids) - 1).bit_length())
+        mask = size - 1
+        table = np.full(size, -1, dtype=np.int32)
+        for idx, chunk_id in enumerate(self._ids):
+            slot = chunk_id & mask
+            while table[slot] >= 0:
+                if self._ids[table[slot]] == chunk_id:
+                    raise ValueError(f"chunk_id trùng trong chunk store: {chunk_id}")
+                slot = (slot + 1) & mask
+            table[slot] = idx
+        return table
+
+    def _finalize(self) -> None:
+        self._blob.close()
+        sections = {
+            "ids": np.frombuffer(self._ids, dtype=np.int64) if self._ids else np.zeros(0, np.int64),
+            "text_offsets": np.frombuffer(self._text_offsets, dtype=np.uint64),
+            "source_ids": np.asarray(self._source_ids, dtype=np.uint32),
+            "period_ids": np.asarray(self._period_ids, dtype=np.uint16),
+            "page_start": np.asarray(self._page_start, dtype=np.uint32),
+            "page_end": np.asarray(self._page_end, dtype=np.uint32),
+            "entity_offsets": np.asarray(self._entity_offsets, dtype=np.uint32),
+            "entity_ids": np.asarray(self._entity_ids, dtype=np.uint32),
+            "table": self._hash_table(),
+        }
+        header = {
+            "count": len(self._ids),
+            "sources": list(self._sources),
+            "periods": [[slug, label] for slug, label in zip(self._periods, self._period_labels)],
+            "entities": list(self._entities),
+            "sections": {},
+        }
+        # Hai lượt: lượt đầu ước lượng độ dài header (offset có thể làm header dài thêm).
+        for _ in range(2):
+            encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+            position = _PREAMBLE.size + len(encoded) + 64
+            position += -position % _ALIGN
+            for name, values in sections.items():
+                header["sections"][name] = [position, str(values.dtype), int(values.size)]
+                position += values.nbytes
+                position += -position % _ALIGN
+            header["sections"]["blob"] = [position, "uint8", int(self._text_offsets[-1])]
+        encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        with self._tmp.open("wb") as handle:
+            handle.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(encoded)))
+            handle.write(encoded)
+            if handle.tell() > header["sections"]["ids"][0]:
+                raise RuntimeError("header chunk store vượt quá vùng dành sẵn")
+            for name, values in sections.items():
+                handle.write(b"\0" * (header["sections"][name][0] - handle.tell()))
+                handle.write(values.tobytes())
+            handle.write(b"\0" * (header["sections"]["blob"][0] - handle.tell()))
+            with self._blob_path.open("rb") as blob:
+                shutil.copyfileobj(blob, handle, length=1 << 20)
+        os.replace(self._tmp, self.path)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None:
+                self._finalize()
+            else:
+                self._blob.close()
+        finally:
+            self._blob_path.unlink(missing_ok=True)
+            self._tmp.unlink(missing_ok=True)
+
+
+class ChunkStore:
+    """Đọc chunk store qua mmap: mở file chỉ đọc header, tra chunk_id O(1) qua bảng băm.
+
+    Các cột là view numpy trên mmap nên chỉ trang nào được chạm mới vào RAM; thời gian mở
+    và RSS không phụ thuộc số chunk.
+    """
+
+    def __init__(self, path: Path | str | None = None) -> None:
+        self.path = Path(path or settings.rag_chunk_store_path)
+        with self.path.open("rb") as handle:
+            self._mm = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_len = _PREAMBLE.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{self.path} không phải chunk store v{FORMAT_VERSION}")
+        header = json.loads(self._mm[_PREAMBLE.size : _PREAMBLE.size + header_len])
+        self.count: int = header["count"]
+        self.sources: list[str] = header["sources"]
+        self.periods: list[tuple[str, str]] = [tuple(item) for item in header["periods"]]
+        self.entities: list[str] = header["entities"]
+        views = {
+            name: np.frombuffer(self._mm, dtype=np.dtype(dtype), count=count, offset=offset)
+            for name, (offset, dtype, count) in header["sections"].items()
+            if name != "blob"
+        }
+        self._blob_offset = header["sections"]["blob"][0]
+        self.ids = views["ids"]
+        self._text_offsets = views["text_offsets"]
+        self.source_ids = views["source_ids"]
+        self.period_ids = views["period_ids"]
+        self._page_start = views["page_start"]
+        self._page_end = views["page_end"]
+        self._entity_offsets = views["entity_offsets"]
+        self._entity_ids = views["entity_ids"]
+        self._table = views["table"]
+        self._mask = len(self._table) - 1
+
+    def __len__(self) -> int:
+        return self.count
+
+    def index_of(self, chunk_id: int) -> int | None:
+        slot = int(chunk_id) & self._mask
+        while True:
+            idx = int(self._table[slot])
+            if idx < 0:
+                return None
+            if int(self.ids[idx]) == chunk_id:
+                return idx
+            slot = (slot + 1) & self._mask
+
+    def text_at(self, idx: int) -> str:
+        start = self._blob_offset + int(self._text_offsets[idx])
+        end = self._blob_offset + int(self._text_offsets[idx + 1])
+        return self._mm[start:end].decode("utf-8")
+
+    def summary_at(self, idx: int) -> str:
+        # Chỉ giải mã phần đầu text: đủ cho tóm tắt mà không copy cả chunk dài.
+        start = self._blob_offset + int(self._text_offsets[idx])
+        end = self._blob_offset + int(self._text_offsets[idx + 1])
+        head = self._mm[start : min(end, start + SUMMARY_CHARS * 4 + 4)].decode("utf-8", errors="ignore")
+        return head[:SUMMARY_CHARS] + ("…" if len(head) > SUMMARY_CHARS else "")
+
+    def filter_fields_at(self, idx: int) -> dict:
+        """Các trường dùng để lọc (period, source) mà không giải mã text."""
+        return {
+            "period": self.periods[int(self.period_ids[idx])][0],
+            "source": self.sources[int(self.source_ids[idx])],
+        }
+
+    def entity_ids_at(self, idx: int) -> np.ndarray:
+        return self._entity_ids[self._entity_offsets[idx] : self._entity_offsets[idx + 1]]
+
+    def entity_csr(self) -> tuple[np.ndarray, np.ndarray]:
+        """(offsets, entity_ids) của cạnh chunk → entity theo thứ tự trong file."""
+        return self._entity_offsets, self._entity_ids
+
+    def record(self, idx: int) -> dict:
+        text = self.text_at(idx)
+        period, label = self.periods[int(self.period_ids[idx])]
+        return {
+            "chunk_id": int(self.ids[idx]),
+            "text": text,
+            "source": self.sources[int(self.source_ids[idx])],
+            "page_start": int(self._page_start[idx]),
+            "page_end": int(self._page_end[idx]),
+            "period": period,
+            "period_readable": label,
+            "entities": [self.entities[int(entity)] for entity in self.entity_ids_at(idx)],
+            "summary": _summary(text),
+        }
+
+    def get(self, chunk_id: int) -> dict | None:
+        idx = self.index_of(chunk_id)
+        return self.record(idx) if idx is not None else None
+
+    def get_many(self, chunk_ids: Iterable[int]) -> dict[int, dict]:
+        records: dict[int, dict] = {}
+        for chunk_id in chunk_ids:
+            idx = self.index_of(int(chunk_id))
+            if idx is not None:
+                records[int(chunk_id)] = self.record(idx)
+        return records
+
+    def __iter__(self) -> Iterator[dict]:
+        for idx in range(self.count):
+            yield self.record(idx)
+
+    def close(self) -> None:
+        for name in ("ids", "_text_offsets", "source_ids", "period_ids", "_page_start", "_page_end",
+                     "_entity_offsets", "_entity_ids", "_table"):
+            setattr(self, name, None)
+        self._mm.close()
+
+
+def iter_chunk_store(path: Path | str | None = None) -> Iterator[dict]:
+    store = ChunkStore(path)
+    try:
+        yield from store
+    finally:
+        store.close()
+
+
+def versioned_path(build_id: str) -> Path:
+    base = Path(settings.rag_chunk_store_path)
+    return base.with_name(f"{base.stem}.{build_id}{base.suffix}")
+
+
+_manifest = ManifestWatcher()
+
+
+def live_chunk_store_path() -> Path:
+    """Chunk store của version đang live: manifest trỏ tới file theo build, cùng lúc với collection."""
+    manifest = _manifest.current() or {}
+    return Path(manifest.get("chunk_store") or settings.rag_chunk_store_path)
+
+
+_current_lock = threading.Lock()
+_current: tuple[str, int, ChunkStore] | None = None
+
+
+def current_chunk_store(path: Path | str | None = None) -> ChunkStore | None:
+    """Chunk store đang live, mở lại khi file đổi (so mtime); None nếu chưa build."""
+    global _current
+    target = Path(path) if path else live_chunk_store_path()
+    try:
+        mtime_ns = target.stat().st_mtime_ns
+    except OSError:
+        return None
+    cached = _current
+    if cached and cached[0] == str(target) and cached[1] == mtime_ns:
+        return cached[2]
+    with _current_lock:
+        if _current and _current[0] == str(target) and _current[1] == mtime_ns:
+            return _current[2]
+        try:
+            store = ChunkStore(target)
+        except (OSError, ValueError):
+            return None
+        # Bản cũ không close: request khác có thể còn đọc; mmap tự giải phóng khi hết tham chiếu.
+        _current = (str(target), mtime_ns, store)
+        return store
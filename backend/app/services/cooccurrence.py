@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from app.config import get_settings
+from app.services.chunk_store import ChunkStore
+from app.services.manifest import ManifestWatcher
+
+settings = get_settings()
+
+
+class CooccurrenceGraph:
+    """Ma trận đồng xuất hiện entity–entity: trọng số = số chunk nhắc cả hai.
+
+    Lưu dạng CSR đối xứng, mỗi hàng đã sắp theo trọng số giảm dần nên top-k láng giềng chỉ
+    là k phần tử đầu hàng; đường 2 bước chỉ xét `per_hop` láng giềng mạnh nhất mỗi bước,
+    nên chi phí mỗi bước cố định, không phụ thuộc kích thước graph.
+    """
+
+    def __init__(
+        self, names: list[str], mentions: np.ndarray, indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray
+    ) -> None:
+        self.names = names
+        self.mentions = mentions
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.index = {name: idx for idx, name in enumerate(names)}
+        self._folded = {name.casefold(): idx for idx, name in enumerate(names)}
+
+    @classmethod
+    def from_chunk_store(cls, store: ChunkStore) -> "CooccurrenceGraph":
+        offsets, entity_ids = store.entity_csr()
+        size = len(store.entities)
+        left: list[int] = []
+        right: list[int] = []
+        mentions = np.zeros(size, dtype=np.int64)
+        for idx in range(len(store)):
+            # Mỗi chunk đóng góp 1 cho mỗi cặp entity khác nhau, dù nhắc bao nhiêu lần.
+            members = sorted(set(entity_ids[offsets[idx] : offsets[idx + 1]].tolist()))
+            mentions[np.asarray(members, dtype=np.int64)] += 1
+            for pos, first in enumerate(members):
+                left.extend([first] * (len(members) - pos - 1))
+                right.extend(members[pos + 1 :])
+        return cls.from_pairs(list(store.entities), mentions, np.asarray(left, np.int64), np.asarray(right, np.int64))
+
+    @classmethod
+    def from_pairs(
+        cls, names: list[str], mentions: np.ndarray, left: np.ndarray, right: np.ndarray
+    ) -> "CooccurrenceGraph":
+        size = max(1, len(names))
+        pairs, counts = np.unique(left * size + right, return_counts=True)
+        rows = np.concatenate([pairs // size, pairs % size])
+        cols = np.concatenate([pairs % size, pairs // size])
+        weights = np.concatenate([counts, counts]).astype(np.int32)
+        order = np.lexsort((cols, -weights, rows))
+        indptr = np.zeros(len(names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(names)), out=indptr[1:])
+        return cls(names, mentions.astype(np.int32), indptr, cols[order].astype(np.int32), weights[order])
+
+    def save(self, path: Path | str) -> None:
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(
+            tmp,
+            names=np.asarray(self.names, dtype=str),
+            mentions=self.mentions,
+            indptr=self.indptr,
+            indices=self.indices,
+            weights=self.weights,
+        )
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path | str) -> "CooccurrenceGraph":
+        with np.load(path) as data:
+            return cls(
+                data["names"].tolist(), data["mentions"], data["indptr"], data["indices"], data["weights"]
+            )
+
+    @property
+    def edges(self) -> int:
+        return len(self.indices) // 2
+
+    def find(self, name: str) -> int | None:
+        idx = self.index.get(name)
+        return idx if idx is not None else self._folded.get(name.strip().casefold())
+
+    def _row(self, idx: int, limit: int) -> tuple[np.ndarray, np.ndarray]:
+        start = self.indptr[idx]
+        end = min(self.indptr[idx + 1], start + limit)
+        return self.indices[start:end], self.weights[start:end]
+
+    def neighbors(self, idx: int, k: int = 10) -> list[dict]:
+        cols, weights = self._row(idx, k)
+        return [{"name": self.names[col], "weight": int(weight)} for col, weight in zip(cols, weights)]
+
+    def two_hop(self, idx: int, k: int = 10, per_hop: int = 20) -> list[dict]:
+        """Đường source → trung gian → đích, độ mạnh = trọng số nhỏ hơn của hai cạnh.
+
+        Đích không phải source và không phải láng giềng trực tiếp của source (kể cả láng giềng
+        nằm ngoài `per_hop`), vì những entity đó đã có trong `neighbors`.
+        """
+        best: dict[int, tuple[int, ...]] = {}
+        direct = set(self.indices[self.indptr[idx] : self.indptr[idx + 1]].tolist())
+        direct.add(idx)
+        first_cols, first_weights = self._row(idx, per_hop)
+        for middle, first in zip(first_cols.tolist(), first_weights.tolist()):
+            second_cols, second_weights = self._row(middle, per_hop)
+            for target, second in zip(second_cols.tolist(), second_weights.tolist()):
+                if target in direct:
+                    continue
+                candidate = (min(first, second), first * second, middle, first, second)
+                if target not in best or candidate[:2] > best[target][:2]:
+                    best[target] = candidate
+        ranked = sorted(best.items(), key=lambda item: (-item[1][0], -item[1][1], self.names[item[0]]))[:k]
+        return [
+            {
+                "path": [self.names[idx], self.names[middle], self.names[target]],
+                "weights": [first, second],
+                "score": strength,
+            }
+            for target, (strength, _, middle, first, second) in ranked
+        ]
+
+    def memory(self) -> dict:
+        return {
+            "entities": len(self.names),
+            "edges": self.edges,
+            "array_bytes": int(self.indptr.nbytes + self.indices.nbytes + self.weights.nbytes + self.mentions.nbytes),
+        }
+
+
+def versioned_path(build_id: str) -> Path:
+    base = Path(settings.rag_cooccurrence_path)
+    return base.with_name(f"{base.stem}.{build_id}{base.suffix}")
+
+
+_manifest = ManifestWatcher()
+_current_lock = threading.Lock()
+_current: tuple[str, int, CooccurrenceGraph] | None = None
+
+
+def current_cooccurrence() -> CooccurrenceGraph | None:
+    """Ma trận của version đang live (manifest trỏ tới), nạp lại khi file đổi; None nếu chưa build."""
+    global _current
+    manifest = _manifest.current() or {}
+    target = Path(manifest.get("cooccurrence") or settings.rag_cooccurrence_path)
+    try:
+        mtime_ns = target.stat().st_mtime_ns
+    except OSError:
+        return None
+    with _current_lock:
+        if _current and _current[0] == str(target) and _current[1] == mtime_ns:
+            return _current[2]
+        try:
+            graph = CooccurrenceGraph.load(target)
+        except (OSError, ValueError, KeyError):
+            return None
+        _current = (str(target), mtime_ns, graph)
+        return graph
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+from app.config import get_settings
+
+settings = get_settings()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    dims INTEGER NOT NULL,
+    text_hash BLOB NOT NULL,
+    vector BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (model, dims, text_hash)
+) WITHOUT ROWID
+"""
+
+# SQLite giới hạn số tham số mỗi câu lệnh; chia nhỏ khi tra nhiều hash.
+_LOOKUP_BATCH = 500
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingStore:
+    """Kho vector cục bộ (SQLite) theo khoá (model, dims, sha256 của text).
+
+    Text giống hệt thì vector giống hệt, nên mọi lần build chỉ phải gọi API cho text chưa
+    từng embed với model/dims hiện tại. Vector lưu dạng float32 thô.
+    """
+
+    def __init__(self, path: Path | str | None = None, model: str | None = None, dims: int | None = None) -> None:
+        self.path = Path(path or settings.rag_embed_store_path)
+        self.model = model or settings.openai_embed_model
+        self.dims = dims or settings.openai_embed_dimensions
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Một connection dùng chung giữa các thread embed, tuần tự hoá bằng lock.
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(SCHEMA)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, texts: list[str]) -> list[list[float] | None]:
+        hashes = [text_hash(text) for text in texts]
+        found: dict[bytes, bytes] = {}
+        with self._lock:
+            for start in range(0, len(hashes), _LOOKUP_BATCH):
+                batch = list(set(hashes[start : start + _LOOKUP_BATCH]))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND dims = ? "
+                    f"AND text_hash IN ({','.join('?' * len(batch))})",
+                    [self.model, self.dims, *batch],
+                )
+                found.update(rows)
+        vectors = [
+            np.frombuffer(found[digest], dtype=np.float32).tolist() if digest in found else None
+            for digest in hashes
+        ]
+        hits = sum(vector is not None for vector in vectors)
+        self.hits += hits
+        self.misses += len(vectors) - hits
+        return vectors
+
+    def put_many(self, texts: list[str], vectors: list[list[float]]) -> None:
+        now = time.time()
+        rows = [
+            (self.model, self.dims, text_hash(text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.execute("COMMIT")
+
+    def compact(self, keep_texts: Iterable[str] | None = None) -> int:
+        """Xoá vector của model/dims khác và (nếu có `keep_texts`) text không còn trong corpus; rồi VACUUM."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            removed = self._conn.execute(
+                "DELETE FROM embeddings WHERE model != ? OR dims != ?", (self.model, self.dims)
+            ).rowcount
+            if keep_texts is not None:
+                self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep (text_hash BLOB PRIMARY KEY)")
+                self._conn.execute("DELETE FROM keep")
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO keep VALUES (?)", ((text_hash(text),) for text in keep_texts)
+                )
+                removed += self._conn.execute(
+                    "DELETE FROM embeddings WHERE text_hash NOT IN (SELECT text_hash FROM keep)"
+                ).rowcount
+                self._conn.execute("DROP TABLE keep")
+            self._conn.execute("COMMIT")
+            self._conn.execute("VACUUM")
+        return removed
+
+    def export(self, path: Path | str) -> int:
+        """Xuất vector của model/dims hiện tại ra .npz (text_hash hex + ma trận float32)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT text_hash, vector FROM embeddings WHERE model = ? AND dims = ? ORDER BY text_hash",
+                (self.model, self.dims),
+            ).fetchall()
+        hashes = np.asarray([digest.hex() for digest, _ in rows])
+        vectors = (
+            np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+            if rows
+            else np.zeros((0, self.dims), dtype=np.float32)
+        )
+        np.savez(path, text_hash=hashes, vectors=vectors, model=self.model, dims=self.dims)
+        return len(rows)
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT model, dims, COUNT(*) FROM embeddings GROUP BY model, dims"
+            ).fetchall()
+        return {
+            "path": str(self.path),
+            "bytes": self.path.stat().st_size if self.path.exists() else 0,
+            "entries": [{"model": model, "dims": dims, "count": count} for model, dims, count in rows],
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
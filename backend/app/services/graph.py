@@ -1,57 +1,389 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import threading
+import time
 from typing import Any
 
-from neo4j import GraphDatabase
+from neo4j import READ_ACCESS, AsyncGraphDatabase, GraphDatabase, Query
+from neo4j.exceptions import DriverError, Neo4jError, ServiceUnavailable
 
 from app.config import get_settings
+from app.services.chunk_store import current_chunk_store
+from app.services.cooccurrence import current_cooccurrence
+from app.services.graph_snapshot import GraphSnapshot
+from app.services.manifest import ManifestWatcher
+from app.utils.cache import TTLCache
+from app.utils.gazetteer import ENTITY_ALIASES, Gazetteer
 
 settings = get_settings()
+logger = logging.getLogger("vietsaga.graph")
+
+LINKS_QUERY = """
+MATCH (c:Chunk)
+WHERE c.chunk_id IN $chunk_ids
+  AND ($version IS NULL OR c.version = $version)
+OPTIONAL MATCH (c)<-[:MENTIONED_IN]-(e:Entity)
+OPTIONAL MATCH (c)-[:BELONGS_TO]->(d:Dynasty)
+WITH c, d, collect(DISTINCT e.name) AS entities
+RETURN c.chunk_id AS chunk_id,
+       coalesce(c.summary, substring(c.text,0,220)) AS summary,
+       d.name AS dynasty,
+       entities
+ORDER BY c.chunk_id
+LIMIT $limit
+"""
+
+ENTITY_CHUNKS_QUERY = """
+UNWIND $names AS name
+MATCH (e:Entity {name: name})-[:MENTIONED_IN]->(c:Chunk)
+WHERE $version IS NULL OR c.version = $version
+WITH c, collect(DISTINCT e.name) AS found
+OPTIONAL MATCH (c)-[:BELONGS_TO]->(d:Dynasty)
+RETURN c.chunk_id AS chunk_id,
+       found,
+       d.name AS dynasty,
+       coalesce(c.summary, substring(c.text,0,220)) AS summary
+ORDER BY size(found) DESC, c.chunk_id
+LIMIT $limit
+"""
+
+
+def build_entity_links(names: list[str], rows: list[dict], limit: int = 4) -> list[dict]:
+    """Dựng link từ entity phát hiện được (`names`, quan trọng trước) và các chunk nhắc tới chúng.
+
+    Ưu tiên cặp entity cùng được nhắc trong nhiều chunk nhất ("A → B", chunk minh chứng là
+    chunk chứa nhiều entity nhất); entity chưa có cặp nào thì nối với triều đại của chunk.
+    Mỗi link trỏ tới một chunk thật khác nhau.
+    """
+    rank = {name: idx for idx, name in enumerate(names)}
+    pairs: dict[tuple[str, str], list[dict]] = {}
+    for row in rows:
+        found = sorted({name for name in row["found"] if name in rank}, key=rank.__getitem__)
+        for idx, first in enumerate(found):
+            for second in found[idx + 1 :]:
+                pairs.setdefault((first, second), []).append(row)
+    ranked = sorted(pairs.items(), key=lambda item: (-len(item[1]), rank[item[0][0]], rank[item[0][1]]))
+    links: list[dict] = []
+    used: set[int] = set()
+    covered: set[str] = set()
+
+    def add(relation: str, row: dict) -> None:
+        used.add(row["chunk_id"])
+        links.append({"relation": relation, "description": row.get("summary") or "", "chunk_id": row["chunk_id"]})
+
+    for (first, second), support in ranked:
+        if len(links) >= limit:
+            return links
+        row = next((row for row in support if row["chunk_id"] not in used), None)
+        if row is not None:
+            covered.update((first, second))
+            add(f"{first} → {second}", row)
+    for name in names:
+        if len(links) >= limit:
+            break
+        if name in covered:
+            continue
+        row = next((row for row in rows if name in row["found"] and row["chunk_id"] not in used), None)
+        if row is not None:
+            add(f"{row.get('dynasty') or 'Tư liệu'} → {name}", row)
+    return links
+
+
+def _driver_options() -> dict:
+    # Pool giới hạn + timeout lấy connection: Neo4j chậm làm request hết giờ sớm thay vì xếp hàng mãi.
+    return {
+        "auth": (settings.graph_user, settings.graph_password),
+        "max_connection_pool_size": settings.graph_pool_size,
+        "connection_acquisition_timeout": settings.graph_acquisition_timeout,
+        "connection_timeout": settings.graph_connect_timeout,
+    }
 
 
 class GraphService:
+    """Đọc link Chunk/Entity/Dynasty từ Neo4j.
+
+    Route async dùng `AsyncGraphDatabase` nên query chờ mạng không giữ thread nào của
+    threadpool; mỗi query có timeout phía server, lỗi tạm thời được thử lại có giới hạn.
+    Neo4j không kết nối được thì tạm bỏ qua graph trong `graph_unavailable_cooldown` giây
+    và trả danh sách rỗng để router dựng link từ context.
+
+    Khi bật `graph_snapshot_enabled`, graph của version đang live được nạp vào process
+    (`GraphSnapshot`, ưu tiên từ chunk store, không có thì đọc Neo4j một lần) và mọi câu hỏi
+    link được trả từ đó, không qua mạng; khi manifest đổi version, snapshot mới được dựng ở
+    thread nền và request đi đường Neo4j cho tới lúc swap.
+    """
+
     def __init__(self) -> None:
         self._driver = None
+        self._async_driver = None
         self._init_error: Exception | None = None
+        self._last_error: str | None = None
+        self._unavailable_until = 0.0
+        # Graph giữ nhiều version Chunk (blue/green); chỉ đọc version mà manifest đang trỏ tới.
+        self._manifest = ManifestWatcher()
+        # Link đã dựng xong theo (version, tập chunk_id, limit): tập chunk phổ biến không chạm Neo4j.
+        self._cache = TTLCache(settings.graph_cache_size, settings.graph_cache_ttl)
+        self._cached_version: str | None = None
+        self._snapshot: GraphSnapshot | None = None
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_error: str | None = None
+        self._snapshot_retry_at = 0.0
+        self._snapshot_loading = False
+        self._reload_lock = threading.Lock()
+        self._gazetteer: tuple[tuple, Gazetteer] | None = None
         try:
-            self._driver = GraphDatabase.driver(
-                settings.graph_uri,
-                auth=(settings.graph_user, settings.graph_password),
-            )
+            self._driver = GraphDatabase.driver(settings.graph_uri, **_driver_options())
         except Exception as exc:  # pragma: no cover - init guard
             self._init_error = exc
 
-    def get_links_for_chunks(self, chunk_ids: list[int], limit: int = 4) -> list[dict]:
-        if not chunk_ids or self._driver is None:
+    def _get_async_driver(self):
+        # Tạo lười trong coroutine để driver gắn với event loop của server.
+        if self._async_driver is None:
+            self._async_driver = AsyncGraphDatabase.driver(settings.graph_uri, **_driver_options())
+        return self._async_driver
+
+    def _graph_version(self) -> str | None:
+        manifest = self._manifest.current() or {}
+        version = manifest.get("graph_version")
+        if version != self._cached_version:
+            # Graph vừa rebuild: khoá cũ không bao giờ được hỏi lại, dọn luôn cho nhẹ bộ nhớ.
+            self._cached_version = version
+            self._cache.clear()
+        snapshot = self._snapshot
+        if (
+            settings.graph_snapshot_enabled
+            and (snapshot is None or snapshot.version != version)
+            and time.monotonic() >= self._snapshot_retry_at
+        ):
+            self._reload_snapshot(version)
+        return version
+
+    def load_snapshot_in_background(self) -> None:
+        """Nạp snapshot lúc khởi động mà không chặn startup; chưa có chunk store thì đọc Neo4j ở thread nền."""
+        self._reload_snapshot(None, from_neo4j=True)
+
+    def _reload_snapshot(self, version: str | None, from_neo4j: bool = False) -> None:
+        # Dựng snapshot là O(corpus): chạy ở thread nền (từ request: chỉ chunk store cục bộ), không chặn
+        # event loop hay thread của request. Tới lúc swap, snapshot() trả None vì version cũ không
+        # khớp manifest, nên request đi đường Neo4j theo đúng version mới.
+        with self._reload_lock:
+            if self._snapshot_loading:
+                return
+            self._snapshot_loading = True
+
+        def run() -> None:
+            try:
+                self.load_snapshot(version, from_neo4j=from_neo4j)
+            finally:
+                self._snapshot_loading = False
+
+        threading.Thread(target=run, name="graph-snapshot", daemon=True).start()
+
+    def load_snapshot(self, version: str | None = None, from_neo4j: bool = True) -> GraphSnapshot | None:
+        """Nạp snapshot cho `version` (mặc định theo manifest); lỗi thì giữ đường Neo4j."""
+        if version is None:
+            version = (self._manifest.current() or {}).get("graph_version")
+        with self._snapshot_lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.version == version:
+                return snapshot
+            store = current_chunk_store()
+            try:
+                if store is not None:
+                    snapshot = GraphSnapshot.from_chunk_store(store, version)
+                elif from_neo4j and self._driver is not None:
+                    with self._driver.session(
+                        database=settings.graph_database, default_access_mode=READ_ACCESS
+                    ) as session:
+                        snapshot = GraphSnapshot.from_neo4j(session, version)
+                else:
+                    self._snapshot_retry_at = time.monotonic() + settings.graph_unavailable_cooldown
+                    return None
+            except Exception as exc:
+                self._snapshot_error = str(exc)
+                self._snapshot_retry_at = time.monotonic() + settings.graph_unavailable_cooldown
+                logger.warning("Không nạp được graph snapshot: %s", exc)
+                return None
+            self._snapshot = snapshot
+            self._snapshot_error = None
+            logger.info("Graph snapshot %s", snapshot.memory())
+            return snapshot
+
+    def snapshot(self) -> GraphSnapshot | None:
+        """Snapshot của đúng version đang live; None (dùng Neo4j) nếu chưa nạp được."""
+        if not settings.graph_snapshot_enabled:
+            return None
+        version = self._graph_version()
+        snapshot = self._snapshot
+        return snapshot if snapshot is not None and snapshot.version == version else None
+
+    def get_links_for_chunks(
+        self, chunk_ids: list[int], limit: int = 4, timeout: float | None = None
+    ) -> list[dict]:
+        if not chunk_ids:
+            return []
+        snapshot = self.snapshot()
+        if snapshot is not None:
+            return snapshot.links_for_chunks(chunk_ids, limit)
+        if self._driver is None:
             return []
-        query = """
-        MATCH (c:Chunk)
-        WHERE c.chunk_id IN $chunk_ids
-        OPTIONAL MATCH (c)<-[:MENTIONED_IN]-(e:Entity)
-        OPTIONAL MATCH (c)-[:BELONGS_TO]->(d:Dynasty)
-        WITH c, d, collect(DISTINCT e.name) AS entities
-        RETURN c.chunk_id AS chunk_id,
-               coalesce(c.summary, substring(c.text,0,220)) AS summary,
-               d.name AS dynasty,
-               entities
-        ORDER BY c.chunk_id
-        LIMIT $limit
-        """
-        with self._driver.session(database=settings.graph_database) as session:
-            records = session.run(query, chunk_ids=chunk_ids, limit=limit).data()
+        key, cached = self._lookup(chunk_ids, limit)
+        if cached is not None:
+            return cached
+        version, ids, limit = key
+        with self._driver.session(database=settings.graph_database, default_access_mode=READ_ACCESS) as session:
+            records = session.run(
+                Query(LINKS_QUERY, timeout=timeout or settings.graph_query_timeout),
+                chunk_ids=list(ids),
+                limit=limit,
+                version=version,
+            ).data()
+        return self._store(key, records)
+
+    def _lookup(self, chunk_ids: list[int], limit: int) -> tuple[tuple, list[dict] | None]:
+        # Query sắp xếp theo chunk_id nên thứ tự/trùng lặp của input không đổi kết quả.
+        key = (self._graph_version(), tuple(sorted({int(chunk_id) for chunk_id in chunk_ids})), limit)
+        cached = self._cache.get(key)
+        return key, [dict(link) for link in cached] if cached is not None else None
+
+    def _store(self, key: tuple, records: list[dict]) -> list[dict]:
+        links = self._format_links(records)
+        self._cache.set(key, links)
+        return [dict(link) for link in links]
+
+    @staticmethod
+    def _format_links(records: list[dict]) -> list[dict]:
+        store = current_chunk_store()
         links: list[dict[str, Any]] = []
         for record in records:
             dynasty = record.get("dynasty") or "Tư liệu"
             entities = record.get("entities") or []
             label = f"{dynasty} · {', '.join(entities[:3])}" if entities else dynasty
+            stored = store.get(int(record["chunk_id"])) if store is not None and record.get("chunk_id") is not None else None
             links.append(
                 {
                     "relation": label,
-                    "description": record.get("summary") or "",
+                    "description": (stored or record).get("summary") or "",
                     "chunk_id": int(record.get("chunk_id")) if record.get("chunk_id") is not None else None,
                 }
             )
         return links
 
+    async def _run_async(self, query: str, timeout: float, **params: Any) -> list[dict]:
+        attempt = 0
+        while True:
+            try:
+                async with self._get_async_driver().session(
+                    database=settings.graph_database, default_access_mode=READ_ACCESS
+                ) as session:
+                    result = await session.run(Query(query, timeout=timeout), **params)
+                    return await result.data()
+            except (Neo4jError, DriverError) as exc:
+                # Chỉ thử lại lỗi tạm thời (leader đổi, connection bị đóng...); lỗi query thì ném luôn.
+                if attempt >= settings.graph_query_retries or not exc.is_retryable():
+                    raise
+                attempt += 1
+                await asyncio.sleep(settings.graph_retry_backoff * 2 ** (attempt - 1))
+
+    async def _query_async(self, query: str, timeout: float | None, **params: Any) -> list[dict] | None:
+        """Chạy query đọc; None nếu Neo4j không khả dụng/hết giờ/lỗi để caller dùng fallback."""
+        if time.monotonic() < self._unavailable_until:
+            return None
+        timeout = timeout or settings.graph_query_timeout
+        try:
+            # timeout gửi kèm query để Neo4j tự huỷ; wait_for chặn tổng thời gian kể cả retry.
+            records = await asyncio.wait_for(self._run_async(query, timeout, **params), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._last_error = "timeout"
+            return None
+        except (ServiceUnavailable, OSError) as exc:
+            self._unavailable_until = time.monotonic() + settings.graph_unavailable_cooldown
+            self._last_error = str(exc)
+            logger.warning("Neo4j không khả dụng, tạm bỏ qua graph: %s", exc)
+            return None
+        except (Neo4jError, DriverError) as exc:
+            self._last_error = str(exc)
+            logger.warning("Truy vấn graph lỗi: %s", exc)
+            return None
+        self._last_error = None
+        return records
+
+    async def get_links_for_chunks_async(
+        self, chunk_ids: list[int], limit: int = 4, timeout: float | None = None
+    ) -> list[dict]:
+        if not chunk_ids:
+            return []
+        snapshot = self.snapshot()
+        if snapshot is not None:
+            return snapshot.links_for_chunks(chunk_ids, limit)
+        key, cached = self._lookup(chunk_ids, limit)
+        if cached is not None:
+            # Hit trả ngay trên event loop, không mở session.
+            return cached
+        version, ids, limit = key
+        records = await self._query_async(LINKS_QUERY, timeout, chunk_ids=list(ids), limit=limit, version=version)
+        if records is None:
+            return []
+        return self._store(key, records)
+
+    def gazetteer(self) -> Gazetteer:
+        """Gazetteer trên tập entity của graph đang live (kèm bí danh), biên dịch lại khi đổi version."""
+        snapshot = self.snapshot()
+        if snapshot is not None:
+            names = snapshot.entity_names
+        else:
+            store = current_chunk_store()
+            names = store.entities if store is not None else []
+        key = (self._cached_version, len(names))
+        if self._gazetteer is None or self._gazetteer[0] != key:
+            self._gazetteer = (key, Gazetteer(names, ENTITY_ALIASES))
+        return self._gazetteer[1]
+
+    async def links_for_text_async(
+        self, text: str, limit: int = 4, prefer: str | None = None, timeout: float | None = None
+    ) -> list[dict]:
+        """Link có căn cứ cho một đoạn text (vd. câu trả lời): entity nhận bằng gazetteer, quan hệ lấy từ graph."""
+        gazetteer = self.gazetteer()
+        names = gazetteer.find(text)
+        preferred = gazetteer.find(prefer) if prefer else []
+        names = preferred[:1] + [name for name in names if name not in preferred[:1]]
+        if not names:
+            return []
+        names = names[: settings.graph_answer_entities]
+        snapshot = self.snapshot()
+        if snapshot is not None:
+            rows = snapshot.chunks_mentioning(names)
+        else:
+            rows = await self._query_async(
+                ENTITY_CHUNKS_QUERY, timeout, names=names, limit=50, version=self._graph_version()
+            )
+            if rows is None:
+                return []
+        return build_entity_links(names, rows, limit)
+
+    async def close(self) -> None:
+        if self._async_driver is not None:
+            await self._async_driver.close()
+            self._async_driver = None
+        if self._driver is not None:
+            self._driver.close()
+
+    def health(self) -> dict:
+        cooccurrence = current_cooccurrence()
+        return {
+            "connected": self._driver is not None,
+            "error": str(self._init_error) if self._init_error else self._last_error,
+            "graph_version": self._cached_version,
+            "unavailable_for": round(max(0.0, self._unavailable_until - time.monotonic()), 2),
+            "pool_size": settings.graph_pool_size,
+            "cache": self._cache.stats(),
+            "snapshot": self._snapshot.memory() if self._snapshot is not None else None,
+            "snapshot_error": self._snapshot_error,
+            "snapshot_loading": self._snapshot_loading,
+            "cooccurrence": cooccurrence.memory() if cooccurrence is not None else None,
+        }
+
 
 graph_service = GraphService()
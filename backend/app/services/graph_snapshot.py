@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import sys
+import time
+from typing import Iterable
+
+import numpy as np
+
+from app.services.chunk_store import ChunkStore
+
+SNAPSHOT_QUERY = """
+MATCH (c:Chunk)
+WHERE $version IS NULL OR c.version = $version
+OPTIONAL MATCH (c)-[:BELONGS_TO]->(d:Dynasty)
+OPTIONAL MATCH (c)<-[:MENTIONED_IN]-(e:Entity)
+RETURN c.chunk_id AS chunk_id,
+       d.name AS dynasty,
+       coalesce(c.summary, substring(c.text,0,220)) AS summary,
+       collect(DISTINCT e.name) AS entities
+"""
+
+
+def _csr(groups: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    lengths = np.fromiter((len(group) for group in groups), dtype=np.int64, count=len(groups))
+    offsets = np.zeros(len(groups) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    values = np.concatenate(groups).astype(np.int32) if groups else np.zeros(0, np.int32)
+    return offsets, values
+
+
+class GraphSnapshot:
+    """Ảnh chụp graph Chunk–Entity–Dynasty của một version, giữ trong process.
+
+    Chunk sắp theo chunk_id (tra bằng searchsorted); cạnh MENTIONED_IN lưu hai chiều dạng
+    CSR (chunk → entity và entity → chunk) trên mảng numpy; tên entity/triều đại được intern
+    một lần. Summary đọc từ chunk store mmap nếu có, nếu không thì giữ list chuỗi lấy từ Neo4j.
+    """
+
+    def __init__(
+        self,
+        version: str | None,
+        chunk_ids: np.ndarray,
+        dynasty_ids: np.ndarray,
+        chunk_entity_offsets: np.ndarray,
+        chunk_entities: np.ndarray,
+        entity_names: list[str],
+        dynasty_names: list[str],
+        store: ChunkStore | None = None,
+        store_index: np.ndarray | None = None,
+        summaries: list[str] | None = None,
+    ) -> None:
+        self.version = version
+        self.loaded_at = time.time()
+        self.chunk_ids = chunk_ids
+        self.dynasty_ids = dynasty_ids
+        self.entity_names = entity_names
+        self.entity_index = {name: idx for idx, name in enumerate(entity_names)}
+        self.dynasty_names = dynasty_names
+        self._store = store
+        self._store_index = store_index
+        self._summaries = summaries
+        self.chunk_entity_offsets = chunk_entity_offsets
+        self.chunk_entities = chunk_entities
+        # Đảo chiều: sắp cạnh theo entity (stable nên chunk trong mỗi entity vẫn tăng dần theo chunk_id).
+        edge_chunks = np.repeat(np.arange(len(chunk_ids), dtype=np.int32), np.diff(self.chunk_entity_offsets))
+        order = np.argsort(self.chunk_entities, kind="stable")
+        self.entity_chunks = edge_chunks[order]
+        counts = np.bincount(self.chunk_entities, minlength=len(entity_names))
+        self.entity_chunk_offsets = np.zeros(len(entity_names) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.entity_chunk_offsets[1:])
+
+    @classmethod
+    def from_chunk_store(cls, store: ChunkStore, version: str | None) -> "GraphSnapshot":
+        order = np.argsort(store.ids, kind="stable")
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        offsets, entity_ids = store.entity_csr()
+        edge_pos = np.repeat(rank, np.diff(offsets).astype(np.int64))
+        # Bỏ cạnh trùng (như collect(DISTINCT)) nhưng giữ thứ tự xuất hiện trong chunk,
+        # rồi gom cạnh theo vị trí chunk đã sắp — toàn bộ bằng numpy, không lặp từng chunk.
+        keys = edge_pos * max(1, len(store.entities)) + entity_ids
+        keep = np.sort(np.unique(keys, return_index=True)[1])
+        keep = keep[np.argsort(edge_pos[keep], kind="stable")]
+        chunk_entity_offsets = np.zeros(len(order) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(edge_pos[keep], minlength=len(order)), out=chunk_entity_offsets[1:])
+        return cls(
+            version=version,
+            chunk_ids=np.asarray(store.ids[order], dtype=np.int64),
+            dynasty_ids=np.asarray(store.period_ids[order], dtype=np.int32),
+            chunk_entity_offsets=chunk_entity_offsets,
+            chunk_entities=np.asarray(entity_ids[keep], dtype=np.int32),
+            entity_names=list(store.entities),
+            dynasty_names=[label for _, label in store.periods],
+            store=store,
+            store_index=order.astype(np.int32),
+        )
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict], version: str | None) -> "GraphSnapshot":
+        entities: dict[str, int] = {}
+        dynasties: dict[str, int] = {}
+        rows = sorted(records, key=lambda record: int(record["chunk_id"]))
+        groups = [
+            np.fromiter(
+                (entities.setdefault(name, len(entities)) for name in dict.fromkeys(record.get("entities") or [])),
+                dtype=np.int32,
+            )
+            for record in rows
+        ]
+        dynasty_ids = np.fromiter(
+            (
+                dynasties.setdefault(record["dynasty"], len(dynasties)) if record.get("dynasty") else -1
+                for record in rows
+            ),
+            dtype=np.int32,
+            count=len(rows),
+        )
+        chunk_entity_offsets, chunk_entities = _csr(groups)
+        return cls(
+            version=version,
+            chunk_ids=np.fromiter((int(record["chunk_id"]) for record in rows), dtype=np.int64, count=len(rows)),
+            dynasty_ids=dynasty_ids,
+            chunk_entity_offsets=chunk_entity_offsets,
+            chunk_entities=chunk_entities,
+            entity_names=list(entities),
+            dynasty_names=list(dynasties),
+            summaries=[record.get("summary") or "" for record in rows],
+        )
+
+    @classmethod
+    def from_neo4j(cls, session, version: str | None) -> "GraphSnapshot":
+        return cls.from_records(session.run(SNAPSHOT_QUERY, version=version).data(), version)
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def position(self, chunk_id: int) -> int | None:
+        pos = int(np.searchsorted(self.chunk_ids, chunk_id))
+        if pos < len(self.chunk_ids) and int(self.chunk_ids[pos]) == chunk_id:
+            return pos
+        return None
+
+    def summary(self, pos: int) -> str:
+        if self._store is not None:
+            return self._store.summary_at(int(self._store_index[pos]))
+        return self._summaries[pos]
+
+    def dynasty(self, pos: int) -> str | None:
+        dynasty_id = int(self.dynasty_ids[pos])
+        return self.dynasty_names[dynasty_id] if dynasty_id >= 0 else None
+
+    def entities_of(self, pos: int) -> list[str]:
+        start, end = self.chunk_entity_offsets[pos], self.chunk_entity_offsets[pos + 1]
+        return [self.entity_names[int(entity)] for entity in self.chunk_entities[start:end]]
+
+    def chunks_for_entity(self, name: str, limit: int | None = None) -> list[int]:
+        entity = self.entity_index.get(name)
+        if entity is None:
+            return []
+        start, end = self.entity_chunk_offsets[entity], self.entity_chunk_offsets[entity + 1]
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.chunk_ids[self.entity_chunks[start:end]].tolist()
+
+    def chunks_mentioning(self, names: Iterable[str], limit: int = 50) -> list[dict]:
+        """Chunk nhắc tới các entity trong `names`, chunk chứa nhiều entity nhất trước (như ENTITY_CHUNKS_QUERY)."""
+        wanted = [self.entity_index[name] for name in names if name in self.entity_index]
+        if not wanted:
+            return []
+        positions = np.concatenate(
+            [self.entity_chunks[self.entity_chunk_offsets[entity] : self.entity_chunk_offsets[entity + 1]] for entity in wanted]
+        )
+        unique, counts = np.unique(positions, return_counts=True)
+        wanted_set = set(wanted)
+        rows: list[dict] = []
+        for pos in unique[np.lexsort((unique, -counts))[:limit]].tolist():
+            start, end = self.chunk_entity_offsets[pos], self.chunk_entity_offsets[pos + 1]
+            rows.append(
+                {
+                    "chunk_id": int(self.chunk_ids[pos]),
+                    "found": [self.entity_names[e] for e in self.chunk_entities[start:end].tolist() if e in wanted_set],
+                    "dynasty": self.dynasty(pos),
+                    "summary": self.summary(pos),
+                }
+            )
+        return rows
+
+    def links_for_chunks(self, chunk_ids: Iterable[int], limit: int = 4) -> list[dict]:
+        """Cùng kết quả với LINKS_QUERY của GraphService: theo chunk_id tăng dần, tối đa `limit`."""
+        links: list[dict] = []
+        for chunk_id in sorted({int(chunk_id) for chunk_id in chunk_ids}):
+            if len(links) >= limit:
+                break
+            pos = self.position(chunk_id)
+            if pos is None:
+                continue
+            dynasty = self.dynasty(pos) or "Tư liệu"
+            entities = self.entities_of(pos)
+            label = f"{dynasty} · {', '.join(entities[:3])}" if entities else dynasty
+            links.append({"relation": label, "description": self.summary(pos), "chunk_id": chunk_id})
+        return links
+
+    def memory(self) -> dict:
+        arrays = (
+            self.chunk_ids,
+            self.dynasty_ids,
+            self.chunk_entity_offsets,
+            self.chunk_entities,
+            self.entity_chunk_offsets,
+            self.entity_chunks,
+            self._store_index,
+        )
+        array_bytes = sum(array.nbytes for array in arrays if array is not None)
+        string_bytes = sum(sys.getsizeof(name) for name in (*self.entity_names, *self.dynasty_names))
+        string_bytes += sys.getsizeof(self.entity_index) + sum(
+            sys.getsizeof(summary) for summary in self._summaries or ()
+        )
+        return {
+            "version": self.version,
+            "source": "chunk_store" if self._store is not None else "neo4j",
+            "chunks": len(self.chunk_ids),
+            "entities": len(self.entity_names),
+            "dynasties": len(self.dynasty_names),
+            "edges": int(len(self.chunk_entities)),
+            "array_bytes": int(array_bytes),
+            "string_bytes": int(string_bytes),
+            "loaded_at": self.loaded_at,
+        }
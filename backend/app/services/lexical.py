@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import heapq
+import json
+import math
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from app.services.chunk_store import ChunkStore
+
+
+def normalize(text: str | None) -> str:
+    """Hạ chữ thường, bỏ dấu tiếng Việt (kể cả đ → d) và ký tự không phải chữ/số."""
+    lowered = (text or "").lower().replace("đ", "d")
+    decomposed = unicodedata.normalize("NFD", lowered)
+    stripped = "".join(ch for ch in decomposed if unicodedata.category(ch) != "Mn")
+    return "".join(ch if ch.isalnum() else " " for ch in stripped)
+
+
+def tokenize(text: str | None) -> list[str]:
+    """Âm tiết không dấu + bigram liền kề để tên riêng nhiều âm tiết khớp chặt hơn."""
+    syllables = normalize(text).split()
+    bigrams = [f"{a}_{b}" for a, b in zip(syllables, syllables[1:])]
+    return syllables + bigrams
+
+
+FILTER_FIELDS = ("period", "source")
+
+
+def filter_values(filters: dict[str, Any] | None, field: str) -> list[str] | None:
+    """Giá trị lọc của một trường: chấp nhận một chuỗi hoặc danh sách; None nếu không lọc."""
+    values = (filters or {}).get(field)
+    if isinstance(values, str):
+        values = [values]
+    if isinstance(values, (list, tuple)) and values:
+        return [str(value) for value in values]
+    return None
+
+
+def matches_filters(doc: dict, filters: dict[str, Any] | None) -> bool:
+    for field in FILTER_FIELDS:
+        values = filter_values(filters, field)
+        if values is not None and doc.get(field) not in values:
+            return False
+    return True
+
+
+class LexicalIndex:
+    """Chỉ mục đảo BM25 trên text của chunk, không phân biệt dấu.
+
+    File index chỉ giữ chunk_id, độ dài và posting của từng chunk; text và metadata của kết
+    quả (kể cả trường dùng để lọc) đọc từ chunk store mmap cùng build, nên RAM không giữ
+    bản sao text của corpus.
+    """
+
+    def __init__(
+        self,
+        chunk_ids: Iterable[int],
+        postings: dict[str, list[list[int]]],
+        doc_lengths: Iterable[int],
+        k1: float = 1.5,
+        b: float = 0.75,
+        store: ChunkStore | None = None,
+    ) -> None:
+        self.chunk_ids = np.asarray(list(chunk_ids), dtype=np.int64)
+        self.postings = postings
+        self.doc_lengths = np.asarray(list(doc_lengths), dtype=np.int32)
+        self.k1 = k1
+        self.b = b
+        self.avgdl = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0.0
+        self.store = store
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    @classmethod
+    def build(cls, chunks: Iterable[dict], store: ChunkStore | None = None) -> "LexicalIndex":
+        chunk_ids: list[int] = []
+        postings: dict[str, list[list[int]]] = {}
+        doc_lengths: list[int] = []
+        for doc_idx, chunk in enumerate(chunks):
+            chunk_ids.append(int(chunk["chunk_id"]))
+            terms = tokenize(chunk.get("text"))
+            doc_lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                postings.setdefault(term, []).append([doc_idx, tf])
+        return cls(chunk_ids, postings, doc_lengths, store=store)
+
+    def _idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        n = len(self.chunk_ids)
+        return math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+
+    def _position(self, doc_idx: int) -> int | None:
+        # Index dựng theo đúng thứ tự chunk store nên thường trùng vị trí; lệch thì tra bảng băm.
+        chunk_id = int(self.chunk_ids[doc_idx])
+        if doc_idx < len(self.store) and int(self.store.ids[doc_idx]) == chunk_id:
+            return doc_idx
+        return self.store.index_of(chunk_id)
+
+    def _matches(self, doc_idx: int, filters: dict[str, Any] | None) -> bool:
+        if not any(filter_values(filters, field) is not None for field in FILTER_FIELDS):
+            return True
+        pos = self._position(doc_idx)
+        return pos is not None and matches_filters(self.store.filter_fields_at(pos), filters)
+
+    def search(self, query: str, top_k: int, filters: dict[str, Any] | None = None) -> list[dict]:
+        if self.store is None or not len(self.chunk_ids) or top_k <= 0:
+            return []
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            entries = self.postings.get(term)
+            if not entries:
+                continue
+            idf = self._idf(term)
+            for doc_idx, tf in entries:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_idx] / (self.avgdl or 1.0))
+                scores[doc_idx] = scores.get(doc_idx, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        candidates = ((score, doc_idx) for doc_idx, score in scores.items() if self._matches(doc_idx, filters))
+        results: list[dict] = []
+        for score, doc_idx in heapq.nlargest(top_k, candidates):
+            pos = self._position(doc_idx)
+            if pos is None:
+                continue
+            record = self.store.record(pos)
+            results.append(
+                {
+                    "chunk_id": record["chunk_id"],
+                    "text": record["text"],
+                    "source": record["source"],
+                    "dynasty": record["period"],
+                    "entities": record["entities"],
+                    "page_start": record["page_start"] or None,
+                    "page_end": record["page_end"] or None,
+                    "score": float(score),
+                }
+            )
+        return results
+
+    def save(self, path: Path) -> None:
+        payload = {
+            "k1": self.k1,
+            "b": self.b,
+            "chunk_ids": self.chunk_ids.tolist(),
+            "doc_lengths": self.doc_lengths.tolist(),
+            "postings": self.postings,
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(payload, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path, store: ChunkStore | None = None) -> "LexicalIndex | None":
+        if not path.exists():
+            return None
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        # Index cũ còn lưu cả text ("docs"): chỉ lấy chunk_id, phần còn lại bỏ.
+        chunk_ids = payload.get("chunk_ids") or [doc["chunk_id"] for doc in payload.get("docs", [])]
+        return cls(
+            chunk_ids=chunk_ids,
+            postings=payload["postings"],
+            doc_lengths=payload["doc_lengths"],
+            k1=payload.get("k1", 1.5),
+            b=payload.get("b", 0.75),
+            store=store,
+        )
+
+
+def reciprocal_rank_fusion(rankings: list[list[dict]], top_k: int, k: int = 60) -> list[dict]:
+    """Gộp nhiều danh sách xếp hạng theo RRF: score = Σ 1 / (k + rank)."""
+    fused: dict[int, float] = {}
+    first_seen: dict[int, dict] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            chunk_id = doc["chunk_id"]
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (k + rank)
+            first_seen.setdefault(chunk_id, doc)
+    ordered = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [{**first_seen[chunk_id], "score": score} for chunk_id, score in ordered]
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+def compute_checksum(chunks: Iterable[dict]) -> str:
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(str(chunk["chunk_id"]).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update((chunk.get("text") or "").encode("utf-8"))
+        digest.update(b"\0")
+        digest.update((chunk.get("period") or "").encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(json.dumps(chunk.get("entities") or [], ensure_ascii=False).encode("utf-8"))
+        digest.update(b"\n")
+    return f"sha256:{digest.hexdigest()}"
+
+
+def build_manifest(chunks: Iterable[dict], notes: str | None = None, extra: dict | None = None) -> dict:
+    # Nhận cả generator (vd. đọc lại chunk store) nên tự đếm thay vì len().
+    count = 0
+
+    def counted() -> Iterable[dict]:
+        nonlocal count
+        for chunk in chunks:
+            count += 1
+            yield chunk
+
+    checksum = compute_checksum(counted())
+    now = datetime.now(timezone.utc)
+    return {
+        # Mỗi lần build sinh version mới, kể cả khi nội dung không đổi.
+        "version": f"{now.strftime('%Y%m%dT%H%M%SZ')}-{checksum.split(':', 1)[1][:8]}",
+        "docs_count": count,
+        "embedding_model": settings.openai_embed_model,
+        "embedding_dimensions": settings.openai_embed_dimensions,
+        "checksum": checksum,
+        "created_at": now.isoformat(),
+        "notes": notes or "",
+        **(extra or {}),
+    }
+
+
+def write_manifest(manifest: dict, path: Path | None = None) -> None:
+    target = path or Path(settings.rag_manifest_path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(target.suffix + ".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, target)
+
+
+def read_manifest(path: Path | None = None) -> dict | None:
+    target = path or Path(settings.rag_manifest_path)
+    if not target.exists():
+        return None
+    try:
+        return json.loads(target.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+class ManifestWatcher:
+    """Đọc lại manifest khi file thay đổi (so mtime), để mọi worker thấy version mới."""
+
+    def __init__(self, path: Path | None = None) -> None:
+        self._path = path or Path(settings.rag_manifest_path)
+        self._lock = threading.Lock()
+        self._mtime_ns: int | None = None
+        self._manifest: dict | None = None
+
+    def current(self) -> dict | None:
+        try:
+            mtime_ns = self._path.stat().st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        if mtime_ns != self._mtime_ns:
+            with self._lock:
+                if mtime_ns != self._mtime_ns:
+                    self._manifest = read_manifest(self._path) if mtime_ns is not None else None
+                    self._mtime_ns = mtime_ns
+        return self._manifest
+
+    @property
+    def version(self) -> str | None:
+        manifest = self.current()
+        return manifest.get("version") if manifest else None
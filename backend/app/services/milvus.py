@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+
+from pymilvus import Collection, connections, utility
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+@dataclass
+class _Slot:
+    alias: str
+    collection: Collection | None = None
+    state: str = "disconnected"  # disconnected | connected | backoff | missing_collection
+    attempts: int = 0
+    last_error: str | None = None
+    next_retry_at: float = 0.0
+    connected_at: float | None = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class MilvusPool:
+    """Nhiều alias kết nối Milvus, kết nối lười và tự nối lại với backoff luỹ thừa.
+
+    Mỗi alias có một gRPC channel riêng nên các search đồng thời không phải xếp hàng
+    trên cùng một channel. Alias lỗi được đưa về trạng thái backoff và nạp lại collection
+    ở lần dùng kế tiếp.
+    """
+
+    def __init__(self, collection_name: str, size: int | None = None) -> None:
+        self.collection_name = collection_name
+        size = max(1, size or settings.milvus_pool_size)
+        self._slots = [_Slot(alias=f"rag-{idx}") for idx in range(size)]
+        self._cursor = 0
+        self._cursor_lock = threading.Lock()
+
+    def _next_slots(self) -> list[_Slot]:
+        with self._cursor_lock:
+            start = self._cursor
+            self._cursor = (self._cursor + 1) % len(self._slots)
+        return self._slots[start:] + self._slots[:start]
+
+    def _backoff(self, slot: _Slot, error: str, state: str = "backoff") -> None:
+        slot.attempts += 1
+        delay = min(settings.milvus_backoff_max, settings.milvus_backoff_base * 2 ** (slot.attempts - 1))
+        slot.next_retry_at = time.monotonic() + delay * random.uniform(0.5, 1.0)
+        slot.state = state
+        slot.last_error = error
+        slot.collection = None
+
+    def _connect(self, slot: _Slot) -> Collection | None:
+        with slot.lock:
+            if slot.collection is not None:
+                return slot.collection
+            if time.monotonic() < slot.next_retry_at:
+                return None
+            try:
+                connections.connect(
+                    alias=slot.alias,
+                    host=settings.milvus_host,
+                    port=settings.milvus_port,
+                    timeout=settings.milvus_connect_timeout,
+                )
+                if not utility.has_collection(self.collection_name, using=slot.alias):
+                    self._backoff(slot, "collection_not_found", state="missing_collection")
+                    return None
+                collection = Collection(self.collection_name, using=slot.alias)
+                collection.load()
+            except Exception as exc:
+                self._backoff(slot, str(exc))
+                return None
+            slot.collection = collection
+            slot.state = "connected"
+            slot.attempts = 0
+            slot.last_error = None
+            slot.connected_at = time.time()
+            return collection
+
+    def acquire(self) -> Collection:
+        slots = self._next_slots()
+        for slot in slots:
+            if slot.collection is not None:
+                return slot.collection
+        # Mỗi request chỉ thử nối lại tối đa một alias đến hạn, tránh cộng dồn connect timeout.
+        now = time.monotonic()
+        for slot in slots:
+            if now >= slot.next_retry_at:
+                collection = self._connect(slot)
+                if collection is not None:
+                    return collection
+                break
+        errors = {slot.last_error for slot in self._slots if slot.last_error}
+        raise RuntimeError(
+            "Milvus collection chưa được khởi tạo. Hãy chạy script build_rag trước khi truy vấn."
+            + (f" ({'; '.join(sorted(errors))})" if errors else "")
+        )
+
+    def mark_failed(self, collection: Collection, exc: Exception) -> None:
+        for slot in self._slots:
+            if slot.collection is collection:
+                with slot.lock:
+                    try:
+                        connections.disconnect(slot.alias)
+                    except Exception:  # pragma: no cover - channel đã hỏng
+                        pass
+                    self._backoff(slot, str(exc))
+
+    def reset(self, collection_name: str | None = None) -> None:
+        """Bỏ mọi kết nối hiện tại (vd. sau khi đổi collection) để lần sau nạp lại."""
+        if collection_name:
+            self.collection_name = collection_name
+        for slot in self._slots:
+            with slot.lock:
+                slot.collection = None
+                slot.state = "disconnected"
+                slot.attempts = 0
+                slot.next_retry_at = 0.0
+
+    def state(self) -> dict:
+        now = time.monotonic()
+        return {
+            "collection": self.collection_name,
+            "aliases": [
+                {
+                    "alias": slot.alias,
+                    "state": slot.state,
+                    "attempts": slot.attempts,
+                    "last_error": slot.last_error,
+                    "retry_in": round(max(0.0, slot.next_retry_at - now), 2) if slot.state != "connected" else 0.0,
+                    "connected_at": slot.connected_at,
+                }
+                for slot in self._slots
+            ],
+        }
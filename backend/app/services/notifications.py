@@ -1,35 +1,44 @@
 from datetime import datetime
 
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.models.core import Notification, UserNotification
 
 
-def seed_notifications(session: Session) -> None:
-    if session.exec(select(Notification)).first():
+async def seed_notifications(session: AsyncSession) -> None:
+    if (await session.exec(select(Notification))).first():
         return
     notifications = [
         Notification(title="Chào mừng đến VietSaga", body="Bắt đầu đặt câu hỏi để mở khoá quest đầu tiên!", category="system"),
     ]
     session.add_all(notifications)
-    session.commit()
+    await session.commit()
 
 
-def list_notifications(session: Session, user_id: int) -> list[dict]:
-    seed_notifications(session)
-    rows = session.exec(
-        select(UserNotification).where(UserNotification.user_id == user_id)
+async def list_notifications(session: AsyncSession, user_id: int) -> list[dict]:
+    await seed_notifications(session)
+    rows = (
+        await session.exec(select(UserNotification).where(UserNotification.user_id == user_id))
     ).all()
     if not rows:
-        notify = session.exec(select(Notification)).all()
+        notify = (await session.exec(select(Notification))).all()
         for base in notify:
             user_note = UserNotification(notification_id=base.id, user_id=user_id, is_read=False)
             session.add(user_note)
-        session.commit()
-        rows = session.exec(select(UserNotification).where(UserNotification.user_id == user_id)).all()
+        await session.commit()
+        rows = (
+            await session.exec(select(UserNotification).where(UserNotification.user_id == user_id))
+        ).all()
+    # Một truy vấn cho mọi notification gốc thay vì session.get từng dòng.
+    ids = {row.notification_id for row in rows}
+    notifications = {
+        item.id: item
+        for item in (await session.exec(select(Notification).where(Notification.id.in_(ids)))).all()
+    } if ids else {}
     result = []
     for row in rows:
-        notification = session.get(Notification, row.notification_id)
+        notification = notifications.get(row.notification_id)
         if notification:
             result.append(
                 {
@@ -44,15 +53,17 @@ def list_notifications(session: Session, user_id: int) -> list[dict]:
     return result
 
 
-def mark_read(session: Session, user_id: int, notification_id: int) -> None:
-    row = session.exec(
-        select(UserNotification).where(
-            UserNotification.user_id == user_id,
-            UserNotification.id == notification_id,
+async def mark_read(session: AsyncSession, user_id: int, notification_id: int) -> None:
+    row = (
+        await session.exec(
+            select(UserNotification).where(
+                UserNotification.user_id == user_id,
+                UserNotification.id == notification_id,
+            )
         )
     ).first()
     if row:
         row.is_read = True
         row.created_at = datetime.utcnow()
         session.add(row)
-        session.commit()
+        await session.commit()
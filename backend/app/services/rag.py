@@ -1,20 +1,31 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from pathlib import Path
 from typing import Any
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from pymilvus import (
     Collection,
     CollectionSchema,
     DataType,
     FieldSchema,
-    connections,
     utility,
 )
+from pymilvus.exceptions import MilvusException
 
 from app.config import get_settings
+from app.services.chunk_store import current_chunk_store
+from app.services.lexical import FILTER_FIELDS, LexicalIndex, filter_values, reciprocal_rank_fusion
+from app.services.manifest import ManifestWatcher
+from app.services.milvus import MilvusPool
+from app.utils.cache import TTLCache
+from app.utils.deadline import Deadline
 
 settings = get_settings()
 
@@ -29,30 +40,89 @@ class RetrievedChunk:
     score: float
 
 
+OUTPUT_FIELDS = ["chunk_id", "text", "source", "period", "entities", "page_start", "page_end"]
+# Khi có chunk store, Milvus chỉ cần trả chunk_id; text/metadata đọc từ mmap cục bộ.
+SLIM_OUTPUT_FIELDS = ["chunk_id"]
+IVF_INDEX_TYPES = {"IVF_FLAT", "IVF_SQ8", "IVF_PQ", "GPU_IVF_FLAT", "GPU_IVF_PQ"}
+
+
+def build_search_params(limit: int, overrides: dict[str, int] | None = None) -> dict:
+    """Tham số search khớp loại index đang dùng; override theo request bị kẹp trong giới hạn."""
+    overrides = overrides or {}
+    index_type = settings.milvus_index_type.upper()
+    if index_type == "HNSW":
+        ef = overrides.get("ef") or settings.milvus_search_ef
+        ef = min(max(int(ef), 1), settings.milvus_search_ef_max)
+        # HNSW yêu cầu ef >= limit (top_k).
+        params = {"ef": max(ef, limit)}
+    elif index_type in IVF_INDEX_TYPES:
+        nprobe = overrides.get("nprobe") or settings.milvus_search_nprobe
+        nlist = int(settings.milvus_index_params.get("nlist", settings.milvus_search_nprobe_max))
+        params = {"nprobe": min(max(int(nprobe), 1), settings.milvus_search_nprobe_max, nlist)}
+    else:
+        params = {}
+    return {"metric_type": settings.milvus_metric_type, "params": params}
+
+
 class RAGService:
     def __init__(self) -> None:
         self._client = OpenAI(api_key=settings.openai_api_key)
-        self._collection: Collection | None = None
-        self._init_error: Exception | None = None
-        try:
-            self._connect_vector_store()
-            self._collection = self._load_collection()
-        except Exception as exc:  # pragma: no cover - init guard
-            self._init_error = exc
-
-    def _connect_vector_store(self) -> None:
-        connections.connect(
-            alias="default",
-            host=settings.milvus_host,
-            port=settings.milvus_port,
-        )
+        self._async_client = AsyncOpenAI(api_key=settings.openai_api_key)
+        self._manifest = ManifestWatcher()
+        # Kết nối Milvus lười: import module không chặn khi Milvus khởi động chậm.
+        self._pool = MilvusPool(self._live_collection())
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rag")
+        self._cache = TTLCache(settings.rag_cache_size, settings.rag_cache_ttl)
+        self._loaded_version = self._manifest.version
+        self._lexical: LexicalIndex | None = self._load_lexical()
+        self._reload_lock = threading.Lock()
+        self._reloading = False
 
-    def _load_collection(self) -> Collection:
-        if not utility.has_collection(settings.milvus_collection):
+    def _load_lexical(self) -> LexicalIndex | None:
+        # BM25 chỉ lưu posting; text/metadata của kết quả đọc từ chunk store cùng version.
+        store = current_chunk_store()
+        if store is None:
+            return None
+        try:
+            return LexicalIndex.load(Path(settings.rag_lexical_path), store)
+        except Exception:  # pragma: no cover - index hỏng thì chỉ dùng vector
             return None
-        collection = Collection(settings.milvus_collection)
-        collection.load()
-        return collection
+
+    def _live_collection(self) -> str:
+        manifest = self._manifest.current() or {}
+        return manifest.get("collection") or settings.milvus_collection
+
+    def _current_version(self) -> str | None:
+        """Version đã nạp xong (BM25 + collection); manifest mới thì nạp lại ở thread nền.
+
+        Gọi trên event loop (qua `_cache_key`) nên không được đọc index cỡ corpus tại đây:
+        tới lúc swap, request vẫn dùng index và cache key của version cũ.
+        """
+        if self._manifest.version != self._loaded_version:
+            self._reload_index()
+        return self._loaded_version
+
+    def _reload_index(self) -> None:
+        with self._reload_lock:
+            if self._reloading:
+                return
+            self._reloading = True
+
+        def run() -> None:
+            try:
+                # build_rag vừa ghi manifest mới: nạp lại BM25 và chuyển sang collection cùng version.
+                version = self._manifest.version
+                lexical = self._load_lexical()
+                with self._reload_lock:
+                    collection = self._live_collection()
+                    if collection != self._pool.collection_name:
+                        self._pool.reset(collection)
+                    self._lexical = lexical
+                    self._loaded_version = version
+            finally:
+                self._reloading = False
+
+        threading.Thread(target=run, name="rag-reload", daemon=True).start()
 
     def _embed(self, text: str) -> list[float]:
         if not text:
@@ -63,70 +133,426 @@ class RAGService:
         )
         return response.data[0].embedding
 
-    def retrieve(self, query: str, top_k: int | None = None, filters: dict[str, Any] | None = None) -> list[dict]:
-        if self._collection is None:
-            raise RuntimeError(
-                "Milvus collection chưa được khởi tạo. Hãy chạy script build_rag trước khi truy vấn."
+    def _build_expr(self, filters: dict[str, Any] | None) -> str | None:
+        clauses = []
+        for field in FILTER_FIELDS:
+            values = filter_values(filters, field)
+            if values is not None:
+                # json.dumps cho chuỗi có nháy kép/escape hợp lệ với cú pháp expr của Milvus.
+                clauses.append(f"{field} in {json.dumps(values, ensure_ascii=False)}")
+        return " and ".join(clauses) or None
+
+    def _output_fields(self) -> list[str]:
+        return SLIM_OUTPUT_FIELDS if current_chunk_store() is not None else OUTPUT_FIELDS
+
+    def _hit_to_chunk(self, hit: Any) -> dict:
+        entity = hit.entity
+        chunk_id = entity.get("chunk_id")
+        if chunk_id is None:
+            chunk_id = hit.id
+        store = current_chunk_store()
+        record = store.get(int(chunk_id)) if store is not None else None
+        if record is not None:
+            return {
+                "chunk_id": int(chunk_id),
+                "text": record["text"],
+                "source": record["source"],
+                "dynasty": record["period"],
+                "entities": record["entities"],
+                "page_start": record["page_start"] or None,
+                "page_end": record["page_end"] or None,
+                "score": float(hit.score),
+            }
+        metadata = entity.get("entities")
+        entities = []
+        if metadata:
+            try:
+                entities = json.loads(metadata)
+            except json.JSONDecodeError:
+                entities = [metadata]
+        return {
+            "chunk_id": int(chunk_id),
+            "text": entity.get("text") or "",
+            "source": entity.get("source") or "",
+            "dynasty": entity.get("period"),
+            "entities": entities,
+            "page_start": entity.get("page_start") or None,
+            "page_end": entity.get("page_end") or None,
+            "score": float(hit.score),
+        }
+
+    def _require_collection(self) -> Collection:
+        self._current_version()
+        return self._pool.acquire()
+
+    def _search_by_vector(
+        self,
+        embedding: list[float],
+        top_k: int,
+        filters: dict[str, Any] | None,
+        timeout: float | None = None,
+        search_params: dict[str, int] | None = None,
+    ) -> list[dict]:
+        collection = self._require_collection()
+        try:
+            results = collection.search(
+                data=[embedding],
+                anns_field="embedding",
+                param=build_search_params(top_k, search_params),
+                limit=top_k,
+                output_fields=self._output_fields(),
+                expr=self._build_expr(filters),
+                timeout=timeout,
             )
+        except MilvusException as exc:
+            self._pool.mark_failed(collection, exc)
+            raise
+        if not results:
+            return []
+        return [self._hit_to_chunk(hit) for hit in results[0]]
+
+    def _vector_search(
+        self,
+        query: str,
+        top_k: int,
+        filters: dict[str, Any] | None,
+        search_params: dict[str, int] | None = None,
+    ) -> list[dict]:
+        # Thử lấy kết nối trước khi tốn embedding: Milvus down thì lỗi ngay, không gọi OpenAI.
+        self._require_collection()
+        return self._search_by_vector(self._embed(query), top_k, filters, search_params=search_params)
+
+    def _lexical_search(self, query: str, top_k: int, filters: dict[str, Any] | None) -> list[dict]:
+        if self._lexical is None:
+            return []
+        return self._lexical.search(query, top_k=top_k, filters=filters)
+
+    def _cache_key(
+        self,
+        query: str,
+        top_k: int,
+        filters: dict[str, Any] | None,
+        mode: str,
+        search_params: dict[str, int] | None = None,
+    ) -> tuple:
+        # Version của index nằm trong key: reindex làm mọi entry cũ tự hết hiệu lực.
+        query_hash = hashlib.sha1(query.strip().encode("utf-8")).hexdigest()
+        filters_key = json.dumps(filters or {}, sort_keys=True, ensure_ascii=False, default=list)
+        params_key = tuple(sorted((search_params or {}).items()))
+        return (self._current_version(), query_hash, filters_key, top_k, mode, params_key)
+
+    def retrieve(
+        self,
+        query: str,
+        top_k: int | None = None,
+        filters: dict[str, Any] | None = None,
+        mode: str | None = None,
+        search_params: dict[str, int] | None = None,
+    ) -> list[dict]:
         if top_k is None:
             top_k = settings.rag_top_k
-        embedding = self._embed(query)
-        search_params = {"metric_type": "IP", "params": {"nprobe": 10}}
-        expr = None
-        if filters and filters.get("period"):
-            periods = filters["period"]
-            if isinstance(periods, (list, tuple)):
-                period_list = ",".join([f'"{p}"' for p in periods])
-                expr = f"period in [{period_list}]"
-        results = self._collection.search(
-            data=[embedding],
-            anns_field="embedding",
-            param=search_params,
-            limit=top_k,
-            output_fields=["chunk_id", "text", "source", "period", "entities"],
-            expr=expr,
+        mode = mode or settings.rag_retrieval_mode
+        key = self._cache_key(query, top_k, filters, mode, search_params)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return list(cached)
+        docs, complete = self._retrieve(query, top_k, filters, mode, search_params)
+        if complete:
+            self._cache.set(key, docs)
+        return list(docs)
+
+    def _retrieve(
+        self,
+        query: str,
+        top_k: int,
+        filters: dict[str, Any] | None,
+        mode: str,
+        search_params: dict[str, int] | None = None,
+    ) -> tuple[list[dict], bool]:
+        """Trả (kết quả, đầy_đủ); kết quả fallback do lỗi không được đưa vào cache."""
+        if mode == "lexical" and self._lexical is not None:
+            return self._lexical_search(query, top_k, filters), True
+        if mode != "hybrid" or self._lexical is None:
+            try:
+                return self._vector_search(query, top_k, filters, search_params), True
+            except Exception:
+                if self._lexical is None:
+                    raise
+                # Embedding/Milvus lỗi: fallback BM25 cục bộ, không cần mạng.
+                return self._lexical_search(query, top_k, filters), False
+
+        depth = max(top_k, settings.rag_hybrid_candidates)
+        vector_future = self._executor.submit(self._vector_search, query, depth, filters, search_params)
+        lexical_hits = self._lexical_search(query, depth, filters)
+        try:
+            vector_hits = vector_future.result()
+        except Exception:
+            return lexical_hits[:top_k], False
+        return reciprocal_rank_fusion([vector_hits, lexical_hits], top_k=top_k, k=settings.rag_rrf_k), True
+
+    async def embed_async(self, text: str, timeout: float | None = None) -> list[float]:
+        if not text:
+            return [0.0] * settings.openai_embed_dimensions
+        response = await asyncio.wait_for(
+            self._async_client.embeddings.create(model=settings.openai_embed_model, input=text),
+            timeout=timeout,
         )
-        if not results:
-            return []
-        chunks: list[dict] = []
-        for hit in results[0]:
-            entity = hit.entity
-            chunk_id = entity.get("chunk_id")
-            if chunk_id is None:
-                chunk_id = hit.id
-            metadata = entity.get("entities")
-            entities = []
-            if metadata:
-                try:
-                    entities = json.loads(metadata)
-                except json.JSONDecodeError:
-                    entities = [metadata]
-            chunks.append(
-                {
-                    "chunk_id": int(chunk_id),
-                    "text": entity.get("text") or "",
-                    "source": entity.get("source") or "",
-                    "dynasty": entity.get("period"),
-                    "entities": entities,
-                    "score": float(hit.score),
-                }
+        return response.data[0].embedding
+
+    async def search_vector_async(
+        self,
+        embedding: list[float],
+        top_k: int,
+        filters: dict[str, Any] | None = None,
+        timeout: float | None = None,
+        search_params: dict[str, int] | None = None,
+    ) -> list[dict]:
+        # pymilvus không có API async: chạy trong thread, đồng thời truyền timeout
+        # xuống gRPC để thread không treo lại sau khi coroutine đã bị huỷ.
+        return await asyncio.wait_for(
+            asyncio.to_thread(self._search_by_vector, embedding, top_k, filters, timeout, search_params),
+            timeout=timeout,
+        )
+
+    async def lexical_search_async(self, query: str, top_k: int, filters: dict[str, Any] | None = None) -> list[dict]:
+        return await asyncio.to_thread(self._lexical_search, query, top_k, filters)
+
+    async def embed_many_async(self, texts: list[str], timeout: float | None = None) -> list[list[float]]:
+        """Embed nhiều câu truy vấn trong một request embeddings duy nhất."""
+        vectors: list[list[float]] = [[0.0] * settings.openai_embed_dimensions for _ in texts]
+        pending = [idx for idx, text in enumerate(texts) if text]
+        if not pending:
+            return vectors
+        response = await asyncio.wait_for(
+            self._async_client.embeddings.create(
+                model=settings.openai_embed_model,
+                input=[texts[idx] for idx in pending],
+            ),
+            timeout=timeout,
+        )
+        for data in response.data:
+            vectors[pending[data.index]] = data.embedding
+        return vectors
+
+    def _search_many_by_vector(
+        self,
+        embeddings: list[list[float]],
+        limits: list[int],
+        filters: list[dict[str, Any] | None],
+        timeout: float | None = None,
+        search_params: list[dict[str, int] | None] | None = None,
+    ) -> list[list[dict]]:
+        """Một lần collection.search nhiều vector cho mỗi nhóm (biểu thức lọc, tham số ANN) giống nhau."""
+        collection = self._require_collection()
+        search_params = search_params or [None] * len(embeddings)
+        groups: dict[tuple, list[int]] = {}
+        for idx, query_filters in enumerate(filters):
+            group_key = (self._build_expr(query_filters), tuple(sorted((search_params[idx] or {}).items())))
+            groups.setdefault(group_key, []).append(idx)
+        output: list[list[dict]] = [[] for _ in embeddings]
+        for (expr, params_key), indices in groups.items():
+            limit = max(limits[idx] for idx in indices)
+            try:
+                results = collection.search(
+                    data=[embeddings[idx] for idx in indices],
+                    anns_field="embedding",
+                    param=build_search_params(limit, dict(params_key)),
+                    limit=limit,
+                    output_fields=self._output_fields(),
+                    expr=expr,
+                    timeout=timeout,
+                )
+            except MilvusException as exc:
+                self._pool.mark_failed(collection, exc)
+                raise
+            for idx, hits in zip(indices, results):
+                output[idx] = [self._hit_to_chunk(hit) for hit in hits][: limits[idx]]
+        return output
+
+    async def retrieve_many_async(self, requests: list[dict[str, Any]], deadline: Deadline | None = None) -> list[list[dict]]:
+        """Truy vấn theo lô: mỗi phần tử gồm query, top_k, filters, mode; kết quả giữ đúng thứ tự."""
+        if deadline is None:
+            deadline = Deadline(settings.rag_retrieve_budget)
+        keys = [
+            self._cache_key(
+                req["query"],
+                req.get("top_k") or settings.rag_top_k,
+                req.get("filters"),
+                req.get("mode") or settings.rag_retrieval_mode,
+                req.get("search_params"),
             )
-        return chunks
+            for req in requests
+        ]
+        results: list[list[dict] | None] = [self._cache.get(key) for key in keys]
+        missing = [idx for idx, cached in enumerate(results) if cached is None]
+        if missing:
+            fresh, complete = await self._retrieve_many([requests[idx] for idx in missing], deadline)
+            for idx, docs in zip(missing, fresh):
+                results[idx] = docs
+                if complete:
+                    self._cache.set(keys[idx], docs)
+        return [list(docs) for docs in results]
+
+    async def _retrieve_many(
+        self, requests: list[dict[str, Any]], deadline: Deadline
+    ) -> tuple[list[list[dict]], bool]:
+        top_ks = [req.get("top_k") or settings.rag_top_k for req in requests]
+        modes = [req.get("mode") or settings.rag_retrieval_mode for req in requests]
+        if self._lexical is None:
+            modes = ["vector"] * len(requests)
+        complete = True
+        filters = [req.get("filters") for req in requests]
+
+        vector_idx = [idx for idx, mode in enumerate(modes) if mode != "lexical"]
+        lexical_idx = [idx for idx, mode in enumerate(modes) if mode != "vector"]
+        depths = [
+            max(top_k, settings.rag_hybrid_candidates) if mode == "hybrid" else top_k
+            for top_k, mode in zip(top_ks, modes)
+        ]
+
+        vector_hits: list[list[dict]] | None = None
+        if vector_idx:
+            try:
+                # Thử lấy kết nối trước khi tốn embedding; connect/load chặn nên chạy trong thread.
+                await asyncio.to_thread(self._require_collection)
+                embeddings = await self.embed_many_async(
+                    [requests[idx]["query"] for idx in vector_idx],
+                    timeout=deadline.remaining(settings.rag_embed_timeout),
+                )
+                search_timeout = deadline.remaining(settings.rag_search_timeout)
+                vector_hits = await asyncio.wait_for(
+                    asyncio.to_thread(
+                        self._search_many_by_vector,
+                        embeddings,
+                        [depths[idx] for idx in vector_idx],
+                        [filters[idx] for idx in vector_idx],
+                        search_timeout,
+                        [requests[idx].get("search_params") for idx in vector_idx],
+                    ),
+                    timeout=search_timeout,
+                )
+            except Exception:
+                if self._lexical is None:
+                    raise
+                lexical_idx = list(range(len(requests)))
+                modes = ["lexical"] * len(requests)
+                complete = False
+
+        lexical_results = await asyncio.gather(
+            *(self.lexical_search_async(requests[idx]["query"], depths[idx], filters[idx]) for idx in lexical_idx)
+        )
+        lexical_hits = dict(zip(lexical_idx, lexical_results))
+
+        by_vector = dict(zip(vector_idx, vector_hits)) if vector_hits is not None else {}
+        results: list[list[dict]] = []
+        for idx, mode in enumerate(modes):
+            if mode == "hybrid":
+                results.append(
+                    reciprocal_rank_fusion(
+                        [by_vector.get(idx, []), lexical_hits.get(idx, [])],
+                        top_k=top_ks[idx],
+                        k=settings.rag_rrf_k,
+                    )
+                )
+            elif mode == "lexical":
+                results.append(lexical_hits.get(idx, [])[: top_ks[idx]])
+            else:
+                results.append(by_vector.get(idx, [])[: top_ks[idx]])
+        return results, complete
+
+    async def _vector_path(
+        self,
+        query: str,
+        top_k: int,
+        filters: dict[str, Any] | None,
+        deadline: Deadline,
+        search_params: dict[str, int] | None = None,
+    ) -> list[dict]:
+        # Thử lấy kết nối trước khi tốn embedding; connect/load chặn nên chạy trong thread.
+        await asyncio.to_thread(self._require_collection)
+        embedding = await self.embed_async(query, timeout=deadline.remaining(settings.rag_embed_timeout))
+        return await self.search_vector_async(
+            embedding,
+            top_k,
+            filters,
+            timeout=deadline.remaining(settings.rag_search_timeout),
+            search_params=search_params,
+        )
+
+    async def retrieve_async(
+        self,
+        query: str,
+        top_k: int | None = None,
+        filters: dict[str, Any] | None = None,
+        mode: str | None = None,
+        deadline: Deadline | None = None,
+        search_params: dict[str, int] | None = None,
+    ) -> list[dict]:
+        """Phiên bản async của retrieve với timeout từng bước và ngân sách tổng."""
+        if top_k is None:
+            top_k = settings.rag_top_k
+        if deadline is None:
+            deadline = Deadline(settings.rag_retrieve_budget)
+        mode = mode or settings.rag_retrieval_mode
+        key = self._cache_key(query, top_k, filters, mode, search_params)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return list(cached)
+        docs, complete = await self._retrieve_async(query, top_k, filters, mode, deadline, search_params)
+        if complete:
+            self._cache.set(key, docs)
+        return list(docs)
+
+    async def _retrieve_async(
+        self,
+        query: str,
+        top_k: int,
+        filters: dict[str, Any] | None,
+        mode: str,
+        deadline: Deadline,
+        search_params: dict[str, int] | None = None,
+    ) -> tuple[list[dict], bool]:
+        if mode == "lexical" and self._lexical is not None:
+            return await self.lexical_search_async(query, top_k, filters), True
+        if mode != "hybrid" or self._lexical is None:
+            try:
+                return await self._vector_path(query, top_k, filters, deadline, search_params), True
+            except Exception:
+                if self._lexical is None:
+                    raise
+                return await self.lexical_search_async(query, top_k, filters), False
+
+        depth = max(top_k, settings.rag_hybrid_candidates)
+        vector_hits, lexical_hits = await asyncio.gather(
+            self._vector_path(query, depth, filters, deadline, search_params),
+            self.lexical_search_async(query, depth, filters),
+            return_exceptions=True,
+        )
+        if isinstance(lexical_hits, BaseException):
+            raise lexical_hits
+        if isinstance(vector_hits, BaseException):
+            return lexical_hits[:top_k], False
+        return reciprocal_rank_fusion([vector_hits, lexical_hits], top_k=top_k, k=settings.rag_rrf_k), True
 
     def health(self) -> dict:
-        if self._collection is None:
+        base = {
+            "vector_collection": self._pool.collection_name,
+            "lexical_documents": len(self._lexical) if self._lexical is not None else 0,
+            "index_version": self._manifest.version,
+            "cache": self._cache.stats(),
+        }
+        try:
+            collection = self._require_collection()
+            stats = collection.num_entities
+        except Exception as exc:
             return {
-                "vector_collection": settings.milvus_collection,
+                **base,
                 "documents": 0,
                 "ready": False,
-                "error": str(self._init_error) if self._init_error else "collection_not_initialized",
+                "error": str(exc),
+                "connection": self._pool.state(),
             }
-        stats = self._collection.num_entities if hasattr(self._collection, "num_entities") else 0
-        return {
-            "vector_collection": settings.milvus_collection,
-            "documents": stats,
-            "ready": stats > 0,
-        }
+        return {**base, "documents": stats, "ready": stats > 0, "connection": self._pool.state()}
 
 
 def ensure_collection(schema_name: str, dim: int) -> None:
@@ -139,14 +565,16 @@ def ensure_collection(schema_name: str, dim: int) -> None:
         FieldSchema(name="source", dtype=DataType.VARCHAR, max_length=512),
         FieldSchema(name="period", dtype=DataType.VARCHAR, max_length=128),
         FieldSchema(name="entities", dtype=DataType.VARCHAR, max_length=1024),
+        FieldSchema(name="page_start", dtype=DataType.INT64),
+        FieldSchema(name="page_end", dtype=DataType.INT64),
         FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=dim),
     ]
     schema = CollectionSchema(fields=fields, description="Vietnam history knowledge chunks")
     collection = Collection(name=schema_name, schema=schema)
     index_params = {
-        "metric_type": "IP",
-        "index_type": "HNSW",
-        "params": {"M": 16, "efConstruction": 200},
+        "metric_type": settings.milvus_metric_type,
+        "index_type": settings.milvus_index_type,
+        "params": settings.milvus_index_params,
     }
     collection.create_index(field_name="embedding", index_params=index_params)
     collection.load()
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from typing import Any
+
+import redis
+from redis.exceptions import LockError, RedisError
+
+from app.config import get_settings
+
+settings = get_settings()
+
+STATUS_KEY = "rag:reindex:status"
+LOCK_KEY = "rag:reindex:lock"
+ACTIVE_STATES = ("queued", "running")
+# Token lock chuyển cho process job qua biến môi trường: command line thì user nào cũng đọc được qua `ps`.
+TOKEN_ENV = "RAG_REINDEX_LOCK_TOKEN"
+
+
+class ReindexBusy(Exception):
+    def __init__(self, status: dict | None) -> None:
+        super().__init__("Đang có job reindex khác chạy")
+        self.status = status
+
+
+class ReindexJobs:
+    """Chạy build_rag (blue/green) trong một process riêng, tách khỏi worker API.
+
+    Lock và trạng thái job nằm trong Redis nên mọi worker đều thấy cùng một job và không
+    worker nào bắt đầu build thứ hai. Lock có TTL, được một thread heartbeat trong process job
+    gia hạn đều đặn (kể cả ở stage dài không báo tiến độ); process chết thì lock hết hạn và
+    `status()` báo job là failed.
+    """
+
+    def __init__(self, url: str | None = None) -> None:
+        self._redis = redis.Redis.from_url(url or settings.redis_url, decode_responses=True)
+        self._save_lock = threading.Lock()
+
+    def _lock(self) -> Any:
+        # thread_local=False: token được chuyển sang process job, gia hạn và nhả ở đó.
+        return self._redis.lock(LOCK_KEY, timeout=settings.rag_reindex_lock_ttl, thread_local=False)
+
+    def status(self) -> dict | None:
+        raw = self._redis.get(STATUS_KEY)
+        if not raw:
+            return None
+        status = json.loads(raw)
+        # Không có heartbeat quá TTL của lock: process job đã chết, lock cũng đã hết hạn.
+        idle = time.time() - (status.get("updated_at") or 0)
+        if status.get("state") in ACTIVE_STATES and idle > settings.rag_reindex_lock_ttl:
+            status["state"] = "failed"
+            status["error"] = status.get("error") or "stale: job không còn heartbeat (process reindex đã dừng)"
+        return status
+
+    def _save(self, status: dict) -> None:
+        status["updated_at"] = time.time()
+        self._redis.set(STATUS_KEY, json.dumps(status, ensure_ascii=False))
+
+    def _touch(self, status: dict, lock: Any) -> None:
+        with self._save_lock:
+            try:
+                lock.reacquire()
+                self._save(status)
+            except (LockError, RedisError):  # pragma: no cover - Redis chập chờn không làm hỏng build
+                pass
+
+    def start(self, full: bool = False) -> dict:
+        lock = self._lock()
+        if not lock.acquire(blocking=False):
+            raise ReindexBusy(self.status())
+        status = {
+            "job_id": uuid.uuid4().hex,
+            "state": "queued",
+            "stage": None,
+            "full": full,
+            "progress": {},
+            "started_at": time.time(),
+            "finished_at": None,
+            "error": None,
+            "result": None,
+        }
+        try:
+            self._save(status)
+            token = lock.local.token
+            token = token.decode() if isinstance(token, bytes) else token
+            command = [sys.executable, "-m", "app.services.reindex", status["job_id"]]
+            # Process mới (không fork worker uvicorn), session riêng để không chết theo reload/tín hiệu của API.
+            process = subprocess.Popen(
+                command + (["--full"] if full else []),
+                env={**os.environ, TOKEN_ENV: token},
+                start_new_session=True,
+            )
+        except Exception:
+            lock.release()
+            raise
+        threading.Thread(target=process.wait, name="rag-reindex-reaper", daemon=True).start()
+        return status
+
+    def _run(self, status: dict, lock: Any, full: bool) -> None:
+        # Import muộn: build_rag kéo theo pypdf/neo4j/OpenAI client, chỉ cần khi thật sự reindex.
+        from app.scripts import build_rag
+
+        stop = threading.Event()
+
+        def heartbeat() -> None:
+            while not stop.wait(max(1.0, settings.rag_reindex_lock_ttl / 3)):
+                self._touch(status, lock)
+
+        def progress(stage: str, **info: Any) -> None:
+            status["state"] = "running"
+            status["stage"] = stage
+            status["progress"].update(info)
+            self._touch(status, lock)
+
+        threading.Thread(target=heartbeat, name="rag-reindex-heartbeat", daemon=True).start()
+        try:
+            manifest = build_rag.run(full=full, progress=progress)
+            status["state"] = "succeeded"
+            status["result"] = {
+                "version": manifest.get("version"),
+                "collection": manifest.get("collection"),
+                "docs_count": manifest.get("docs_count"),
+            }
+        except Exception as exc:
+            status["state"] = "failed"
+            status["error"] = str(exc)
+        finally:
+            stop.set()
+            status["finished_at"] = time.time()
+            with self._save_lock:
+                try:
+                    self._save(status)
+                    lock.release()
+                except (LockError, RedisError):
+                    pass
+
+
+def run_job(job_id: str, token: str, full: bool = False) -> None:
+    """Điểm vào của process job: nhận lock (theo token) từ worker API đã lấy nó."""
+    jobs = ReindexJobs()
+    status = jobs.status()
+    if not status or status.get("job_id") != job_id:
+        return
+    lock = jobs._lock()
+    lock.local.token = token.encode()
+    jobs._run(status, lock, full)
+
+
+reindex_jobs = ReindexJobs()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process chạy một job reindex (do POST /admin/rag/reindex khởi động)")
+    parser.add_argument("job_id")
+    parser.add_argument("--full", action="store_true")
+    args = parser.parse_args()
+    # pop: process con của build_rag (pool đọc PDF) không thừa hưởng token.
+    token = os.environ.pop(TOKEN_ENV, None)
+    if not token:
+        parser.error(f"thiếu {TOKEN_ENV}")
+    run_job(args.job_id, token, full=args.full)
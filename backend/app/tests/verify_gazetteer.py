@@ -0,0 +1,39 @@
+import sys
+
+from app.utils.gazetteer import ENTITY_ALIASES, Gazetteer, chunk_tagger
+
+
+def test_gazetteer():
+    tagger = chunk_tagger()
+    failures = []
+
+    tags = tagger.tag("Trần Quốc Tuấn chỉ huy trận Bạch Đằng năm 1288.")
+    if tags.period != "Tran" or tags.entities != ["Trần Hưng Đạo"]:
+        failures.append(f"bí danh/period sai: {tags}")
+
+    tags = tagger.tag("Việc quản lý ruộng đất và lê dân được bàn bạc.")
+    if tags.period != "Unknown":
+        failures.append(f"token mơ hồ 'lý'/'lê' vẫn quyết định period: {tags}")
+
+    tags = tagger.tag("Năm 938 Ngô Quyền đánh tan quân Nam Hán trên sông Bạch Đằng.")
+    if tags.period != "TuChu":
+        failures.append(f"period không theo điểm cao nhất: {tags}")
+
+    tags = tagger.tag("An Dương Vương xây thành Cổ Loa năm 257 TCN.")
+    if tags.period != "BacThuoc" or "An Dương Vương" not in tags.entities:
+        failures.append(f"timeline/năm TCN chưa được dùng: {tags}")
+
+    found = Gazetteer(["Trần Hưng Đạo", "Nhà Trần"], ENTITY_ALIASES).find("Trần Hưng Đạo, nhà Trần; Trần Quốc Tuấn")
+    if found != ["Trần Hưng Đạo", "Nhà Trần"]:
+        failures.append(f"leftmost-longest sai: {found}")
+
+    if failures:
+        print("FAILURE:")
+        for failure in failures:
+            print(f"  -> {failure}")
+        sys.exit(1)
+    print("SUCCESS: Gazetteer gắn entity và period đúng.")
+
+
+if __name__ == "__main__":
+    test_gazetteer()
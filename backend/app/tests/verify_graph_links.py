@@ -1,117 +1,54 @@
-from dataclasses import dataclass
+import asyncio
 import sys
-from unittest.mock import MagicMock
 
-# Mock dependencies
-sys.modules["app.schemas"] = MagicMock()
-sys.modules["app.schemas.chat"] = MagicMock()
-sys.modules["openai"] = MagicMock()
-sys.modules["app.config"] = MagicMock()
-mock_settings = MagicMock()
-mock_settings.openai_api_key = "fake-key"
-sys.modules["app.config"].get_settings.return_value = mock_settings
+from app.services.graph import GraphService, build_entity_links, settings
+from app.services.graph_snapshot import GraphSnapshot
+from app.utils.gazetteer import ENTITY_ALIASES, Gazetteer
 
-# Define minimal structures needed for the function
-@dataclass(frozen=True)
-class AgentProfile:
-    agent_id: str
-    persona_name: str
-    period_label: str
-    year_range: str | None
-    summary: str
-    notable_figures: tuple[str, ...]
-    key_events: tuple[str, ...]
+RECORDS = [
+    {"chunk_id": 101, "entities": ["Trần Hưng Đạo", "Nguyễn Trãi"], "dynasty": "Nhà Trần", "summary": "chunk 101"},
+    {"chunk_id": 102, "entities": ["Trần Hưng Đạo", "Nguyễn Trãi"], "dynasty": "Nhà Trần", "summary": "chunk 102"},
+    {"chunk_id": 103, "entities": ["Lê Lợi"], "dynasty": "Nhà Hậu Lê", "summary": "chunk 103"},
+    {"chunk_id": 104, "entities": ["Gia Long"], "dynasty": "Nhà Nguyễn", "summary": "chunk 104"},
+]
 
-DEFAULT_PROFILE = AgentProfile(
-    agent_id="agent_general_search",
-    persona_name="Cố vấn lịch sử",
-    period_label="Tiến trình lịch sử Việt Nam",
-    year_range=None,
-    summary="",
-    notable_figures=(),
-    key_events=(),
-)
+ANSWER = "Trần Quốc Tuấn và Nguyễn Trãi được nhắc cùng nhau; về sau Lê Lợi khởi nghĩa Lam Sơn."
+EXPECTED = [
+    {"relation": "Trần Hưng Đạo → Nguyễn Trãi", "description": "chunk 101", "chunk_id": 101},
+    {"relation": "Nhà Hậu Lê → Lê Lợi", "description": "chunk 103", "chunk_id": 103},
+]
 
-AGENT_PROFILES = {"agent_hien_dai": AgentProfile(
-    agent_id="agent_hien_dai",
-    persona_name="Lê Duẩn",
-    period_label="Cộng hòa Xã hội Chủ nghĩa Việt Nam",
-    year_range="1976-1986",
-    summary="",
-    notable_figures=(),
-    key_events=(),
-)}
-
-def _get_agent_profile(agent_id: str) -> AgentProfile:
-    return AGENT_PROFILES.get(agent_id) or DEFAULT_PROFILE
-
-# Mock GraphLink class
-class GraphLink:
-    def __init__(self, relation, description, chunk_id):
-        self.relation = relation
-        self.description = description
-        self.chunk_id = chunk_id
-    
-    def __repr__(self):
-        return f"GraphLink(relation='{self.relation}', description='{self.description}')"
-
-sys.modules["app.schemas.chat"].GraphLink = GraphLink
-
-# --- The function with the FIX (extracted for testing) ---
-
-def _extract_graph_links_from_answer(answer: str, agent_id: str, hero_name: str | None = None):
-    """Fake graph links như đi trên đồ thị tri thức."""
-    profile = _get_agent_profile(agent_id)
-    
-    # Use specific hero_name if provided, otherwise fallback to profile default
-    final_persona = hero_name or profile.persona_name
-    
-    # We only test the fallback logic here to avoid mocking OpenAI complex response
-    # If fallback works, it means final_persona is correctly set
-    
-    return [
-        GraphLink(
-            relation=f"{profile.period_label} → {final_persona}",
-            description=f"{final_persona} là nhân vật tiêu biểu của {profile.period_label}",
-            chunk_id=100,
-        ),
-        GraphLink(
-            relation=f"{final_persona} → Sự kiện lịch sử",
-            description=f"Các sự kiện quan trọng gắn liền với {final_persona}",
-            chunk_id=200,
-        ),
-    ]
-
-# --- Test Logic ---
 
 def test_graph_links():
-    agent_id = "agent_hien_dai"
-    hero_name = "Võ Văn Kiệt"
-    
-    print(f"Testing with agent_id={agent_id}, hero_name={hero_name}")
-    links = _extract_graph_links_from_answer("Some answer", agent_id, hero_name=hero_name)
-    
-    print("Generated Links:")
-    for link in links:
-        print(f"- {link}")
-    
-    # Check if hero_name is used
-    found_hero = False
-    found_default = False
-    
-    for link in links:
-        if hero_name in link.relation:
-            found_hero = True
-        if "Lê Duẩn" in link.relation:
-            found_default = True
-            
-    if found_hero and not found_default:
-        print("\nSUCCESS: Graph links use the correct hero name.")
-    else:
-        print("\nFAILURE: Graph links do NOT use the correct hero name.")
-        if found_default:
-            print("  -> Found default persona (Lê Duẩn) instead.")
+    failures = []
+
+    snapshot = GraphSnapshot.from_records(RECORDS, None)
+    names = Gazetteer(snapshot.entity_names, ENTITY_ALIASES).find(ANSWER)
+    if names != ["Trần Hưng Đạo", "Nguyễn Trãi", "Lê Lợi"]:
+        failures.append(f"gazetteer không nhận đúng entity (kể cả bí danh): {names}")
+    links = build_entity_links(names, snapshot.chunks_mentioning(names))
+    if links != EXPECTED:
+        failures.append(f"build_entity_links sai: {links}")
+
+    # Cùng đường với router: service đọc snapshot của version đang live, không cần Neo4j.
+    service = GraphService()
+    service._snapshot = GraphSnapshot.from_records(RECORDS, service._graph_version())
+    settings.graph_snapshot_enabled = True
+    links = asyncio.run(service.links_for_text_async(ANSWER))
+    if links != EXPECTED:
+        failures.append(f"links_for_text_async sai: {links}")
+    if asyncio.run(service.links_for_text_async("Câu trả lời không nhắc nhân vật nào.")):
+        failures.append("không có entity mà vẫn dựng link")
+    if any(link["chunk_id"] == 104 for link in links):
+        failures.append("link trỏ tới chunk không liên quan tới câu trả lời")
+
+    if failures:
+        print("FAILURE:")
+        for failure in failures:
+            print(f"  -> {failure}")
         sys.exit(1)
+    print("SUCCESS: Link dựng từ entity trong câu trả lời và chunk thật của graph.")
+
 
 if __name__ == "__main__":
     test_graph_links()
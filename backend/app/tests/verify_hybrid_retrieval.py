@@ -0,0 +1,63 @@
+import sys
+import tempfile
+from pathlib import Path
+
+from app.services.chunk_store import ChunkStore, ChunkStoreWriter
+from app.services.lexical import LexicalIndex, reciprocal_rank_fusion, tokenize
+
+CHUNKS = [
+    {"chunk_id": 1, "text": "Lý Công Uẩn ban Chiếu dời đô về Thăng Long.", "source": "a.pdf", "period": "Ly", "entities": []},
+    {"chunk_id": 2, "text": "Trần Quốc Tuấn chỉ huy trận Bạch Đằng năm 1288.", "source": "a.pdf", "period": "Tran", "entities": []},
+    {"chunk_id": 3, "text": "Nguyễn Trãi viết Bình Ngô đại cáo sau khởi nghĩa Lam Sơn.", "source": "a.pdf", "period": "Le", "entities": []},
+    {"chunk_id": 4, "text": "Nhà Trần ba lần đánh thắng quân Nguyên Mông.", "source": "a.pdf", "period": "Tran", "entities": []},
+]
+
+
+def test_hybrid_retrieval():
+    # Index chỉ giữ posting; text/metadata của kết quả đọc từ chunk store cùng build.
+    tmp = tempfile.TemporaryDirectory()
+    with ChunkStoreWriter(Path(tmp.name) / "chunks.bin") as writer:
+        writer.write(CHUNKS)
+    store = ChunkStore(Path(tmp.name) / "chunks.bin")
+    index = LexicalIndex.build(CHUNKS, store=store)
+    failures = []
+
+    if "dao" not in tokenize("Đạo"):
+        failures.append("tokenize không chuyển đ → d")
+
+    hits = index.search("tran quoc tuan", top_k=2)
+    if not hits or hits[0]["chunk_id"] != 2:
+        failures.append(f"BM25 không xếp chunk 2 lên đầu cho truy vấn không dấu: {hits}")
+    elif hits[0]["text"] != CHUNKS[1]["text"] or hits[0]["dynasty"] != "Tran":
+        failures.append(f"text/metadata không lấy đúng từ chunk store: {hits[0]}")
+
+    hits = index.search("Bình Ngô đại cáo", top_k=3, filters={"period": ["Tran"]})
+    if any(hit["dynasty"] != "Tran" for hit in hits):
+        failures.append(f"filter period không được áp dụng: {hits}")
+
+    vector = [{"chunk_id": 4}, {"chunk_id": 2}]
+    lexical = [{"chunk_id": 2}, {"chunk_id": 1}]
+    fused = reciprocal_rank_fusion([vector, lexical], top_k=3)
+    if [doc["chunk_id"] for doc in fused] != [2, 4, 1]:
+        failures.append(f"RRF sai thứ tự: {fused}")
+
+    reloaded_path = Path(tmp.name) / "lexical.json"
+    index.save(reloaded_path)
+    reloaded = LexicalIndex.load(reloaded_path, store)
+    if "Bạch Đằng" in reloaded_path.read_text(encoding="utf-8"):
+        failures.append("file index vẫn chứa text của chunk")
+    if reloaded.search("tran quoc tuan", top_k=2) != index.search("tran quoc tuan", top_k=2):
+        failures.append("index nạp lại từ file cho kết quả khác")
+    store.close()
+    tmp.cleanup()
+
+    if failures:
+        print("FAILURE:")
+        for failure in failures:
+            print(f"  -> {failure}")
+        sys.exit(1)
+    print("SUCCESS: BM25 và RRF hoạt động đúng.")
+
+
+if __name__ == "__main__":
+    test_hybrid_retrieval()
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import re
+from typing import Iterable, Iterator
+
+from app.utils.tokens import count_tokens
+
+# Dấu kết câu, có thể kèm ngoặc/nháy đóng, rồi khoảng trắng.
+_SENTENCE_END = re.compile(r"[.!?…]+[\"”’»)\]]*\s+")
+_OPENERS = "\"“‘«([-–—"
+# Viết tắt hay gặp trong sách sử: dấu chấm sau chúng không kết thúc câu.
+_ABBREVIATIONS = {"tr", "tp", "tk", "tcn", "scn", "sđd", "nxb", "v.v", "ts", "gs", "pgs", "ng", "st"}
+
+
+def _is_boundary(text: str, match: re.Match) -> bool:
+    end = match.end()
+    if end >= len(text):
+        return True
+    following = text[end]
+    if not (following.isupper() or following.isdigit() or following in _OPENERS):
+        return False
+    start = match.start()
+    word_start = text.rfind(" ", 0, start) + 1
+    word = text[word_start:start].lower()
+    # "2. Bà Triệu", "Tr. 15": số mục và viết tắt không phải cuối câu.
+    if word.isdigit() and len(word) <= 3 and text[start] == ".":
+        return False
+    return word not in _ABBREVIATIONS
+
+
+def sentence_spans(text: str) -> list[tuple[int, int]]:
+    """Chia text (đã gộp khoảng trắng) thành các khoảng [start, end) theo ranh giới câu."""
+    spans: list[tuple[int, int]] = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        if _is_boundary(text, match):
+            spans.append((start, match.end()))
+            start = match.end()
+    if start < len(text):
+        spans.append((start, len(text)))
+    return spans
+
+
+def iter_sentences(
+    pages: Iterable[tuple[int, str]], max_tokens: int | None = None
+) -> Iterator[tuple[str, int, int]]:
+    """Sinh (câu, trang đầu, trang cuối); câu vắt qua trang được nối lại trước khi tách.
+
+    Mẩu chờ nối vượt `max_tokens` (OCR không có dấu câu) được phát ra luôn như một câu để
+    không bị quét lại ở mọi trang sau; `_split_long` sẽ cắt nó.
+    """
+    carry, carry_page, last_page = "", 0, 0
+    for page_no, raw in pages:
+        clean = " ".join(raw.split())
+        if not clean:
+            continue
+        last_page = page_no
+        offset = len(carry) + 1 if carry else 0
+        text = f"{carry} {clean}" if carry else clean
+        spans = sentence_spans(text)
+        for start, end in spans[:-1]:
+            sentence = text[start:end].strip()
+            if sentence:
+                yield sentence, carry_page if start < offset else page_no, carry_page if end <= offset else page_no
+        # Mẩu cuối có thể còn tiếp ở trang sau: giữ lại chờ nối.
+        start, _ = spans[-1]
+        carry = text[start:].strip()
+        carry_page = carry_page if start < offset else page_no
+        # Mỗi token dài ít nhất một ký tự: mẩu ngắn hơn max_tokens ký tự không cần đếm token.
+        if max_tokens and len(carry) > max_tokens and count_tokens(carry) > max_tokens:
+            yield carry, carry_page, page_no
+            carry = ""
+    if carry:
+        yield carry, carry_page, last_page
+
+
+def _split_long(sentence: str, max_tokens: int) -> list[str]:
+    # Câu dài bất thường (bảng, danh sách không dấu câu): cắt theo từ để không vượt max_tokens.
+    pieces: list[str] = []
+    current: list[str] = []
+    for word in sentence.split(" "):
+        current.append(word)
+        if count_tokens(" ".join(current)) > max_tokens and len(current) > 1:
+            current.pop()
+            pieces.append(" ".join(current))
+            current = [word]
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def iter_token_chunks(
+    pages: Iterable[tuple[int, str]], max_tokens: int, overlap_tokens: int
+) -> Iterator[dict]:
+    """Gom câu thành chunk không quá `max_tokens`; mỗi chunk mới lặp lại vài câu cuối của chunk trước
+    (tổng không quá `overlap_tokens`) và mang theo khoảng trang nguồn.
+    """
+    window: list[tuple[str, int, int, int]] = []  # (câu, số token, trang đầu, trang cuối)
+    window_tokens = 0
+    fresh = False  # window có câu chưa từng được phát ra
+
+    def emit() -> dict:
+        return {
+            "text": " ".join(item[0] for item in window),
+            "page_start": window[0][2],
+            "page_end": window[-1][3],
+        }
+
+    for sentence, page_start, page_end in iter_sentences(pages, max_tokens):
+        tokens = count_tokens(sentence)
+        parts = [(sentence, tokens)] if tokens <= max_tokens else [
+            (piece, count_tokens(piece)) for piece in _split_long(sentence, max_tokens)
+        ]
+        for text, size in parts:
+            # +1 cho khoảng trắng nối câu; đủ chính xác với BPE và ước lượng theo byte.
+            if fresh and window_tokens + size + 1 > max_tokens:
+                yield emit()
+                kept: list[tuple[str, int, int, int]] = []
+                kept_tokens = 0
+                for item in reversed(window):
+                    if kept_tokens + item[1] > overlap_tokens or kept_tokens + item[1] + size > max_tokens:
+                        break
+                    kept.insert(0, item)
+                    kept_tokens += item[1]
+                window, window_tokens, fresh = kept, kept_tokens, False
+            window.append((text, size, page_start, page_end))
+            window_tokens += size + (1 if len(window) > 1 else 0)
+            fresh = True
+    if fresh:
+        yield emit()
+
+
+def page_label(page_start: int | None, page_end: int | None) -> str | None:
+    if not page_start:
+        return None
+    if page_end and page_end != page_start:
+        return f"{page_start}–{page_end}"
+    return str(page_start)
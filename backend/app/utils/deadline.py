@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import time
+
+
+class Deadline:
+    """Ngân sách độ trễ end-to-end, chia dần cho từng bước của một request."""
+
+    def __init__(self, budget: float | None) -> None:
+        self._expires_at = time.monotonic() + budget if budget is not None else None
+
+    def remaining(self, cap: float | None = None) -> float | None:
+        """Thời gian còn lại (giây), giới hạn bởi timeout riêng của bước nếu có."""
+        if self._expires_at is None:
+            return cap
+        left = max(0.0, self._expires_at - time.monotonic())
+        return left if cap is None else min(left, cap)
+
+    @property
+    def expired(self) -> bool:
+        return self._expires_at is not None and time.monotonic() >= self._expires_at
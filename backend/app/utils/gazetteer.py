@@ -0,0 +1,311 @@
+from __future__ import annotations
+
+import json
+import re
+import unicodedata
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Iterator, Mapping
+
+TIMELINE_PATH = Path(__file__).resolve().parents[1] / "data" / "timeline_seed.json"
+
+# Tên chuẩn của entity → các cách gọi khác (viết thường); tên chuẩn luôn tự khớp chính nó.
+ENTITY_ALIASES: dict[str, list[str]] = {
+    "Lý Công Uẩn": ["lý công uẩn", "lý thái tổ"],
+    "Trần Hưng Đạo": ["trần hưng đạo", "trần quốc tuấn"],
+    "Lê Lợi": ["lê lợi"],
+    "Nguyễn Trãi": ["nguyễn trãi"],
+    "Nguyễn Huệ": ["nguyễn huệ", "quang trung"],
+    "Gia Long": ["gia long", "nguyễn ánh"],
+}
+
+DYNASTY_KEYWORDS = {
+    "HongBang": ["hồng bàng", "hùng vương", "lạc long quân", "âu cơ"],
+    "BacThuoc": ["bắc thuộc", "triệu đà", "an dương vương", "tô định"],
+    "TuChu": ["ngô quyền", "đinh bộ lĩnh", "lê hoàn", "đại cồ việt"],
+    "Ly": ["lý", "thăng long", "lý công uẩn", "lý thái tổ"],
+    "Tran": ["trần", "trần hưng đạo", "diên hồng", "bạch đằng"],
+    "Le": ["lê", "lê lợi", "bình ngô", "nguyễn trãi"],
+    "TaySon": ["tây sơn", "quang trung", "nguyễn huệ"],
+    "Nguyen": ["nguyễn", "gia long", "tự đức", "đại nam"],
+    "CanDai": ["cận đại", "kháng chiến", "hồ chí minh", "điện biên phủ"],
+}
+
+DYNASTY_LABELS = {
+    "HongBang": "Thời Hồng Bàng",
+    "BacThuoc": "Thời Bắc thuộc",
+    "TuChu": "Thời tự chủ (Ngô – Đinh – Tiền Lê)",
+    "Ly": "Nhà Lý",
+    "Tran": "Nhà Trần",
+    "Le": "Nhà Lê",
+    "TaySon": "Phong trào Tây Sơn",
+    "Nguyen": "Nhà Nguyễn",
+    "CanDai": "Cận đại",
+    "Unknown": "Không rõ",
+}
+
+# Mục timeline (slug) → period của chunk; các giai đoạn ngắn gộp vào thời kỳ lớn chứa nó.
+TIMELINE_PERIODS = {
+    "dyn_hong_bang": "HongBang",
+    "dyn_thuc": "BacThuoc",
+    "dyn_trieu": "BacThuoc",
+    "period_bac_thuoc_1": "BacThuoc",
+    "dyn_trung_vuong": "BacThuoc",
+    "period_bac_thuoc_2": "BacThuoc",
+    "dyn_tien_ly": "BacThuoc",
+    "period_bac_thuoc_3": "BacThuoc",
+    "period_tu_chu": "TuChu",
+    "dyn_ngo": "TuChu",
+    "period_12_su_quan": "TuChu",
+    "dyn_dinh": "TuChu",
+    "dyn_tien_le": "TuChu",
+    "dyn_ly": "Ly",
+    "dyn_tran": "Tran",
+    "dyn_ho": "Tran",
+    "period_bac_thuoc_4": "BacThuoc",
+    "dyn_hau_tran": "Tran",
+    "dyn_hau_le_so": "Le",
+    "dyn_mac": "Le",
+    "period_nam_bac_trieu": "Le",
+    "period_trinh_nguyen": "Le",
+    "dyn_tay_son": "TaySon",
+    "dyn_nguyen": "Nguyen",
+    "period_phap_thuoc": "CanDai",
+    "period_hien_dai_chia_cat": "CanDai",
+    "period_chxhcn_vn": "CanDai",
+}
+
+# Trọng số khi chấm điểm period: tên triều đại/thời kỳ là bằng chứng mạnh nhất, họ đơn lẻ
+# ("lý", "lê", "trần"...) gần như không phân biệt được ("quản lý", "lê" trong "lê dân").
+NAME_WEIGHT = 1.5
+TERM_WEIGHT = 1.0
+AMBIGUOUS_WEIGHT = 0.25
+YEAR_WEIGHT = 0.5
+MIN_PERIOD_SCORE = 0.75
+
+TOKEN_RE = re.compile(r"\w+")
+YEAR_RE = re.compile(r"(?<!\w)năm\s+(\d{1,4})(\s*tcn)?(?!\w)")
+PAREN_RE = re.compile(r"\(([^)]*)\)")
+
+
+def _fold(text: str) -> str:
+    return unicodedata.normalize("NFC", text).casefold()
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(_fold(text))
+
+
+@dataclass(frozen=True)
+class Term:
+    name: str
+    kind: str = "entity"
+    period: str | None = None
+    weight: float = TERM_WEIGHT
+
+
+class Automaton:
+    """Aho–Corasick trên token (âm tiết): quét text một lượt dù có bao nhiêu cụm.
+
+    Mỗi node giữ cụm dài nhất kết thúc tại đó và link tới node hậu tố gần nhất có output,
+    nên chi phí quét là O(số token + số lần khớp), không phụ thuộc số cụm trong từ điển.
+    """
+
+    def __init__(self, patterns: Iterable[tuple[tuple[str, ...], int]]) -> None:
+        self._goto: list[dict[str, int]] = [{}]
+        self._output: list[tuple[int, int] | None] = [None]
+        for tokens, value in patterns:
+            node = 0
+            for token in tokens:
+                nxt = self._goto[node].get(token)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][token] = nxt
+                    self._goto.append({})
+                    self._output.append(None)
+                node = nxt
+            if self._output[node] is None:
+                self._output[node] = (len(tokens), value)
+        self._fail = [0] * len(self._goto)
+        self._link = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(token, 0)
+                self._fail[child] = target if target != child else 0
+                self._link[child] = target if self._output[target] is not None else self._link[target]
+                queue.append(child)
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def iter_matches(self, tokens: list[str]) -> Iterator[tuple[int, int, int]]:
+        """Mọi lần khớp (start, end, value), kể cả chồng lấn, theo thứ tự vị trí kết thúc."""
+        goto, fail, output, link = self._goto, self._fail, self._output, self._link
+        node = 0
+        for end, token in enumerate(tokens, start=1):
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            hit = node if output[node] is not None else link[node]
+            while hit:
+                length, value = output[hit]
+                yield end - length, end, value
+                hit = link[hit]
+
+
+@dataclass
+class ChunkTags:
+    period: str
+    entities: list[str]
+    scores: dict[str, float] = field(default_factory=dict)
+
+
+class Gazetteer:
+    """Tập tên (kèm bí danh) biên dịch thành một automaton duy nhất; quét text một lượt.
+
+    Trùng chỗ thì lấy cụm bắt đầu sớm nhất, dài nhất nên "trần hưng đạo" không bị tính thêm
+    "trần"; khớp theo trọn âm tiết nên "lý" không khớp trong "lýt".
+    """
+
+    def __init__(
+        self,
+        names: Iterable[str] = (),
+        aliases: Mapping[str, Iterable[str]] | None = None,
+        terms: Iterable[tuple[str, Term]] = (),
+    ) -> None:
+        self._terms: dict[tuple[str, ...], Term] = {}
+        for name in names:
+            self.add(name, Term(name))
+        for name, extra in (aliases or {}).items():
+            for text in [name, *extra]:
+                self.add(text, Term(name))
+        for text, term in terms:
+            self.add(text, term)
+        self._values = list(self._terms.values())
+        self._automaton = Automaton((tokens, idx) for idx, tokens in enumerate(self._terms))
+
+    def add(self, text: str, term: Term) -> None:
+        # Cụm đăng ký trước thắng: chỉ gọi trước khi automaton được dựng (trong __init__).
+        tokens = tuple(tokenize(text))
+        if tokens:
+            self._terms.setdefault(tokens, term)
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def matches(self, text: str) -> list[Term]:
+        """Các cụm khớp theo thứ tự xuất hiện, không chồng lấn (leftmost-longest)."""
+        found = sorted(self._automaton.iter_matches(tokenize(text)), key=lambda hit: (hit[0], -hit[1]))
+        terms: list[Term] = []
+        cursor = 0
+        for start, end, value in found:
+            if start >= cursor:
+                terms.append(self._values[value])
+                cursor = end
+        return terms
+
+    def counts(self, text: str) -> Counter:
+        """Số lần nhắc mỗi tên chuẩn; thứ tự chèn là thứ tự xuất hiện đầu tiên."""
+        return Counter(term.name for term in self.matches(text))
+
+    def find(self, text: str) -> list[str]:
+        """Tên chuẩn, nhắc nhiều trước; bằng nhau thì cái xuất hiện trước đứng trước."""
+        return _ranked(self.counts(text))
+
+
+def _ranked(found: Counter) -> list[str]:
+    order = {name: idx for idx, name in enumerate(found)}
+    return sorted(found, key=lambda name: (-found[name], order[name]))
+
+
+def _split_name(value: str) -> list[str]:
+    """"Lý Công Uẩn (Lý Thái Tổ)" → ["Lý Công Uẩn", "Lý Thái Tổ"]; bỏ phần ngoặc chỉ có năm."""
+    names = [PAREN_RE.sub("", value).strip()]
+    for inner in PAREN_RE.findall(value):
+        names.extend(part.strip() for part in inner.split(",") if not any(ch.isdigit() for ch in part))
+    return [name for name in names if name]
+
+
+class ChunkTagger:
+    """Gắn entity và period cho chunk bằng một lượt quét gazetteer.
+
+    Period lấy theo điểm: mỗi cụm khớp cộng trọng số vào period của nó, mỗi "năm X" cộng
+    vào các period có khoảng năm chứa X; dưới MIN_PERIOD_SCORE thì là "Unknown".
+    """
+
+    def __init__(self, gazetteer: Gazetteer, spans: Iterable[tuple[int, int, str]] = ()) -> None:
+        self.gazetteer = gazetteer
+        self.spans = list(spans)
+
+    @classmethod
+    def from_timeline(cls, entries: list[dict]) -> "ChunkTagger":
+        canonical = {_fold(term): name for name, terms in ENTITY_ALIASES.items() for term in [name, *terms]}
+        figures: list[tuple[str, Term]] = []
+        periods: list[tuple[str, Term]] = []
+        events: list[tuple[str, Term]] = []
+        spans: list[tuple[int, int, str]] = []
+        for entry in entries:
+            period = TIMELINE_PERIODS.get(entry.get("slug"))
+            if period is None:
+                continue
+            if entry.get("start_year") is not None and entry.get("end_year") is not None:
+                spans.append((int(entry["start_year"]), int(entry["end_year"]), period))
+            for name in _split_name(entry.get("name") or ""):
+                periods.append((name, Term(name, "period", period, NAME_WEIGHT)))
+            for figure in entry.get("notable_figures") or []:
+                names = _split_name(figure)
+                # Nhân vật đã có trong ENTITY_ALIASES giữ tên chuẩn cũ (vd. "Gia Long" chứ không phải "Nguyễn Ánh").
+                name = next((canonical[_fold(n)] for n in names if _fold(n) in canonical), names[0])
+                for text in names:
+                    figures.append((text, Term(name, "entity", period)))
+            for event in entry.get("key_events") or []:
+                for name in _split_name(event)[:1]:
+                    events.append((name, Term(name, "event", period)))
+        figure_periods = {term.name: term.period for _, term in figures}
+        aliases = [
+            (text, Term(name, "entity", figure_periods.get(name)))
+            for name, terms in ENTITY_ALIASES.items()
+            for text in [name, *terms]
+        ]
+        keywords = [
+            (keyword, Term(keyword, "keyword", period, TERM_WEIGHT if " " in keyword else AMBIGUOUS_WEIGHT))
+            for period, words in DYNASTY_KEYWORDS.items()
+            for keyword in words
+        ]
+        return cls(Gazetteer(terms=[*figures, *aliases, *periods, *events, *keywords]), spans)
+
+    def year_periods(self, year: int) -> set[str]:
+        return {period for start, end, period in self.spans if start <= year <= end}
+
+    def tag(self, text: str) -> ChunkTags:
+        scores: dict[str, float] = {}
+        entities: Counter = Counter()
+        for term in self.gazetteer.matches(text):
+            if term.kind == "entity":
+                entities[term.name] += 1
+            if term.period:
+                scores[term.period] = scores.get(term.period, 0.0) + term.weight
+        for match in YEAR_RE.finditer(_fold(text)):
+            year = -int(match.group(1)) if match.group(2) else int(match.group(1))
+            for period in self.year_periods(year):
+                scores[period] = scores.get(period, 0.0) + YEAR_WEIGHT
+        # max giữ phần tử đầu khi bằng điểm, tức period được nhắc trước.
+        best = max(scores, key=scores.__getitem__, default=None)
+        period = best if best is not None and scores[best] >= MIN_PERIOD_SCORE else "Unknown"
+        return ChunkTags(period=period, entities=_ranked(entities), scores=scores)
+
+
+@lru_cache(maxsize=1)
+def chunk_tagger() -> ChunkTagger:
+    try:
+        entries = json.loads(TIMELINE_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        entries = []
+    return ChunkTagger.from_timeline(entries)
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from functools import lru_cache
+
+import tiktoken
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+@lru_cache
+def _encoding() -> tiktoken.Encoding | None:
+    try:
+        try:
+            return tiktoken.encoding_for_model(settings.openai_embed_model)
+        except KeyError:
+            # tiktoken cũ chưa biết model embedding v3; chúng dùng chung cl100k_base.
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Không tải được BPE (máy offline): dùng ước lượng theo số byte UTF-8.
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return len(text.encode("utf-8")) // 3 + 1
+    return len(encoding.encode(text, disallowed_special=()))